@@ -0,0 +1,130 @@
+"""
+编译后端基准测试
+
+在临时工作目录中生成合成内容，分别使用 subprocess 与 typst-py 两种编译后端
+运行 `build.py html --force --jobs 1 --profile`，从导出的 trace 中读取每个页面的编译耗时，
+对比单页延迟的中位数与 P95。
+
+与 run.py 不同，本测试需要真实的 Typst：
+    subprocess 后端  需要 PATH 中有 typst 命令
+    typst-py 后端    需要安装 typst Python 包（pip install typst）
+缺少其中一项时只测试另一种后端。
+
+用法:
+    python benchmarks/backends.py --pages 100
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+
+from generate_content import generate
+from run import PROJECT_FILES, PROJECT_ROOT, git_revision, run_build
+
+BACKENDS = ("subprocess", "typst-py")
+
+
+def available_backends() -> list[str]:
+    backends = []
+    if shutil.which("typst"):
+        backends.append("subprocess")
+    else:
+        print("  ⚠ PATH 中没有 typst 命令，跳过 subprocess 后端")
+    try:
+        import typst  # noqa: F401
+
+        backends.append("typst-py")
+    except ImportError:
+        print("  ⚠ 未安装 typst Python 包，跳过 typst-py 后端")
+    return backends
+
+
+def page_latencies(trace: Path) -> list[float]:
+    """从 --profile 导出的 trace 中读取每个页面的编译耗时（秒）"""
+    events = json.loads(trace.read_text(encoding="utf-8"))["traceEvents"]
+    return [e["dur"] / 1e6 for e in events if e.get("cat") == "typst"]
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def benchmark(args: argparse.Namespace) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="tufted-backend-") as tmp:
+        workspace = Path(tmp)
+        for name in PROJECT_FILES:
+            source = PROJECT_ROOT / name
+            if source.is_dir():
+                shutil.copytree(source, workspace / name)
+            else:
+                shutil.copy2(source, workspace / name)
+
+        # 只保留合成内容，避免真实文章依赖网络上的 Typst 包
+        generate(workspace, args.pages, args.depth, assets=0, seed=args.seed, skew=args.skew)
+
+        env = dict(os.environ)
+        env["PYTHON"] = sys.executable
+
+        for backend in available_backends():
+            trace = workspace / f"trace-{backend}.json"
+            build_args = ["--force", "--jobs", "1", "--backend", backend]
+            # 预热一次（下载包、建立系统字体缓存等），再测量
+            run_build(workspace, env, build_args, command="html")
+            total = run_build(workspace, env, [*build_args, "--profile", str(trace)])
+
+            latencies = page_latencies(trace)
+            results[backend] = {
+                "pages": len(latencies),
+                "total": round(total, 4),
+                "median_ms": round(statistics.median(latencies) * 1000, 2),
+                "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+                "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+            }
+            r = results[backend]
+            print(
+                f"  {backend:<11} 单页中位数 {r['median_ms']:.1f} ms  P95 {r['p95_ms']:.1f} ms"
+                f"  平均 {r['mean_ms']:.1f} ms  （{r['pages']} 页，构建总计 {total:.2f}s）"
+            )
+
+    return {
+        "revision": git_revision(),
+        "parameters": {
+            "pages": args.pages,
+            "depth": args.depth,
+            "skew": args.skew,
+            "seed": args.seed,
+        },
+        "backends": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="编译后端基准测试")
+    parser.add_argument("--pages", type=int, default=100, help="文章数量")
+    parser.add_argument("--depth", type=int, default=2, help="模板导入深度")
+    parser.add_argument("--skew", type=float, default=0.0, help="文章长度的偏斜程度")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="结果 JSON 的输出路径")
+    args = parser.parse_args()
+
+    print(f"正在运行编译后端基准测试（{args.pages} 篇文章）...")
+    result = benchmark(args)
+    if len(result["backends"]) == len(BACKENDS):
+        before = result["backends"]["subprocess"]["median_ms"]
+        after = result["backends"]["typst-py"]["median_ms"]
+        print(f"  typst-py 相对 subprocess 的单页中位数延迟: {(after - before) / before:+.1%}")
+
+    if args.output:
+        args.output.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+用于基准测试的 typst 替身
+
+只实现 build.py 用到的 `typst compile` 参数，根据输入文件写出确定性的 HTML/PDF，
+并可通过环境变量模拟编译耗时：
+    FAKE_TYPST_LATENCY_MS      每次编译的固定耗时（毫秒，默认 0）
+    FAKE_TYPST_LATENCY_PER_KB  源文件每 KB 额外增加的耗时（毫秒，默认 0）
+
+benchmarks/bin/ 中的 typst 包装脚本会调用本文件，将该目录加入 PATH 即可替换真实的 typst。
+"""
+
+import html
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+# 带参数值但不影响输出的 typst 选项
+OPTIONS_WITH_VALUE = {
+    "--root",
+    "--font-path",
+    "--features",
+    "--package-path",
+    "--package-cache-path",
+}
+
+
+def parse_args(argv: list[str]) -> tuple[dict[str, str], Path, Path, str]:
+    inputs: dict[str, str] = {}
+    fmt = ""
+    positional = []
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg == "--input":
+            key, _, value = argv[i + 1].partition("=")
+            inputs[key] = value
+            i += 2
+        elif arg == "--format":
+            fmt = argv[i + 1]
+            i += 2
+        elif arg in OPTIONS_WITH_VALUE:
+            i += 2
+        else:
+            positional.append(arg)
+            i += 1
+    source, output = Path(positional[-2]), Path(positional[-1])
+    return inputs, source, output, fmt or output.suffix.lstrip(".")
+
+
+def render_html(source: Path, text: str, page_path: str) -> str:
+    title = re.search(r'title:\s*"([^"]*)"', text)
+    images = re.findall(r'image\("([^"]+)"\)', text)
+    paragraphs = [line for line in text.splitlines() if line and not line.startswith(("#", "="))]
+    canonical = f"https://example.com/{page_path}/" if page_path else "https://example.com/"
+
+    body = [f'<h1 id="top-heading">{html.escape(title.group(1) if title else source.stem)}</h1>']
+    body += [f'<img src="{html.escape(src)}">' for src in images]
+    body += [f"<p>{html.escape(p)}</p>" for p in paragraphs]
+    return "\n".join(
+        [
+            "<!DOCTYPE html>",
+            '<html lang="zh">',
+            "  <head>",
+            '    <meta charset="utf-8">',
+            f"    <title>{html.escape(title.group(1) if title else 'Home')}</title>",
+            '    <meta name="description" content="synthetic page">',
+            f'    <link rel="canonical" href="{canonical}">',
+            '    <link rel="stylesheet" href="/assets/tufted.css">',
+            '    <script src="/assets/theme-toggle.js"></script>',
+            "  </head>",
+            "  <body>",
+            '    <header class="site-header"><nav class="site-nav"><a href="/">主页</a>'
+            '<a href="/Blog/">博客</a><a href="/Study/">学习笔记</a></nav></header>',
+            "    <article><section>",
+            *("      " + line for line in body),
+            "    </section></article>",
+            "    <footer>synthetic</footer>",
+            "  </body>",
+            "</html>",
+            "",
+        ]
+    )
+
+
+def main(argv: list[str]) -> int:
+    if not argv or argv[0] != "compile":
+        print("fake typst: only `compile` is supported", file=sys.stderr)
+        return 2
+
+    inputs, source, output, fmt = parse_args(argv[1:])
+    try:
+        text = source.read_text(encoding="utf-8")
+    except OSError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+    latency = float(os.environ.get("FAKE_TYPST_LATENCY_MS", "0"))
+    latency += float(os.environ.get("FAKE_TYPST_LATENCY_PER_KB", "0")) * len(text) / 1024
+    if latency > 0:
+        time.sleep(latency / 1000)
+
+    if fmt == "pdf":
+        marker = f"% fake typst output for {source}\n".encode()
+        output.write_bytes(b"%PDF-1.7\n" + marker + b"%%EOF\n")
+    else:
+        output.write_text(render_html(source, text, inputs.get("page-path", "")), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,131 @@
+"""
+合成内容生成器
+
+生成一个结构与真实站点相同的 content/ 目录，用于测量 build.py 自身的开销：
+- 首页与若干分区（section）列表页，每个分区下有若干文章目录
+- `_` 开头的模板目录，模板之间按指定深度链式导入，每篇文章导入链头
+- 每篇文章目录中有指定数量的图片资源
+
+用法:
+    python benchmarks/generate_content.py WORKSPACE --pages 1000 --depth 3 --assets 2
+"""
+
+import argparse
+import random
+import struct
+import zlib
+from pathlib import Path
+
+SECTIONS = ("Blog", "Study", "Thoughts")
+
+
+def make_png(width: int, height: int, seed: int) -> bytes:
+    """生成一张确定性的纯色 PNG 图片"""
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        crc = struct.pack(">I", zlib.crc32(kind + data))
+        return struct.pack(">I", len(data)) + kind + data + crc
+
+    color = bytes(((seed * 37) % 256, (seed * 71) % 256, (seed * 113) % 256))
+    raw = b"".join(b"\0" + color * width for _ in range(height))
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(raw, 9))
+        + chunk(b"IEND", b"")
+    )
+
+
+def generate(
+    workspace: Path,
+    pages: int,
+    depth: int = 2,
+    assets: int = 1,
+    templates: int = 1,
+    seed: int = 0,
+    skew: float = 0.0,
+) -> list[Path]:
+    """
+    在 workspace/content 下生成合成内容。
+
+    参数:
+        workspace: 工作目录（需已包含 config.typ 等项目文件）
+        pages: 文章数量
+        depth: 每个模板目录中链式导入的深度
+        assets: 每篇文章的图片数量
+        templates: `_` 开头的模板目录数量
+        seed: 随机种子
+        skew: 文章长度的偏斜程度，0 表示所有文章一样长，越大越接近长尾分布
+
+    返回:
+        list[Path]: 生成的文章 .typ 文件列表
+    """
+    rng = random.Random(seed)
+    content = workspace / "content"
+    content.mkdir(parents=True, exist_ok=True)
+
+    # 模板目录：_templates0/t0.typ -> t1.typ -> ... -> t{depth-1}.typ
+    heads = []
+    for t in range(templates):
+        template_dir = content / f"_templates{t}"
+        template_dir.mkdir(exist_ok=True)
+        for level in range(depth):
+            body = f"#let helper{level}(x) = x\n"
+            if level + 1 < depth:
+                body = f'#import "t{level + 1}.typ": *\n' + body
+            (template_dir / f"t{level}.typ").write_text(body, encoding="utf-8")
+        if depth:
+            heads.append(f"/content/_templates{t}/t0.typ")
+
+    (content / "index.typ").write_text(
+        '#import "../config.typ": template, tufted\n#show: template\n\n= Home\n', encoding="utf-8"
+    )
+
+    posts = []
+    for i in range(pages):
+        section = SECTIONS[i % len(SECTIONS)]
+        post_dir = content / section / f"2026-01-01-post-{i:05d}"
+        post_dir.mkdir(parents=True, exist_ok=True)
+
+        lines = ['#import "../index.typ": template, tufted']
+        lines += [f'#import "{head}": *' for head in heads]
+        lines += [f'#show: template.with(title: "Post {i}")', "", f"= Post {i}", ""]
+
+        for a in range(assets):
+            name = f"asset{a}.png"
+            (post_dir / name).write_bytes(make_png(32 + a, 24 + a, i * 31 + a))
+            lines.append(f'#image("{name}")')
+
+        paragraphs = 1 + int(rng.paretovariate(1 / skew) if skew else 1)
+        lines += [f"Paragraph {p} of post {i}." for p in range(min(paragraphs, 2000))]
+
+        source = post_dir / "index.typ"
+        source.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        posts.append(source)
+
+    for section in SECTIONS:
+        (content / section).mkdir(exist_ok=True)
+        (content / section / "index.typ").write_text(
+            f'#import "../index.typ": template, tufted\n#show: template.with(title: "{section}")\n',
+            encoding="utf-8",
+        )
+
+    return posts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成合成的 content/ 目录")
+    parser.add_argument("workspace", type=Path)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--assets", type=int, default=1)
+    parser.add_argument("--templates", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skew", type=float, default=0.0)
+    args = parser.parse_args()
+
+    generated = generate(
+        args.workspace, args.pages, args.depth, args.assets, args.templates, args.seed, args.skew
+    )
+    print(f"已生成 {len(generated)} 篇文章: {args.workspace / 'content'}")
@@ -0,0 +1,192 @@
+"""
+build.py 基准测试
+
+在临时工作目录中复制项目文件、生成合成内容，并使用 benchmarks/bin/typst 替身
+运行 build.py，测量 build.py 自身的开销。结果以 JSON 输出，便于在不同提交之间对比。
+
+场景:
+    cold         清空 _site 与 .build-cache 后完整构建
+    noop         没有任何修改的增量构建
+    page-edit    修改一篇文章后的增量构建
+    config-edit  修改 config.typ 后的增量构建
+    asset-edit   只修改一张图片后的增量构建
+
+用法:
+    python benchmarks/run.py --pages 1000 --output bench.json
+    python benchmarks/run.py --pages 1000 --compare bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from generate_content import generate
+
+BENCH_DIR = Path(__file__).parent.resolve()
+PROJECT_ROOT = BENCH_DIR.parent
+PROJECT_FILES = ("build.py", "config.typ", "tufted-lib", "assets")
+SCENARIOS = ("cold", "noop", "page-edit", "config-edit", "asset-edit")
+
+
+def touch(path: Path) -> None:
+    """更新文件的修改时间，并保证它严格晚于之前的构建产物"""
+    time.sleep(0.01)
+    with path.open("ab"):
+        pass
+    os.utime(path)
+
+
+def prepare_scenario(name: str, workspace: Path, posts: list[Path]) -> None:
+    match name:
+        case "cold":
+            shutil.rmtree(workspace / "_site", ignore_errors=True)
+            shutil.rmtree(workspace / ".build-cache", ignore_errors=True)
+        case "noop":
+            pass
+        case "page-edit":
+            with posts[len(posts) // 2].open("a", encoding="utf-8") as f:
+                f.write("Edited.\n")
+        case "config-edit":
+            touch(workspace / "config.typ")
+        case "asset-edit":
+            assets = sorted(posts[0].parent.glob("*.png"))
+            if assets:
+                touch(assets[0])
+
+
+def run_build(
+    workspace: Path, env: dict[str, str], build_args: list[str], command: str = "build"
+) -> float:
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "build.py", command, *build_args],
+        cwd=workspace,
+        env=env,
+        capture_output=True,
+        text=True,
+        encoding="utf-8",
+    )
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        print(result.stdout[-2000:], result.stderr[-2000:], sep="\n", file=sys.stderr)
+        raise SystemExit(f"build.py 运行失败（返回码 {result.returncode}）")
+    return elapsed
+
+
+def git_revision() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+        )
+        return result.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def benchmark(args: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory(prefix="tufted-bench-") as tmp:
+        workspace = Path(tmp)
+        for name in PROJECT_FILES:
+            source = PROJECT_ROOT / name
+            if source.is_dir():
+                shutil.copytree(source, workspace / name)
+            else:
+                shutil.copy2(source, workspace / name)
+
+        posts = generate(
+            workspace, args.pages, args.depth, args.assets, args.templates, args.seed, args.skew
+        )
+
+        env = dict(os.environ)
+        env["PATH"] = f"{BENCH_DIR / 'bin'}{os.pathsep}{env.get('PATH', '')}"
+        env["PYTHON"] = sys.executable
+        env["FAKE_TYPST_LATENCY_MS"] = str(args.latency_ms)
+
+        # 预热：先完整构建一次，使增量场景从已构建的状态开始
+        run_build(workspace, env, args.build_arg)
+
+        results = {}
+        for name in args.scenarios:
+            timings = []
+            for _ in range(args.repeat):
+                prepare_scenario(name, workspace, posts)
+                timings.append(run_build(workspace, env, args.build_arg))
+            results[name] = {
+                "runs": [round(t, 4) for t in timings],
+                "median": round(statistics.median(timings), 4),
+                "min": round(min(timings), 4),
+            }
+            median, fastest = results[name]["median"], results[name]["min"]
+            print(f"  {name:<12} 中位数 {median:.3f}s  最小 {fastest:.3f}s")
+
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {
+            "pages": args.pages,
+            "depth": args.depth,
+            "assets": args.assets,
+            "templates": args.templates,
+            "latency_ms": args.latency_ms,
+            "skew": args.skew,
+            "repeat": args.repeat,
+            "build_args": args.build_arg,
+        },
+        "scenarios": results,
+    }
+
+
+def compare(current: dict, baseline: dict) -> None:
+    print(f"\n与基线 {baseline.get('revision')} 对比（中位数）:")
+    for name, result in current["scenarios"].items():
+        if name not in baseline.get("scenarios", {}):
+            continue
+        before, after = baseline["scenarios"][name]["median"], result["median"]
+        change = (after - before) / before * 100 if before else 0.0
+        print(f"  {name:<12} {before:.3f}s -> {after:.3f}s ({change:+.1f}%)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="build.py 基准测试")
+    parser.add_argument("--pages", type=int, default=500, help="文章数量")
+    parser.add_argument("--depth", type=int, default=2, help="模板导入深度")
+    parser.add_argument("--assets", type=int, default=1, help="每篇文章的图片数量")
+    parser.add_argument("--templates", type=int, default=1, help="`_` 开头的模板目录数量")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skew", type=float, default=0.0, help="文章长度的偏斜程度")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="每次编译模拟的耗时")
+    parser.add_argument("--repeat", type=int, default=3, help="每个场景的重复次数")
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS), metavar="NAME"
+    )
+    parser.add_argument(
+        "--build-arg", action="append", default=[], help="传递给 build.py build 的额外参数"
+    )
+    parser.add_argument("--output", type=Path, help="结果 JSON 的输出路径")
+    parser.add_argument("--compare", type=Path, help="用于对比的基线结果 JSON")
+    args = parser.parse_args()
+
+    print(f"正在运行基准测试（{args.pages} 篇文章）...")
+    result = benchmark(args)
+
+    if args.output:
+        args.output.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"结果已写入 {args.output}")
+    if args.compare:
+        compare(result, json.loads(args.compare.read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
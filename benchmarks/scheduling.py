@@ -0,0 +1,157 @@
+"""
+编译调度基准测试
+
+生成文章长度呈长尾分布的合成内容，对比按文件路径顺序编译（DURATION_SCHEDULING = False）
+与按历史耗时调度（最长处理时间优先）两种方式在不同并行数下的总时长（makespan）。
+
+每种并行数会报告:
+    实测      使用 typst 替身（FAKE_TYPST_LATENCY_PER_KB 模拟与文件大小成正比的编译耗时）
+              实际运行 `build.py html --force` 的耗时
+    模拟      用 .build-cache/durations.json 中记录的耗时，按相同顺序模拟 N 个工作线程的调度
+    下界      max(总耗时 / N, 最长单页耗时)
+
+用法:
+    python benchmarks/scheduling.py --pages 200 --skew 1.5 --jobs 2 4 8
+"""
+
+import argparse
+import heapq
+import importlib.util
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from generate_content import generate
+from run import BENCH_DIR, PROJECT_FILES, PROJECT_ROOT, git_revision, run_build
+
+
+def set_scheduling(workspace: Path, enabled: bool) -> None:
+    """修改工作目录中 build.py 副本的 DURATION_SCHEDULING 配置"""
+    script = workspace / "build.py"
+    text = script.read_text(encoding="utf-8")
+    text = text.replace(
+        f"DURATION_SCHEDULING = {not enabled}", f"DURATION_SCHEDULING = {enabled}", 1
+    )
+    script.write_text(text, encoding="utf-8")
+
+
+def simulate(order: list[Path], durations: dict[Path, float], jobs: int) -> float:
+    """按给定顺序把任务分配给最先空闲的工作线程，返回总时长"""
+    workers = [0.0] * jobs
+    for typ_file in order:
+        heapq.heappush(workers, heapq.heappop(workers) + durations.get(typ_file, 0.0))
+    return max(workers)
+
+
+def load_build_module(workspace: Path):
+    """从工作目录导入 build.py 副本，用于计算与构建时相同的调度顺序"""
+    spec = importlib.util.spec_from_file_location("bench_build", workspace / "build.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def benchmark(args: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory(prefix="tufted-sched-") as tmp:
+        workspace = Path(tmp)
+        for name in PROJECT_FILES:
+            source = PROJECT_ROOT / name
+            if source.is_dir():
+                shutil.copytree(source, workspace / name)
+            else:
+                shutil.copy2(source, workspace / name)
+
+        generate(workspace, args.pages, assets=0, seed=args.seed, skew=args.skew)
+
+        env = dict(os.environ)
+        env["PATH"] = f"{BENCH_DIR / 'bin'}{os.pathsep}{env.get('PATH', '')}"
+        env["PYTHON"] = sys.executable
+        env["FAKE_TYPST_LATENCY_MS"] = str(args.latency_ms)
+        env["FAKE_TYPST_LATENCY_PER_KB"] = str(args.latency_per_kb)
+
+        # 预热：顺序编译一次，记录每个页面的编译耗时
+        set_scheduling(workspace, True)
+        run_build(workspace, env, ["--jobs", "1"], command="html")
+
+        cwd = Path.cwd()
+        os.chdir(workspace)
+        try:
+            build = load_build_module(workspace)
+            history = build.load_cache("durations")
+            files = [f for f in build.find_typ_files() if "pdf" not in f.stem.lower()]
+            scheduled = build.schedule_compiles(files, "html", history)
+        finally:
+            os.chdir(cwd)
+
+        durations = {f: history.get(f"html:{f.as_posix()}", [0.0])[0] for f in files}
+        total, longest = sum(durations.values()), max(durations.values())
+        print(f"  单页耗时合计 {total:.2f}s，最长单页 {longest:.2f}s")
+
+        results = {}
+        for jobs in args.jobs:
+            result = {"lower_bound": round(max(total / jobs, longest), 4)}
+            for mode, order in (("path-order", files), ("scheduled", scheduled)):
+                set_scheduling(workspace, mode == "scheduled")
+                measured = min(
+                    run_build(workspace, env, ["--force", "--jobs", str(jobs)], command="html")
+                    for _ in range(args.repeat)
+                )
+                result[mode] = {
+                    "measured": round(measured, 4),
+                    "simulated": round(simulate(order, durations, jobs), 4),
+                }
+            results[jobs] = result
+
+            before, after = result["path-order"], result["scheduled"]
+            print(
+                f"  jobs={jobs:<3} 路径顺序 实测 {before['measured']:.2f}s"
+                f" / 模拟 {before['simulated']:.2f}s"
+                f"  ->  按耗时调度 实测 {after['measured']:.2f}s"
+                f" / 模拟 {after['simulated']:.2f}s"
+                f"  （下界 {result['lower_bound']:.2f}s）"
+            )
+
+    return {
+        "revision": git_revision(),
+        "parameters": {
+            "pages": args.pages,
+            "skew": args.skew,
+            "seed": args.seed,
+            "latency_ms": args.latency_ms,
+            "latency_per_kb": args.latency_per_kb,
+            "repeat": args.repeat,
+        },
+        "jobs": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="编译调度基准测试")
+    parser.add_argument("--pages", type=int, default=200, help="文章数量")
+    parser.add_argument("--skew", type=float, default=1.5, help="文章长度的偏斜程度")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[2, 4, 8], help="并行编译数")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="每次编译的固定耗时")
+    parser.add_argument(
+        "--latency-per-kb", type=float, default=200.0, help="源文件每 KB 增加的编译耗时"
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="每种配置的重复次数（取最小值）")
+    parser.add_argument("--output", type=Path, help="结果 JSON 的输出路径")
+    args = parser.parse_args()
+
+    print(f"正在运行编译调度基准测试（{args.pages} 篇文章，skew={args.skew}）...")
+    start = time.perf_counter()
+    result = benchmark(args)
+    print(f"完成，用时 {time.perf_counter() - start:.1f}s")
+
+    if args.output:
+        args.output.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
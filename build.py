@@ -12,9 +12,14 @@ Tufted Blog Template 构建脚本
 
 用法:
     uv run build.py build       # 完整构建 (HTML + PDF + 资源)
+    uv run build.py build content/Study/  # 只构建匹配的页面（路径或 glob）
     uv run build.py html        # 仅构建 HTML 文件
     uv run build.py pdf         # 仅构建 PDF 文件
     uv run build.py assets      # 仅复制静态资源
+    uv run build.py check-links # 检查 _site 中的站内链接和锚点
+    uv run build.py plan        # 列出下次构建会重新编译的页面及原因（不修改文件）
+    uv run build.py explain PATH  # 显示文件的正向与反向依赖
+    uv run build.py vendor      # 将用到的 Typst 包放入 typst-packages/，之后离线构建
     uv run build.py clean       # 清理生成的文件
     uv run build.py preview     # 启动本地预览服务器（默认端口 8000）
     uv run build.py preview -p 3000  # 使用自定义端口
@@ -22,9 +27,20 @@ Tufted Blog Template 构建脚本
 
 增量编译选项:
     --force, -f                 # 强制完整重建，忽略增量检查
+    --jobs, -j N                # 同时运行的 Typst 进程数（默认为 CPU 核心数）
+    --backend NAME              # 编译后端：subprocess（默认）或 typst-py（进程内编译）
+    --fsync                     # 写入输出文件后刷新到磁盘（更慢，但断电后也不会留下不完整的文件）
+
+构建选项:
+    --check-links               # 构建完成后检查站内链接，存在失效链接时构建失败
+    --strict-budgets            # 超出性能预算（PERFORMANCE_BUDGETS）时构建失败
+    --budget-report PATH        # 将各页面的体积指标与超标项导出为 JSON
+    --profile [PATH]            # 记录各阶段与每个 Typst 子进程的耗时、CPU 时间和峰值内存，
+                                # 导出为 Chrome/Perfetto trace（默认 .build-cache/trace.json）
 
 预览服务器选项:
     --port, -p PORT             # 指定服务器端口号（默认: 8000）
+    --headers                   # 按 _site/_headers 发送缓存响应头，模拟部署环境
 
 也可以直接使用 Python 运行:
     python build.py build
@@ -33,6 +49,11 @@ Tufted Blog Template 构建脚本
 """
 
 import argparse
+import base64
+import hashlib
+import html
+import io
+import json
 import os
 import re
 import shutil
@@ -40,11 +61,14 @@ import subprocess
 import sys
 import threading
 import time
-from dataclasses import dataclass
+from abc import ABC, abstractmethod
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from html.parser import HTMLParser
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
-from typing import Literal
+from typing import Callable, Iterator, Literal
 
 # ============================================================================
 # 配置
@@ -54,6 +78,138 @@ CONTENT_DIR = Path("content")  # 源文件目录
 SITE_DIR = Path("_site")  # 输出目录
 ASSETS_DIR = Path("assets")  # 静态资源目录
 CONFIG_FILE = Path("config.typ")  # 全局配置文件
+CACHE_DIR = Path(".build-cache")  # 增量构建缓存目录（clean 不会删除）
+PACKAGE_DIR = Path("typst-packages")  # build.py vendor 写入的 Typst 包目录，存在时通过 --package-path 使用
+FSYNC_OUTPUTS = False  # 写入输出文件后是否 fsync（也可使用 --fsync），防止断电后留下不完整的文件
+PROFILE_TRACE_FILE = CACHE_DIR / "trace.json"  # --profile 默认的 trace 输出路径
+PROFILE_TOP_N = 10  # --profile 结束时列出的最慢页面数量
+
+# 并行编译：同时运行的 Typst 进程数（可通过 --jobs 覆盖）
+BUILD_JOBS = os.cpu_count() or 1
+# 编译后端（可通过 --backend 覆盖）：
+#   "subprocess"  每个页面启动一个 typst 命令行进程
+#   "typst-py"    使用 typst Python 包在进程内编译，字体只加载一次，编译器实例在页面之间复用
+#                 （需要安装 typst 包，如 `uv run --with typst build.py build --backend typst-py`）
+COMPILER_BACKEND: Literal["subprocess", "typst-py"] = "subprocess"
+# 编译调度：按历史编译耗时（.build-cache/durations.json）安排顺序，预计最耗时的页面最先开始；
+# 首页与 header-links 中的页面始终最先编译，便于预览时尽早可用
+DURATION_SCHEDULING = True  # 设为 False 按文件路径顺序编译
+
+# 预览服务器：未安装 uv 时使用的内置服务器会对文本响应即时 gzip 压缩，压缩结果缓存在内存中
+PREVIEW_GZIP_CACHE_BYTES = 64 * 1024 * 1024  # 压缩缓存的总大小上限
+
+# 资源去重：content/ 中内容完全相同的资源文件只保留一份
+#   "off"       每个路径各复制一份
+#   "hardlink"  重复文件在 _site 中使用硬链接（URL 不变，只节省磁盘空间）
+#   "media"     重复文件只输出为 /_media/<摘要>.<扩展名>，并改写 HTML 中的引用（浏览器缓存可共享）
+# 只对以 URL 引用的文件（src/href/poster）有效：Typst 的 image() 会以 data: URI 内嵌在页面中，
+# 不经过这里；开启 RESPONSIVE_IMAGES 后，内嵌的大图会按摘要写到 /_img/，同样可在页面间共享缓存
+DEDUPE_ASSETS: Literal["off", "hardlink", "media"] = "off"
+MEDIA_DIR = "_media"  # "media" 模式的输出目录（相对于 _site/）
+
+# 文章列表数据：为读取了 _posts.json 的列表页（如 content/Blog/index.typ）生成该目录的文章列表，
+# 列表页可通过 tufted-lib/listing.typ 中的 post-listing 渲染
+LISTING_DATA_FILE = "_posts.json"
+LISTING_PAGE_SIZE = 50  # 每页的文章数，超出时生成 /<目录>/page/<N>/ 分页；设为 0 不分页
+
+# 页面外框拼接：config.typ 中只修改了页眉、导航栏或页脚（CHROME_CONFIG_ARGS）时，只编译一次外框片段，
+# 再替换到已有页面中带 data-chrome 标记的位置，不再重新编译所有页面（tufted-lib/ 的修改仍会重新编译）
+CHROME_STITCHING = False
+CHROME_CONFIG_ARGS = ("header-links", "header-elements", "footer-elements")
+
+# 链接检查：页面数超过该值时使用进程池并行解析
+LINK_CHECK_POOL_THRESHOLD = 64
+
+# 预取提示：为导航栏链接（config.typ 中的 header-links）和列表页中的文章链接注入预取提示
+PREFETCH_HINTS = True  # 设为 False 关闭
+PREFETCH_MODE: Literal["speculationrules", "link", "both"] = "both"
+PREFETCH_NAV_LIMIT = 8  # 每个页面最多预取的导航链接数
+PREFETCH_ARTICLE_LIMIT = 10  # 每个列表页最多预取的文章链接数
+
+# 第三方资源：将页面中的外部样式表（如 cdnjs 上的 tufte.min.css）及其引用的字体等文件下载到
+# _site/assets/vendor/ 并改为本地引用。首次下载时在 VENDOR_LOCK_FILE 中记录内容摘要（请提交到仓库），
+# 之后内容不一致时拒绝使用；下载的文件缓存在 .build-cache/vendor/ 中，离线时也能构建
+VENDOR_STYLESHEETS = False  # 在本地构建并提交 VENDOR_LOCK_FILE 后设为 True；开启后再关闭会恢复为外部链接
+VENDOR_DIR = "assets/vendor"  # 输出目录（相对于 _site/）
+VENDOR_LOCK_FILE = Path("vendor-lock.json")
+# 为 True 时锁定文件中没有记录的 URL 视为错误，不会自动记录摘要（默认在 CI 中启用）
+VENDOR_LOCK_REQUIRED = bool(os.environ.get("CI"))
+# 为 <head> 中的外部脚本添加 defer，不再阻塞页面解析
+DEFER_SCRIPTS = True
+DEFER_SCRIPTS_EXCLUDE = ("/assets/theme-toggle.js",)  # 需要在首次绘制前执行（应用深色模式，避免闪烁）
+
+# 内联小文件：将不超过 INLINE_ASSET_LIMIT 字节的图片（content/ 中的资源与 assets/favicon.ico）
+# 以 data: URI 写入页面，省去单独的请求（SVG 使用 URL 编码，其他格式使用 base64）。
+# 被超过 INLINE_ASSET_MAX_PAGES 个页面引用的文件单独缓存更划算，不会内联；
+# 所有引用都已内联的文件不再输出到 _site。
+# 注意：Typst 的 image() 本来就以 data: URI 内嵌，这一步只处理以 URL 引用的文件（如手写 HTML 的
+# <img>、图标）；默认的 favicon.ico 较大且被所有页面引用，也不会内联，默认配置下站点没有可内联的文件
+INLINE_ASSETS = False  # 开启后再关闭会按记录还原为原来的引用
+INLINE_ASSET_LIMIT = 2048
+INLINE_ASSET_MAX_PAGES = 3
+
+# 数学公式 SVG：html.frame 将每个公式输出为包含字形轮廓的内联 SVG，重复的公式和字形会占用大量体积
+#   "off"       保持内联
+#   "external"  页面中重复出现或大于 MATH_SVG_INLINE_LIMIT 字节的公式输出为 /_math/<摘要>.svg，
+#               通过 <img> 引用，不同页面中相同的公式共用同一个文件
+#   "sprite"    每个页面的字形和重复的公式合并到页面开头的隐藏 SVG 中，通过 <use> 引用
+MATH_SVG: Literal["off", "external", "sprite"] = "off"
+MATH_SVG_INLINE_LIMIT = 4096
+MATH_DIR = "_math"  # "external" 模式的输出目录（相对于 _site/）
+
+# Web 字体：收集所有页面实际用到的字符，将字体子集化为 WOFF2 并生成 @font-face（需要安装 fonttools）
+#   family  CSS 中的字体名称（在 custom.css 中通过 font-family 使用）
+#   source  字体文件，可以放在 assets/ 中供 Typst 使用（不会被复制到 _site）
+#   weight / style  可选，默认为 "400" / "normal"
+# 例如: [{"family": "LXGW WenKai", "source": "assets/fonts/LXGWWenKai-Regular.ttf"}]
+WEBFONTS: list[dict[str, str]] = []
+WEBFONT_CHUNK_SIZE = 0  # 大于 0 时按字符的使用频率拆分为多个文件，每个文件最多 N 个字符
+FONTS_DIR = "_fonts"  # 输出目录（相对于 _site/）
+
+# Service Worker：预缓存核心 CSS/JS、导航页面和最近的文章，重复访问时直接从缓存打开
+SERVICE_WORKER = False  # 开启后再关闭会输出一个注销自身的 sw.js，已安装的浏览器会自动卸载
+SW_PRECACHE_POSTS = 10  # 预缓存最近的 N 篇文章（按 RSS 中的日期排序）
+SW_RUNTIME_LIMIT = 100  # 运行时缓存（浏览过的页面、带摘要的图片）各自最多保留的条目数
+
+# 缓存响应头：生成 _site/_headers（Netlify / Cloudflare Pages 格式）与等价的 nginx 配置片段，
+# 并将每个页面 <head> 中的站内 CSS/JS 写为 Link: rel=preload（支持 103 Early Hints 的平台会提前发送）
+# 只有 Netlify、Cloudflare Pages 等平台读取 _headers（GitHub Pages 会忽略），按部署平台开启
+CACHE_HEADERS = False
+CACHE_CONTROL = {
+    "immutable": "public, max-age=31536000, immutable",  # 以内容摘要命名的文件（/_media/、/_img/ 等）
+    "document": "public, max-age=0, must-revalidate",  # 页面、feed.xml、sitemap.xml、sw.js
+    "asset": "public, max-age=3600",  # 其他文件（assets/ 中的 CSS/JS 等），更新后最多一小时生效
+}
+NGINX_HEADERS_FILE = CACHE_DIR / "nginx-headers.conf"  # 在 nginx 的 server 块中 include（不会发布）
+
+# 图片属性：为 <img> 补充 width/height，首屏以外的图片懒加载
+IMAGE_ATTRIBUTES = True  # 设为 False 关闭
+EAGER_IMAGE_COUNT = 1  # 每个页面的前 N 张图片视为首屏图片，其中第一张标记 fetchpriority="high"
+
+# 响应式图片：为大图生成多种宽度的缩小版本并改写为 srcset（需要安装 Pillow）
+# Typst 内嵌的 data: 图片会先解码写到 _img/ 下，再作为普通文件生成各宽度版本
+RESPONSIVE_IMAGES = False  # 安装 Pillow 后设为 True 开启
+RESPONSIVE_WIDTHS = (480, 960, 1600)  # 生成的宽度档位，只生成小于原图宽度的档位
+RESPONSIVE_FORMATS = ("avif", "webp")  # 当前 Pillow 不支持 AVIF 时自动跳过
+RESPONSIVE_QUALITY = 80
+RESPONSIVE_SIZES = {  # <img sizes> 取值，与 tufted.css 中各栏的宽度对应
+    "marginnote": "(max-width: 760px) 100vw, 25vw",
+    "fullwidth": "90vw",
+    "default": "(max-width: 760px) 100vw, 55vw",
+}
+
+# 性能预算：键为页面 URL 的 glob 模式，值为各项指标的上限（字节数 / 请求数）
+# 一个页面匹配的所有规则按顺序合并，后面的规则覆盖前面的同名指标。默认不设预算，示例：
+#     "/*": {
+#         "html_bytes": 512 * 1024,  # HTML 文件大小（Typst 内嵌的图片也计算在内）
+#         "compressed_bytes": 256 * 1024,  # HTML 与引用的 CSS/JS/SVG 经 gzip 压缩后的总大小
+#         "image_bytes": 5 * 1024 * 1024,  # 引用的站内图片与内嵌图片的总大小
+#         "requests": 40,  # 子资源请求数（含外部资源）
+#     },
+#     "/Blog/*": {"html_bytes": 4 * 1024 * 1024},  # 图片较多的目录放宽限制
+# 可先运行 build --budget-report 查看各页面的实际指标，再据此设置
+PERFORMANCE_BUDGETS: dict[str, dict[str, int]] = {}
+BUDGET_FAIL = False  # 超出预算时是否让构建失败（也可使用 build --strict-budgets）
 
 
 @dataclass
@@ -64,6 +220,12 @@ class BuildStats:
     skipped: int = 0
     failed: int = 0
 
+    def merge(self, other: "BuildStats") -> None:
+        """累加另一组统计信息"""
+        self.success += other.success
+        self.skipped += other.skipped
+        self.failed += other.failed
+
     def format_summary(self) -> str:
         """格式化统计摘要"""
         parts = []
@@ -123,6 +285,183 @@ class HTMLMetadataParser(HTMLParser):
             self.metadata["title"] += data
 
 
+# ============================================================================
+# 文件系统快照
+# ============================================================================
+
+
+class TreeSnapshot:
+    """
+    目录树快照。
+
+    通过一次 os.scandir 遍历记录目录树中所有文件的修改时间与大小，
+    构建的各个阶段都从快照中查询，而不是各自重复遍历和 stat。
+    写入文件后应调用 refresh_snapshot() 更新对应条目。
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.files: dict[str, tuple[int, int]] = {}  # 相对路径 -> (mtime_ns, size)
+        self.dirs: dict[str, list[str]] = {}  # 相对目录 -> 目录下的文件名（"" 表示根目录）
+        self.temp_files: list[str] = []  # 被忽略的临时文件（TEMP_PREFIX 开头）
+        self._scan()
+
+    def _scan(self) -> None:
+        root = str(self.root)
+        stack = [""]
+        while stack:
+            rel_dir = stack.pop()
+            names: list[str] = []
+            try:
+                with os.scandir(os.path.join(root, rel_dir) if rel_dir else root) as entries:
+                    for entry in entries:
+                        rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                        if entry.is_dir():
+                            stack.append(rel)
+                        elif entry.is_file() and entry.name.startswith(TEMP_PREFIX):
+                            self.temp_files.append(rel)
+                        elif entry.is_file():
+                            stat = entry.stat()
+                            self.files[rel] = (stat.st_mtime_ns, stat.st_size)
+                            names.append(entry.name)
+            except OSError:
+                continue
+            self.dirs[rel_dir] = names
+
+    def signature(self, rel: str) -> list[int] | None:
+        """获取文件签名 [mtime_ns, size]，与 file_signature() 的结果一致"""
+        entry = self.files.get(rel)
+        return list(entry) if entry else None
+
+    def mtime_ns(self, rel: str) -> int:
+        """获取文件的纳秒级修改时间，文件不存在返回 0"""
+        entry = self.files.get(rel)
+        return entry[0] if entry else 0
+
+    def listdir(self, rel_dir: str) -> list[str]:
+        """列出目录下的文件名（不含子目录）"""
+        return self.dirs.get(rel_dir, [])
+
+    def refresh(self, rel: str) -> None:
+        """重新读取单个文件的状态"""
+        parent, _, name = rel.rpartition("/")
+        try:
+            stat = os.stat(os.path.join(self.root, rel))
+        except OSError:
+            if self.files.pop(rel, None) is not None:
+                self.dirs.get(parent, []).remove(name)
+            return
+        if rel not in self.files:
+            self.dirs.setdefault(parent, []).append(name)
+        self.files[rel] = (stat.st_mtime_ns, stat.st_size)
+
+
+# 已扫描的快照，键为根目录
+_snapshots: dict[Path, TreeSnapshot] = {}
+# content/ 与 _site/ 之外的文件（如 config.typ、tufted-lib/）的签名，构建期间不会变化
+_outside_signatures: dict[str, list[int] | None] = {}
+
+
+def get_snapshot(root: Path) -> TreeSnapshot:
+    """
+    获取目录树快照，首次调用时扫描。
+
+    参数:
+        root: 根目录（如 CONTENT_DIR、SITE_DIR）
+
+    返回:
+        TreeSnapshot: 快照
+    """
+    if root not in _snapshots:
+        _snapshots[root] = TreeSnapshot(root)
+    return _snapshots[root]
+
+
+def invalidate_snapshots(root: Path | None = None) -> None:
+    """
+    丢弃快照，下次查询时重新扫描。
+
+    参数:
+        root: 要丢弃的根目录，为 None 时丢弃所有快照
+    """
+    if root is None:
+        _snapshots.clear()
+        _outside_signatures.clear()
+    else:
+        _snapshots.pop(root, None)
+
+
+def snapshot_key(path: Path, root: Path) -> str | None:
+    """
+    计算路径在某个快照中的键。
+
+    参数:
+        path: 文件路径（相对于项目根目录或绝对路径）
+        root: 快照根目录
+
+    返回:
+        str | None: 相对于 root 的 POSIX 路径（root 本身为 ""），不在 root 下时返回 None
+    """
+    # 这里会被频繁调用，直接比较字符串前缀，避免 Path.relative_to() 的开销
+    path_str, root_str = os.fspath(path), os.fspath(root)
+    if os.path.isabs(path_str):
+        cwd = os.getcwd() + os.sep
+        if not path_str.startswith(cwd):
+            return None
+        path_str = path_str[len(cwd) :]
+    if path_str == root_str:
+        return ""
+    if not path_str.startswith(root_str + os.sep):
+        return None
+    return path_str[len(root_str) + 1 :].replace(os.sep, "/")
+
+
+def refresh_snapshot(path: Path) -> None:
+    """
+    在写入文件后更新已存在的快照（快照尚未扫描时无需处理）。
+
+    参数:
+        path: 被写入或删除的文件路径
+    """
+    for root, snapshot in _snapshots.items():
+        if (rel := snapshot_key(path, root)) is not None:
+            snapshot.refresh(rel)
+
+
+def path_signature(path: Path) -> list[int] | None:
+    """
+    获取任意文件的签名，content/ 与 _site/ 下的文件从快照中查询。
+
+    参数:
+        path: 文件路径
+
+    返回:
+        list[int] | None: [mtime_ns, size]，文件不存在返回 None
+    """
+    for root in (CONTENT_DIR, SITE_DIR):
+        if (rel := snapshot_key(path, root)) is not None:
+            return get_snapshot(root).signature(rel)
+
+    key = str(path)
+    if key not in _outside_signatures:
+        _outside_signatures[key] = file_signature(path)
+    return _outside_signatures[key]
+
+
+def path_mtime_ns(path: Path) -> int:
+    """
+    获取任意文件的纳秒级修改时间，文件不存在返回 0。
+
+    参数:
+        path: 文件路径
+
+    返回:
+        int: 修改时间
+    """
+    signature = path_signature(path)
+    return signature[0] if signature else 0
+
+
 # ============================================================================
 # 增量编译辅助函数
 # ============================================================================
@@ -183,28 +522,40 @@ def is_dep_file(path: Path) -> bool:
         return True
 
 
+# 以字面路径读取数据文件的函数调用，如 json("_posts.json")、read("/data/links.txt")
+DATA_LOAD_PATTERN = re.compile(r'\b(json|yaml|toml|csv|xml|cbor|read)\(\s*"([^"]+)"')
+
+
 def find_typ_dependencies(typ_file: Path) -> set[Path]:
     """
-    解析 .typ 文件中的依赖（通过 #import 和 #include 导入的文件）。
+    解析 .typ 文件中的依赖（通过 #import 和 #include 导入的文件，
+    以及通过 json()、read() 等函数以字面路径读取的数据文件）。
 
-    只追踪 .typ 文件的依赖，忽略 content/ 下的普通页面文件。
+    导入的 .typ 文件忽略 content/ 下的普通页面文件；数据文件即使尚不存在也会被记录
+    （如构建时生成的 _posts.json），文件出现后即可触发重新编译。
     其他资源文件（如 .md, .bib, 图片等）通过 copy_content_assets 处理。
 
     参数:
         typ_file: .typ 文件路径
 
     返回:
-        set[Path]: 依赖的 .typ 文件路径集合
+        set[Path]: 依赖的 .typ 文件与数据文件路径集合
     """
     dependencies: set[Path] = set()
 
+    # 包的 typst.toml 依赖包的入口文件
+    if typ_file.name == "typst.toml":
+        entrypoint = package_entrypoint(typ_file)
+        return {entrypoint.resolve()} if entrypoint else dependencies
+
     try:
         content = typ_file.read_text(encoding="utf-8")
     except Exception:
         return dependencies
 
-    # 获取文件所在目录，用于解析相对路径
+    # 获取文件所在目录，用于解析相对路径；包内文件的 "/" 指向包的根目录
     base_dir = typ_file.parent
+    root = find_package_root(typ_file) or Path(".")
 
     patterns = [
         r'#import\s+"([^"]+)"',
@@ -217,14 +568,16 @@ def find_typ_dependencies(typ_file: Path) -> set[Path]:
         for match in re.finditer(pattern, content):
             dep_path_str = match.group(1)
 
-            # 跳过包导入（如 @preview/xxx）
+            # 包导入（如 @preview/xxx:1.0.0）：依赖包的 typst.toml，再由它追踪包中的文件
             if dep_path_str.startswith("@"):
+                if manifest := resolve_package(dep_path_str):
+                    dependencies.add(manifest.resolve())
                 continue
 
             # 解析相对路径
             if dep_path_str.startswith("/"):
-                # 相对于项目根目录的路径
-                dep_path = Path(dep_path_str.lstrip("/"))
+                # 相对于项目根目录（或包的根目录）的路径
+                dep_path = root / dep_path_str.lstrip("/")
             else:
                 # 相对于当前文件的路径
                 dep_path = base_dir / dep_path_str
@@ -237,90 +590,207 @@ def find_typ_dependencies(typ_file: Path) -> set[Path]:
             except Exception:
                 pass
 
+    for match in DATA_LOAD_PATTERN.finditer(content):
+        dep_path_str = match.group(2)
+        if "://" in dep_path_str:
+            continue
+        if dep_path_str.startswith("/"):
+            dep_path = root / dep_path_str.lstrip("/")
+        else:
+            dep_path = base_dir / dep_path_str
+        try:
+            dependencies.add(dep_path.resolve())
+        except Exception:
+            pass
+
     return dependencies
 
 
-def get_all_dependencies(typ_file: Path, visited: set[Path] | None = None) -> set[Path]:
+# 直接依赖缓存：{源文件: [mtime_ns, size, [依赖路径...]]}，首次使用时从 .build-cache/deps.json 加载
+_deps_cache: dict[str, list] | None = None
+_deps_cache_dirty = False
+# 依赖解析规则变化时递增，丢弃按旧规则解析的缓存
+DEPS_CACHE_VERSION = 3
+
+
+def cached_typ_dependencies(typ_file: Path) -> set[Path]:
     """
-    递归获取 .typ 文件的所有依赖（包括传递依赖）。
+    获取 .typ 文件的直接依赖，结果按文件签名缓存，文件未变化时不会重新读取和解析。
 
     参数:
         typ_file: .typ 文件路径
-        visited: 已访问的文件集合（用于避免循环依赖）
 
     返回:
-        set[Path]: 所有依赖文件路径集合
+        set[Path]: 依赖的 .typ 文件与数据文件路径集合
     """
-    if visited is None:
-        visited = set()
+    global _deps_cache, _deps_cache_dirty
+    if _deps_cache is None:
+        # 包的解析位置取决于 PACKAGE_DIR 是否存在，变化后重新解析
+        version = [DEPS_CACHE_VERSION, PACKAGE_DIR.is_dir()]
+        _deps_cache = load_cache("deps")
+        if _deps_cache.get("version") != version:
+            _deps_cache = {"version": version}
+
+    signature = path_signature(typ_file)
+    key = typ_file.as_posix()
+    entry = _deps_cache.get(key)
+    if signature and entry and entry[:2] == signature:
+        return {Path(p) for p in entry[2]}
+
+    dependencies = find_typ_dependencies(typ_file)
+    if signature:
+        _deps_cache[key] = [*signature, sorted(str(p) for p in dependencies)]
+        _deps_cache_dirty = True
+    return dependencies
 
-    # 避免循环依赖
-    abs_path = typ_file.resolve()
-    if abs_path in visited:
-        return set()
-    visited.add(abs_path)
 
-    all_deps: set[Path] = set()
-    direct_deps = find_typ_dependencies(typ_file)
+def save_dependency_cache() -> None:
+    """
+    将依赖缓存写回 .build-cache/deps.json（没有变化时不写入）。
+    """
+    global _deps_cache_dirty
+    if _deps_cache is not None and _deps_cache_dirty:
+        save_cache("deps", _deps_cache)
+        _deps_cache_dirty = False
 
-    for dep in direct_deps:
-        all_deps.add(dep)
-        # 只对 .typ 文件递归查找依赖
-        if dep.suffix == ".typ":
-            all_deps.update(get_all_dependencies(dep, visited))
 
-    return all_deps
+def import_chains(typ_file: Path) -> dict[Path, list[Path]]:
+    """
+    获取 .typ 文件的所有传递依赖，以及每个依赖的导入链。
 
+    参数:
+        typ_file: .typ 文件路径
 
-def needs_rebuild(source: Path, target: Path, extra_deps: list[Path] | None = None) -> bool:
+    返回:
+        dict[Path, list[Path]]: {依赖文件: [typ_file, ..., 依赖文件]}，导入链为最短路径
+    """
+    from collections import deque
+
+    chains: dict[Path, list[Path]] = {}
+    visited = {os.path.abspath(typ_file)}
+    queue = deque([[typ_file]])
+    while queue:
+        chain = queue.popleft()
+        for dep in sorted(cached_typ_dependencies(chain[-1])):
+            if (key := os.path.abspath(dep)) in visited:
+                continue
+            visited.add(key)
+            chains[dep] = chain + [dep]
+            if dep.suffix == ".typ" or dep.name == "typst.toml":
+                queue.append(chains[dep])
+    return chains
+
+
+@dataclass
+class RebuildReason:
+    """页面需要重新编译的原因"""
+
+    reason: str
+    trigger: Path | None = None  # 触发重建的文件
+    chain: list[Path] = field(default_factory=list)  # 从源文件到触发文件的导入链
+
+    def format(self) -> str:
+        """格式化为一行说明"""
+        if self.trigger is None:
+            return self.reason
+        return f"{self.reason}: {display_path(self.trigger)}"
+
+
+def display_path(path: Path | str) -> str:
     """
-    判断是否需要重新构建。
+    将路径显示为相对于项目根目录的 POSIX 路径（不在项目中时显示原路径）；
+    Typst 包中的文件显示为 "@preview/name:version/文件"
+    """
+    absolute = os.path.abspath(path)
+    for directory in (PACKAGE_DIR, *system_package_dirs()):
+        parts = Path(os.path.relpath(absolute, os.path.abspath(directory))).parts
+        if len(parts) >= 4 and ".." not in parts:
+            return f"@{parts[0]}/{parts[1]}:{parts[2]}/" + "/".join(parts[3:])
+    relative = os.path.relpath(absolute)
+    return Path(path).as_posix() if relative.startswith("..") else Path(relative).as_posix()
+
+
+def rebuild_reason(
+    source: Path,
+    target: Path,
+    extra_deps: list[Path] | None = None,
+    ignored: Path | None = None,
+) -> RebuildReason | None:
+    """
+    判断是否需要重新构建，并给出原因。
 
     当以下任一条件满足时需要重建：
     1. 目标文件不存在
     2. 源文件比目标文件新
     3. 任何额外依赖文件比目标文件新
-    4. 源文件的任何导入依赖比目标文件新
+    4. 源文件的任何导入依赖（包括读取的数据文件）比目标文件新
     5. 源文件同目录下的任何非 .typ 文件比目标文件新（如 .md, .bib, 图片等）
 
     参数:
         source: 源文件路径
         target: 目标文件路径
         extra_deps: 额外的依赖文件列表（如 config.typ）
+        ignored: 不检查的依赖文件（外框拼接时为 config.typ）
 
     返回:
-        bool: 是否需要重新构建
+        RebuildReason | None: 需要重建时返回原因，否则返回 None
     """
-    # 目标不存在，需要构建
-    if not target.exists():
-        return True
+    ignored_key = os.path.abspath(ignored) if ignored else None
+
+    # 所有修改时间都从文件系统快照中查询，不会重复 stat
+    target_mtime = path_mtime_ns(target)
 
-    target_mtime = get_file_mtime(target)
+    # 目标不存在，需要构建
+    if not target_mtime:
+        return RebuildReason("目标文件不存在", target)
 
     # 源文件更新了
-    if get_file_mtime(source) > target_mtime:
-        return True
+    if path_mtime_ns(source) > target_mtime:
+        return RebuildReason("源文件已修改", source)
 
     # 检查额外依赖
     if extra_deps:
         for dep in extra_deps:
-            if dep.exists() and get_file_mtime(dep) > target_mtime:
-                return True
+            if os.path.abspath(dep) != ignored_key and path_mtime_ns(dep) > target_mtime:
+                return RebuildReason("公共依赖已修改", dep, [source, dep])
 
     # 检查源文件的导入依赖
-    for dep in get_all_dependencies(source):
-        if get_file_mtime(dep) > target_mtime:
-            return True
+    for dep, chain in import_chains(source).items():
+        if os.path.abspath(dep) != ignored_key and path_mtime_ns(dep) > target_mtime:
+            reason = "导入的文件已修改" if dep.suffix == ".typ" else "读取的数据文件已修改"
+            return RebuildReason(reason, dep, chain)
 
     # 检查源文件同目录下的非 .typ 资源文件（如 .md, .bib, 图片等）
     # 只检查同一目录，不递归子目录，避免过度重编译
-    source_dir = source.parent
-    for item in source_dir.iterdir():
-        if item.is_file() and item.suffix != ".typ":
-            if get_file_mtime(item) > target_mtime:
-                return True
+    content = get_snapshot(CONTENT_DIR)
+    rel_dir = snapshot_key(source.parent, CONTENT_DIR)
+    if rel_dir is not None:
+        prefix = f"{rel_dir}/" if rel_dir else ""
+        for name in content.listdir(rel_dir):
+            if not name.endswith(".typ") and content.mtime_ns(prefix + name) > target_mtime:
+                return RebuildReason("同目录的文件已修改", CONTENT_DIR / (prefix + name))
+    else:
+        for item in source.parent.iterdir():
+            if item.is_file() and item.suffix != ".typ":
+                if path_mtime_ns(item) > target_mtime:
+                    return RebuildReason("同目录的文件已修改", item)
+
+    return None
+
+
+def needs_rebuild(source: Path, target: Path, extra_deps: list[Path] | None = None) -> bool:
+    """
+    判断是否需要重新构建（判断规则见 rebuild_reason()）。
+
+    参数:
+        source: 源文件路径
+        target: 目标文件路径
+        extra_deps: 额外的依赖文件列表（如 config.typ）
 
-    return False
+    返回:
+        bool: 是否需要重新构建
+    """
+    return rebuild_reason(source, target, extra_deps) is not None
 
 
 def find_common_dependencies() -> list[Path]:
@@ -338,817 +808,5486 @@ def find_common_dependencies() -> list[Path]:
 
     # 可以在这里添加其他公共依赖
     # 例如：查找 content/_* 目录下的模板文件
-    if CONTENT_DIR.exists():
-        for item in CONTENT_DIR.iterdir():
-            if item.is_dir() and item.name.startswith("_"):
-                for typ_file in item.rglob("*.typ"):
-                    common_deps.append(typ_file)
+    for rel in get_snapshot(CONTENT_DIR).files:
+        if rel.startswith("_") and "/" in rel and rel.endswith(".typ"):
+            common_deps.append(CONTENT_DIR / rel)
 
     return common_deps
 
 
+def find_dependent_pages(
+    path: Path, pages: list[Path], common_deps: list[Path]
+) -> dict[Path, list[Path]]:
+    """
+    查找修改指定文件后需要重新编译的页面（rebuild_reason() 的反向查询）。
+
+    参数:
+        path: 任意文件路径
+        pages: 候选页面列表
+        common_deps: 公共依赖列表
+
+    返回:
+        dict[Path, list[Path]]: {页面: 从页面到该文件的依赖链}，公共依赖的依赖链为空
+    """
+    target = os.path.abspath(path)
+    is_common = target in {os.path.abspath(dep) for dep in common_deps}
+    dependents: dict[Path, list[Path]] = {}
+
+    for page in pages:
+        if os.path.abspath(page) == target:
+            continue
+        if is_common:
+            dependents[page] = []
+        elif path.suffix != ".typ" and os.path.dirname(os.path.abspath(page)) == os.path.dirname(
+            target
+        ):
+            dependents[page] = [page, path]
+        else:
+            for dep, chain in import_chains(page).items():
+                if os.path.abspath(dep) == target:
+                    dependents[page] = chain
+                    break
+
+    return dependents
+
+
 # ============================================================================
-# 辅助函数
+# Typst 包
 # ============================================================================
 
 
-def find_typ_files() -> list[Path]:
+# 包导入，如 "@preview/theorion:0.4.1"
+PACKAGE_SPEC_PATTERN = re.compile(r"@([a-z0-9][a-z0-9-]*)/([A-Za-z0-9_-]+):(\d+\.\d+\.\d+)")
+PACKAGE_REGISTRY_URL = "https://packages.typst.org"
+
+
+def system_package_dirs() -> tuple[Path, Path]:
     """
-    查找 content/ 目录下所有 .typ 文件，排除路径中包含以下划线开头的目录的文件。
+    返回 Typst 默认的本地包目录与 @preview 包的下载缓存目录（与 typst 命令的规则一致）。
 
     返回:
-        list[Path]: .typ 文件路径列表
+        tuple[Path, Path]: (本地包目录, 下载缓存目录)，目录内的结构为 <namespace>/<name>/<version>/
     """
-    typ_files = []
-    for typ_file in CONTENT_DIR.rglob("*.typ"):
-        # 检查路径中是否有以下划线开头的目录
-        parts = typ_file.relative_to(CONTENT_DIR).parts
-        if not any(part.startswith("_") for part in parts):
-            typ_files.append(typ_file)
-    return typ_files
+    home = Path.home()
+    if sys.platform == "win32":
+        data = Path(os.environ.get("APPDATA") or home)
+        cache = Path(os.environ.get("LOCALAPPDATA") or home)
+    elif sys.platform == "darwin":
+        data = home / "Library" / "Application Support"
+        cache = home / "Library" / "Caches"
+    else:
+        data = Path(os.environ.get("XDG_DATA_HOME") or home / ".local" / "share")
+        cache = Path(os.environ.get("XDG_CACHE_HOME") or home / ".cache")
+
+    return (
+        Path(os.environ.get("TYPST_PACKAGE_PATH") or data / "typst" / "packages"),
+        Path(os.environ.get("TYPST_PACKAGE_CACHE_PATH") or cache / "typst" / "packages"),
+    )
 
 
-def get_file_output_path(typ_file: Path, type: Literal["pdf", "html"]) -> Path:
+def typst_package_dirs() -> list[Path]:
     """
-    获取 .typ 文件的输出路径。
+    按 Typst 的查找顺序返回包目录：本地包目录（有 PACKAGE_DIR 时为 PACKAGE_DIR，
+    与 --package-path 对应），然后是 @preview 包的下载缓存目录。
+
+    返回:
+        list[Path]: 包目录列表
+    """
+    local, cache = system_package_dirs()
+    return [PACKAGE_DIR if PACKAGE_DIR.is_dir() else local, cache]
+
+
+def package_args() -> list[str]:
+    """已执行 build.py vendor 时，让 Typst 从 PACKAGE_DIR 中查找包"""
+    return ["--package-path", str(PACKAGE_DIR)] if PACKAGE_DIR.is_dir() else []
+
+
+def resolve_package(spec: str) -> Path | None:
+    """
+    查找包导入对应的 typst.toml。
+
+    包尚未下载时返回它将被下载到的位置，下载后依赖追踪即可读取包的内容。
 
     参数:
-        typ_file: .typ 文件路径 (相对于 content/)
+        spec: 包导入字符串（如 "@preview/theorion:0.4.1"）
 
     返回:
-        Path: 文件输出路径 (在 _site/ 目录下)
+        Path | None: typst.toml 的路径，不是合法的包导入时返回 None
     """
-    relative_path = typ_file.relative_to(CONTENT_DIR)
-    return SITE_DIR / relative_path.with_suffix(f".{type}")
+    match = PACKAGE_SPEC_PATTERN.fullmatch(spec)
+    if not match:
+        return None
+    namespace, name, version = match.groups()
+    local, cache = typst_package_dirs()
+    candidates = [local / namespace / name / version / "typst.toml"]
+    if namespace == "preview":
+        candidates.append(cache / namespace / name / version / "typst.toml")
+    return next((path for path in candidates if path.exists()), candidates[-1])
+
+
+def package_entrypoint(manifest: Path) -> Path | None:
+    """读取 typst.toml 中的 entrypoint，返回包的入口文件"""
+    try:
+        text = manifest.read_text(encoding="utf-8")
+    except OSError:
+        return None
+    match = re.search(r'^\s*entrypoint\s*=\s*"([^"]+)"', text, re.MULTILINE)
+    return manifest.parent / match.group(1) if match else None
+
+
+def find_package_root(path: Path) -> Path | None:
+    """查找文件所属的 Typst 包的根目录（包含 typst.toml 的目录），不在包中时返回 None"""
+    project_root = os.path.abspath(".")
+    for parent in Path(os.path.abspath(path)).parents:
+        if str(parent) == project_root:
+            break
+        if (parent / "typst.toml").is_file():
+            return parent
+    return None
+
+
+def find_package_imports(path: Path) -> set[str]:
+    """列出 .typ 文件中的所有包导入（如 "@preview/theorion:0.4.1"）"""
+    try:
+        text = path.read_text(encoding="utf-8")
+    except (OSError, UnicodeDecodeError):
+        return set()
+    return {match.group(0) for match in PACKAGE_SPEC_PATTERN.finditer(text)}
+
+
+def directory_digest(directory: Path) -> str:
+    """按相对路径与文件内容计算目录的 SHA-256 摘要"""
+    digest = hashlib.sha256()
+    for path in sorted(p for p in directory.rglob("*") if p.is_file()):
+        digest.update(path.relative_to(directory).as_posix().encode() + b"\0")
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
 
 
-def run_typst_command(args: list[str]) -> bool:
+def fetch_package(spec: str, target: Path) -> bool:
     """
-    运行 typst 命令。
+    将包放入 target：优先从本机的 Typst 包目录复制，否则从官方仓库下载（仅 @preview）。
 
     参数:
-        args: typst 命令参数列表
+        spec: 包导入字符串
+        target: 目标目录（PACKAGE_DIR/<namespace>/<name>/<version>）
 
     返回:
-        bool: 命令是否成功执行
+        bool: 是否成功
     """
+    import tarfile
+    import tempfile
+    import urllib.request
+
+    namespace, name, version = PACKAGE_SPEC_PATTERN.fullmatch(spec).groups()
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temp = Path(tempfile.mkdtemp(prefix=TEMP_PREFIX, dir=target.parent))
+
     try:
-        result = subprocess.run(["typst"] + args, capture_output=True, text=True, encoding="utf-8")
-        if result.returncode != 0:
-            print(f"  ❌ Typst 错误: {result.stderr.strip()}")
+        # 本机已有的包（typst 编译时下载的缓存或本地包）
+        for directory in system_package_dirs():
+            source = directory / namespace / name / version
+            if (source / "typst.toml").is_file():
+                shutil.copytree(source, temp, dirs_exist_ok=True)
+                os.replace(temp, target)
+                print(f"  📦 {spec}（从 {source} 复制）")
+                return True
+
+        if namespace != "preview":
+            print(f"  ❌ {spec}: 本机没有这个包，且只有 @preview 包可以下载")
             return False
+
+        url = f"{PACKAGE_REGISTRY_URL}/{namespace}/{name}-{version}.tar.gz"
+        with urllib.request.urlopen(url, timeout=60) as response:
+            data = response.read()
+        with tarfile.open(fileobj=io.BytesIO(data), mode="r:gz") as archive:
+            for member in archive.getmembers():
+                member_path = Path(member.name)
+                if member_path.is_absolute() or ".." in member_path.parts:
+                    raise ValueError(f"压缩包中包含不安全的路径: {member.name}")
+                if not (member.isfile() or member.isdir()):
+                    raise ValueError(f"压缩包中包含链接或特殊文件: {member.name}")
+            if hasattr(tarfile, "data_filter"):
+                archive.extractall(temp, filter="data")
+            else:
+                archive.extractall(temp)
+        os.replace(temp, target)
+        print(f"  📦 {spec}（已下载 {format_size(len(data))}）")
         return True
-    except FileNotFoundError:
-        print("  ❌ 错误: 未找到 typst 命令。请确保已安装 Typst 并添加到 PATH 环境变量中。")
-        print("  📝 安装说明: https://typst.app/open-source/#download")
-        return False
     except Exception as e:
-        print(f"  ❌ 执行 typst 命令时出错: {e}")
+        print(f"  ❌ {spec} 获取失败: {e}")
         return False
+    finally:
+        shutil.rmtree(temp, ignore_errors=True)
 
 
-# ============================================================================
-# 构建命令
-# ============================================================================
-
-
-def _compile_files(
-    files: list[Path],
-    force: bool,
-    common_deps: list[Path],
-    get_output_path_func,
-    build_args_func,
-) -> BuildStats:
+def vendor_packages(prune: bool = False) -> bool:
     """
-    通用文件编译函数，减少重复代码。
+    将页面用到的所有 Typst 包（包括包自身依赖的包）放入 PACKAGE_DIR。
+
+    之后的构建通过 --package-path 使用这些包，不再需要下载，可以完全离线运行。
+    每个包的内容摘要与使用它的页面记录在 PACKAGE_DIR/vendor.json 中，
+    再次运行时会检查已有的包是否被修改。
 
     参数:
-        files: 要编译的文件列表
-        force: 是否强制重建
-        common_deps: 公共依赖列表
-        get_output_path_func: 获取输出路径的函数
-        build_args_func: 构建编译参数的函数
+        prune: 是否删除不再被任何页面使用的包
 
     返回:
-        BuildStats: 构建统计信息
+        bool: 所有包是否都已就绪
     """
-    stats = BuildStats()
-
-    for typ_file in files:
-        output_path = get_output_path_func(typ_file)
+    print("正在收集页面用到的 Typst 包...")
+
+    # 页面及其导入的项目文件中的包导入
+    users: dict[str, set[str]] = {}
+    for page in find_page_files("html") + find_page_files("pdf"):
+        sources = [page] + [
+            dep
+            for dep in import_chains(page)
+            if dep.suffix == ".typ" and find_package_root(dep) is None
+        ]
+        for source in sources:
+            for spec in find_package_imports(source):
+                users.setdefault(spec, set()).add(display_path(page))
 
-        # 增量编译检查
-        if not force and not needs_rebuild(typ_file, output_path, common_deps):
-            stats.skipped += 1
+    lock_path = PACKAGE_DIR / "vendor.json"
+    try:
+        lock = json.loads(lock_path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        lock = {}
+
+    new_lock: dict[str, dict] = {}
+    queue = sorted(users, reverse=True)
+    failed = 0
+    while queue:
+        spec = queue.pop()
+        namespace, name, version = PACKAGE_SPEC_PATTERN.fullmatch(spec).groups()
+        target = PACKAGE_DIR / namespace / name / version
+
+        if not target.is_dir() and not fetch_package(spec, target):
+            failed += 1
             continue
 
-        output_path.parent.mkdir(parents=True, exist_ok=True)
+        digest = directory_digest(target)
+        if spec in lock and lock[spec].get("sha256") != digest:
+            print(f"  ⚠️ {spec} 的内容与 vendor.json 中记录的摘要不一致，可能被手动修改过")
+        new_lock[spec] = {"sha256": digest, "used-by": sorted(users.get(spec, set()))}
+
+        # 包自身导入的其他包
+        for typ_file in sorted(target.rglob("*.typ")):
+            for dependency in find_package_imports(typ_file):
+                users.setdefault(dependency, set()).add(spec)
+                if dependency not in new_lock and dependency not in queue:
+                    queue.append(dependency)
+
+    for spec in new_lock:
+        new_lock[spec]["used-by"] = sorted(users.get(spec, set()))
+
+    # 未被使用的包
+    unused = []
+    if PACKAGE_DIR.is_dir():
+        for manifest in sorted(PACKAGE_DIR.glob("*/*/*/typst.toml")):
+            namespace, name, version = manifest.parent.relative_to(PACKAGE_DIR).parts
+            if f"@{namespace}/{name}:{version}" not in new_lock:
+                unused.append(manifest.parent)
+    for directory in unused:
+        if prune:
+            shutil.rmtree(directory)
+            print(f"  🗑️ 已删除未使用的包: {directory.relative_to(PACKAGE_DIR).as_posix()}")
+        else:
+            print(f"  ⚠️ 未使用的包: {directory.relative_to(PACKAGE_DIR).as_posix()}（使用 --prune 删除）")
 
-        # 构建编译参数
-        args = build_args_func(typ_file, output_path)
+    if new_lock or PACKAGE_DIR.is_dir():
+        PACKAGE_DIR.mkdir(parents=True, exist_ok=True)
+        text = json.dumps(dict(sorted(new_lock.items())), ensure_ascii=False, indent=2)
+        atomic_write_text(lock_path, text + "\n")
 
-        if run_typst_command(args):
-            stats.success += 1
-        else:
-            print(f"  ❌ {typ_file} 编译失败")
-            stats.failed += 1
+    # 包的解析位置变了，重新解析所有依赖
+    save_cache("deps", {})
 
-    return stats
+    if failed:
+        print(f"⚠ {failed} 个包获取失败。")
+        return False
+    print(f"✅ 共 {len(new_lock)} 个包已放入 {PACKAGE_DIR}/，之后的构建将不再下载包。")
+    return True
+
+
+# ============================================================================
+# 性能分析
+# ============================================================================
 
 
-def build_html(force: bool = False) -> bool:
+@dataclass
+class Profiler:
     """
-    编译所有 .typ 文件为 HTML（文件名中包含 PDF 的除外）。
+    构建性能分析器。
 
-    参数:
-        force: 是否强制重建所有文件
+    记录构建各阶段以及每个 Typst 子进程的墙钟时间、CPU 时间和峰值内存，
+    可导出为 Chrome / Perfetto 能打开的 trace JSON。
     """
-    SITE_DIR.mkdir(parents=True, exist_ok=True)
 
-    typ_files = find_typ_files()
+    events: list[dict] = field(default_factory=list)
+    processes: list[dict] = field(default_factory=list)  # 每个 Typst 子进程的统计
+    origin: float = field(default_factory=time.perf_counter)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
 
-    # 排除标记为 PDF 的文件
-    html_files = [f for f in typ_files if "pdf" not in f.stem.lower()]
+    def _event(self, name: str, category: str, start: float, wall: float, args: dict) -> None:
+        with self._lock:
+            self.events.append(
+                {
+                    "name": name,
+                    "cat": category,
+                    "ph": "X",
+                    "ts": round((start - self.origin) * 1e6),
+                    "dur": round(wall * 1e6),
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                    "args": args,
+                }
+            )
 
-    if not html_files:
-        print("  ⚠️ 未找到任何 HTML 文件。")
-        return True
+    @contextmanager
+    def span(self, name: str, category: str = "stage") -> Iterator[None]:
+        """记录一个代码块的墙钟时间与 CPU 时间（含期间结束的子进程）"""
+        start, cpu_start = time.perf_counter(), os.times()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start
+            cpu_end = os.times()
+            cpu = sum(cpu_end[:4]) - sum(cpu_start[:4])
+            args = {"cpu_ms": round(cpu * 1000, 3)}
+            if (peak := peak_rss()) is not None:
+                args["peak_rss_mb"] = round(peak / 2**20, 1)
+            self._event(name, category, start, wall, args)
+
+    def record_process(
+        self, name: str, start: float, wall: float, cpu: float | None, max_rss: int | None
+    ) -> None:
+        """记录一个子进程的运行统计"""
+        args = {}
+        if cpu is not None:
+            args["cpu_ms"] = round(cpu * 1000, 3)
+        if max_rss is not None:
+            args["peak_rss_mb"] = round(max_rss / 2**20, 1)
+        self._event(name, "typst", start, wall, args)
+        with self._lock:
+            self.processes.append({"name": name, "wall": wall, "cpu": cpu, "max_rss": max_rss})
+
+    def write_trace(self, output: Path) -> None:
+        """导出 Chrome Trace Event 格式的 JSON"""
+        pid = os.getpid()
+        main_thread = threading.main_thread().ident
+        workers = sorted({e["tid"] for e in self.events} - {main_thread})
+        metadata = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": "build.py"}}]
+        names = {main_thread: "main"} | {t: f"worker-{i}" for i, t in enumerate(workers)}
+        for tid, name in names.items():
+            metadata.append(
+                {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            )
+        output.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_text(output, json.dumps({"traceEvents": metadata + self.events}))
 
-    print("正在构建 HTML 文件...")
+    def format_slowest(self, limit: int) -> str:
+        """格式化最慢的 Typst 编译列表"""
+        slowest = sorted(self.processes, key=lambda p: p["wall"], reverse=True)[:limit]
+        lines = [f"⏱️ 最慢的 {len(slowest)} 个页面:"]
+        for p in slowest:
+            detail = f"{p['wall'] * 1000:8.0f} ms"
+            if p["cpu"] is not None:
+                detail += f"  CPU {p['cpu'] * 1000:6.0f} ms"
+            if p["max_rss"] is not None:
+                detail += f"  内存峰值 {format_size(p['max_rss'])}"
+            lines.append(f"  {detail}  {p['name']}")
+        return "\n".join(lines)
 
-    # 获取公共依赖
-    common_deps = find_common_dependencies()
 
-    def build_html_args(typ_file: Path, output_path: Path) -> list[str]:
-        """构建 HTML 编译参数"""
-        try:
-            rel_path = typ_file.relative_to(CONTENT_DIR)
+# 通过 --profile 启用；为 None 时所有性能记录都是空操作
+PROFILER: Profiler | None = None
 
-            if rel_path.name == "index.typ":
-                # index.typ uses the parent directory name as the path
-                # content/Blog/index.typ -> "Blog"
-                # content/index.typ -> "" (Homepage)
-                page_path = rel_path.parent.as_posix()
-                if page_path == ".":
-                    page_path = ""
-            else:
-                # Common files use the filename as the path
-                # content/about.typ -> "about"
-                page_path = rel_path.with_suffix("").as_posix()
-        except ValueError:
-            page_path = ""
 
+def profile_span(name: str, category: str = "stage"):
+    """
+    返回记录代码块耗时的上下文管理器，未启用性能分析时返回空上下文。
+
+    参数:
+        name: 在 trace 中显示的名称
+        category: trace 分类
+
+    返回:
+        上下文管理器
+    """
+    return PROFILER.span(name, category) if PROFILER else nullcontext()
+
+
+def peak_rss() -> int | None:
+    """
+    获取当前进程的峰值常驻内存。
+
+    返回:
+        int | None: 字节数，不支持的平台返回 None
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    scale = 1 if sys.platform == "darwin" else 1024  # Linux 下 ru_maxrss 单位为 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def run_profiled_process(command: list[str], label: str) -> tuple[int, str]:
+    """
+    运行子进程并记录它自己的墙钟时间、CPU 时间和峰值内存。
+
+    POSIX 系统上通过 os.wait4 获取子进程的 rusage；其他平台只记录墙钟时间。
+
+    参数:
+        command: 命令及参数
+        label: 在 trace 中显示的名称
+
+    返回:
+        tuple[int, str]: (返回码, 标准错误输出)
+    """
+    import tempfile
+
+    start = time.perf_counter()
+    if not hasattr(os, "wait4"):
+        result = subprocess.run(command, capture_output=True, text=True, encoding="utf-8")
+        PROFILER.record_process(label, start, time.perf_counter() - start, None, None)
+        return result.returncode, result.stderr
+
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=stderr)
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        wall = time.perf_counter() - start
+        stderr.seek(0)
+        error = stderr.read().decode("utf-8", errors="replace")
+
+    scale = 1 if sys.platform == "darwin" else 1024
+    cpu = usage.ru_utime + usage.ru_stime
+    PROFILER.record_process(label, start, wall, cpu, usage.ru_maxrss * scale)
+    return process.returncode, error
+
+
+# ============================================================================
+# 编译后端
+# ============================================================================
+
+
+class CompilerBackend(ABC):
+    """
+    Typst 编译后端接口。
+
+    run_typst_command() 把 typst 命令行参数交给当前后端执行，
+    后端可以启动 typst 进程，也可以在进程内完成编译。
+    """
+
+    name = ""
+
+    @abstractmethod
+    def run(self, args: list[str], label: str) -> tuple[int, str]:
+        """
+        执行一条 typst 命令。
+
+        参数:
+            args: typst 命令参数列表（不含 "typst" 本身）
+            label: 启用性能分析时在 trace 中显示的名称
+
+        返回:
+            tuple[int, str]: (返回码, 错误信息)
+        """
+
+
+class SubprocessBackend(CompilerBackend):
+    """每次编译启动一个 typst 命令行进程（默认后端）"""
+
+    name = "subprocess"
+
+    def run(self, args: list[str], label: str) -> tuple[int, str]:
+        if PROFILER:
+            return run_profiled_process(["typst"] + args, label)
+        result = subprocess.run(["typst"] + args, capture_output=True, text=True, encoding="utf-8")
+        return result.returncode, result.stderr
+
+
+@dataclass
+class CompileOptions:
+    """从命令行参数中解析出的 `typst compile` 选项"""
+
+    source: str
+    output: str
+    root: str | None = None
+    font_paths: tuple[str, ...] = ()
+    ignore_system_fonts: bool = False
+    package_path: str | None = None
+    package_cache_path: str | None = None
+    format: str | None = None
+    features: tuple[str, ...] = ()  # --features，逗号分隔
+    inputs: dict[str, str] = field(default_factory=dict)
+
+
+def parse_compile_args(args: list[str]) -> CompileOptions | None:
+    """
+    解析 build.py 生成的 `typst compile` 参数。
+
+    参数:
+        args: typst 命令参数列表
+
+    返回:
+        CompileOptions | None: 解析结果，包含无法识别的参数时返回 None
+    """
+    if not args or args[0] != "compile":
+        return None
+
+    values: dict[str, str] = {}
+    font_paths: list[str] = []
+    inputs: dict[str, str] = {}
+    positional: list[str] = []
+    ignore_system_fonts = False
+
+    i = 1
+    while i < len(args):
+        arg = args[i]
+        if arg in ("--root", "--format", "--package-path", "--package-cache-path", "--features"):
+            if i + 1 >= len(args):
+                return None
+            values[arg] = args[i + 1]
+            i += 2
+        elif arg == "--font-path":
+            if i + 1 >= len(args):
+                return None
+            font_paths.append(args[i + 1])
+            i += 2
+        elif arg == "--input":
+            if i + 1 >= len(args):
+                return None
+            key, _, value = args[i + 1].partition("=")
+            inputs[key] = value
+            i += 2
+        elif arg == "--ignore-system-fonts":
+            ignore_system_fonts = True
+            i += 1
+        elif arg.startswith("-"):
+            return None
+        else:
+            positional.append(arg)
+            i += 1
+
+    if len(positional) != 2:
+        return None
+    return CompileOptions(
+        source=positional[0],
+        output=positional[1],
+        root=values.get("--root"),
+        font_paths=tuple(font_paths),
+        ignore_system_fonts=ignore_system_fonts,
+        package_path=values.get("--package-path"),
+        package_cache_path=values.get("--package-cache-path"),
+        format=values.get("--format"),
+        features=tuple(f for f in values.get("--features", "").split(",") if f),
+        inputs=inputs,
+    )
+
+
+class TypstPyBackend(CompilerBackend):
+    """
+    使用 typst Python 包在进程内编译。
+
+    字体目录只扫描一次并在所有编译器之间共享；每组编译选项（根目录、字体、包路径）
+    对应一个长期存活的编译器实例池，每个实例同一时间只编译一个页面，
+    实例在页面之间复用，已加载的包和 Typst 的记忆化缓存因此保持有效。
+    typst 包始终启用 HTML 功能，`--features html` 通过 format="html" 传递；
+    无法识别的命令（如 `typst query`）或其他实验功能仍交给 typst 命令行执行。
+    """
+
+    # 可以在进程内编译的 --features 取值
+    supported_features = {"html"}
+
+    name = "typst-py"
+
+    def __init__(self):
+        import typst
+
+        self.typst = typst
+        self.fallback = SubprocessBackend()
+        self.lock = threading.Lock()
+        self.fonts: dict[tuple, object] = {}
+        self.pools: dict[tuple, list] = {}  # 选项 -> 空闲的编译器实例
+
+    def acquire(self, options: CompileOptions):
+        """取出（必要时创建）一个空闲的编译器实例"""
+        key = (
+            options.root,
+            options.font_paths,
+            options.ignore_system_fonts,
+            options.package_path,
+            options.package_cache_path,
+        )
+        with self.lock:
+            if idle := self.pools.setdefault(key, []):
+                return key, idle.pop()
+            font_key = (options.font_paths, options.ignore_system_fonts)
+            if font_key not in self.fonts:
+                self.fonts[font_key] = self.typst.Fonts(
+                    include_system_fonts=not options.ignore_system_fonts,
+                    font_paths=list(options.font_paths),
+                )
+            fonts = self.fonts[font_key]
+
+        compiler = self.typst.Compiler(
+            root=options.root,
+            font_paths=fonts,
+            package_path=options.package_path,
+            package_cache_path=options.package_cache_path,
+        )
+        return key, compiler
+
+    def release(self, key: tuple, compiler) -> None:
+        """将编译器实例放回池中"""
+        with self.lock:
+            self.pools[key].append(compiler)
+
+    def run(self, args: list[str], label: str) -> tuple[int, str]:
+        options = parse_compile_args(args)
+        if options is None or not set(options.features) <= self.supported_features:
+            return self.fallback.run(args, label)
+        output_format = options.format
+        if output_format is None and "html" in options.features:
+            output_format = "html"
+
+        start, cpu_start = time.perf_counter(), time.thread_time()
+        key, compiler = self.acquire(options)
+        try:
+            compiler.compile(
+                input=options.source,
+                output=options.output,
+                format=output_format,
+                sys_inputs=options.inputs,
+            )
+            returncode, error = 0, ""
+        except self.typst.TypstError as e:
+            returncode, error = 1, getattr(e, "diagnostic", "") or str(e)
+        finally:
+            self.release(key, compiler)
+
+        if PROFILER:
+            wall, cpu = time.perf_counter() - start, time.thread_time() - cpu_start
+            PROFILER.record_process(label, start, wall, cpu, peak_rss())
+        return returncode, error
+
+
+# 当前使用的编译后端，首次编译前由 get_compiler_backend() 创建
+_compiler_backend: CompilerBackend | None = None
+
+
+def get_compiler_backend() -> CompilerBackend:
+    """
+    获取 COMPILER_BACKEND 对应的编译后端。
+
+    选择 "typst-py" 但没有安装 typst Python 包时，回退到命令行后端。
+
+    返回:
+        CompilerBackend: 编译后端实例
+    """
+    global _compiler_backend
+    if _compiler_backend is None:
+        if COMPILER_BACKEND == "typst-py":
+            try:
+                _compiler_backend = TypstPyBackend()
+            except ImportError:
+                print("  ⚠️ 未安装 typst Python 包，改用 typst 命令行编译。")
+                print("  📝 安装方法: uv run --with typst build.py build --backend typst-py")
+                _compiler_backend = SubprocessBackend()
+        else:
+            _compiler_backend = SubprocessBackend()
+    return _compiler_backend
+
+
+# ============================================================================
+# 辅助函数
+# ============================================================================
+
+
+def find_typ_files() -> list[Path]:
+    """
+    查找 content/ 目录下所有 .typ 文件，排除路径中包含以下划线开头的目录的文件。
+
+    返回:
+        list[Path]: .typ 文件路径列表
+    """
+    typ_files = []
+    for rel in sorted(get_snapshot(CONTENT_DIR).files):
+        # 检查路径中是否有以下划线开头的目录
+        if rel.endswith(".typ") and not any(part.startswith("_") for part in rel.split("/")):
+            typ_files.append(CONTENT_DIR / rel)
+    return typ_files
+
+
+def find_page_files(kind: Literal["pdf", "html"]) -> list[Path]:
+    """
+    查找需要编译为指定格式的页面：文件名中包含 "PDF" 的编译为 PDF，其余编译为 HTML。
+
+    参数:
+        kind: 输出格式
+
+    返回:
+        list[Path]: .typ 文件路径列表
+    """
+    return [f for f in find_typ_files() if ("pdf" in f.stem.lower()) == (kind == "pdf")]
+
+
+def resolve_targets(patterns: list[str]) -> set[Path]:
+    """
+    将命令行中的路径或 glob 展开为需要构建的页面。
+
+    - 目录：目录中的所有页面
+    - 页面：页面本身
+    - 其他文件（模板、config.typ、图片等）：依赖它的所有页面（见 find_dependent_pages()）
+
+    参数:
+        patterns: 路径或 glob 列表（如 "content/Study/"、"content/**/draft*.typ"）
+
+    返回:
+        set[Path]: 匹配的页面
+    """
+    import glob
+
+    pages = find_page_files("html") + find_page_files("pdf")
+    page_set = set(pages)
+    common_deps = find_common_dependencies()
+    targets: set[Path] = set()
+
+    for pattern in patterns:
+        if any(c in pattern for c in "*?["):
+            matches = sorted(glob.glob(pattern, recursive=True))
+        else:
+            matches = [pattern] if os.path.exists(pattern) else []
+        if not matches:
+            print(f"  ⚠️ 没有匹配的文件: {pattern}")
+            continue
+
+        for match in matches:
+            path = Path(os.path.relpath(match))
+            if path.is_dir():
+                targets.update(p for p in pages if p.parts[: len(path.parts)] == path.parts)
+            elif path in page_set:
+                targets.add(path)
+            else:
+                targets.update(find_dependent_pages(path, pages, common_deps))
+
+    return targets
+
+
+def get_file_output_path(typ_file: Path, type: Literal["pdf", "html"]) -> Path:
+    """
+    获取 .typ 文件的输出路径。
+
+    参数:
+        typ_file: .typ 文件路径 (相对于 content/)
+
+    返回:
+        Path: 文件输出路径 (在 _site/ 目录下)
+    """
+    relative_path = typ_file.relative_to(CONTENT_DIR)
+    return SITE_DIR / relative_path.with_suffix(f".{type}")
+
+
+def run_typst_command(args: list[str], label: str | None = None) -> bool:
+    """
+    运行 typst 命令（由 COMPILER_BACKEND 选择的编译后端执行）。
+
+    参数:
+        args: typst 命令参数列表
+        label: 启用性能分析时在 trace 中显示的名称（通常为源文件路径）
+
+    返回:
+        bool: 命令是否成功执行
+    """
+    try:
+        returncode, stderr = get_compiler_backend().run(args, label or " ".join(args))
+        if returncode != 0:
+            print(f"  ❌ Typst 错误: {stderr.strip()}")
+            return False
+        return True
+    except FileNotFoundError:
+        print("  ❌ 错误: 未找到 typst 命令。请确保已安装 Typst 并添加到 PATH 环境变量中。")
+        print("  📝 安装说明: https://typst.app/open-source/#download")
+        return False
+    except Exception as e:
+        print(f"  ❌ 执行 typst 命令时出错: {e}")
+        return False
+
+
+# ============================================================================
+# 原子写入
+# ============================================================================
+
+# 临时文件名前缀：输出先写到同目录下的 ".tmp-<文件名>"，写完后再替换目标文件
+TEMP_PREFIX = ".tmp-"
+
+
+def temp_output_path(path: Path) -> Path:
+    """
+    获取输出文件对应的临时文件路径（与目标在同一目录，保留扩展名）。
+
+    参数:
+        path: 目标文件路径
+
+    返回:
+        Path: 临时文件路径
+    """
+    return path.with_name(TEMP_PREFIX + path.name)
+
+
+def fsync_path(path: Path) -> None:
+    """将文件（或目录）的内容刷新到磁盘"""
+    flags = os.O_RDONLY | getattr(os, "O_DIRECTORY", 0) if path.is_dir() else os.O_RDONLY
+    try:
+        fd = os.open(path, flags)
+    except OSError:
+        return  # Windows 不支持打开目录
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def commit_output(temp: Path, path: Path) -> None:
+    """
+    用已写好的临时文件替换目标文件。
+
+    启用 FSYNC_OUTPUTS 时，替换前刷新文件内容，替换后刷新所在目录。
+
+    参数:
+        temp: 临时文件路径
+        path: 目标文件路径
+    """
+    if FSYNC_OUTPUTS:
+        fsync_path(temp)
+    os.replace(temp, path)
+    if FSYNC_OUTPUTS:
+        fsync_path(path.parent)
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    """
+    原子地写入文件：中途中断时目标文件要么是旧内容，要么是完整的新内容。
+
+    参数:
+        path: 目标文件路径
+        data: 文件内容
+    """
+    temp = temp_output_path(path)
+    try:
+        temp.write_bytes(data)
+        commit_output(temp, path)
+    except BaseException:
+        temp.unlink(missing_ok=True)
+        raise
+
+
+def atomic_write_text(path: Path, text: str) -> None:
+    """原子地写入 UTF-8 文本文件"""
+    atomic_write_bytes(path, text.encode("utf-8"))
+
+
+def atomic_copy(source: Path, path: Path) -> None:
+    """
+    原子地复制文件，并保留修改时间等元数据（同 shutil.copy2）。
+
+    目标总是一个新文件，不会改写与之硬链接的其他路径。
+
+    参数:
+        source: 源文件路径
+        path: 目标文件路径
+    """
+    temp = temp_output_path(path)
+    try:
+        shutil.copy2(source, temp)
+        commit_output(temp, path)
+    except BaseException:
+        temp.unlink(missing_ok=True)
+        raise
+
+
+def remove_stale_temp_files() -> None:
+    """
+    删除上次被中断的构建留在 _site 中的临时文件（文件系统快照会忽略它们，但它们仍会被发布）。
+
+    输出总是先写入临时文件再替换，被中断时目标文件要么是旧内容，要么是完整的新内容，
+    增量检查会照常重新编译过期的页面，只需清理残留的临时文件。
+    """
+    site = get_snapshot(SITE_DIR)
+    for rel in site.temp_files:
+        (SITE_DIR / rel).unlink(missing_ok=True)
+    if site.temp_files:
+        print(f"  🧹 删除了上次被中断的构建留下的 {len(site.temp_files)} 个临时文件。")
+        site.temp_files.clear()
+
+
+# ============================================================================
+# 构建缓存
+# ============================================================================
+
+
+def load_cache(name: str) -> dict:
+    """
+    读取 .build-cache/ 下的 JSON 缓存。
+
+    参数:
+        name: 缓存名称（不含扩展名）
+
+    返回:
+        dict: 缓存内容，文件不存在或已损坏时返回空字典
+    """
+    try:
+        return json.loads((CACHE_DIR / f"{name}.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(name: str, data: dict) -> None:
+    """
+    将数据写入 .build-cache/ 下的 JSON 缓存（先写临时文件再替换，避免写坏缓存）。
+
+    参数:
+        name: 缓存名称（不含扩展名）
+        data: 可序列化为 JSON 的数据
+    """
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    atomic_write_text(CACHE_DIR / f"{name}.json", payload)
+
+
+def file_signature(path: Path) -> list[int] | None:
+    """
+    获取文件的签名（纳秒级修改时间 + 大小），用于判断文件是否变化。
+
+    参数:
+        path: 文件路径
+
+    返回:
+        list[int] | None: [mtime_ns, size]，文件不存在返回 None
+    """
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+# 文件摘要缓存：{路径: [mtime_ns, size, sha256]}，首次使用时从 .build-cache/digests.json 加载
+_digest_cache: dict[str, list] | None = None
+
+
+def file_digest(path: Path) -> str | None:
+    """
+    计算文件内容的 SHA-256 摘要。
+
+    结果按文件签名缓存，文件未变化时不会重新读取。
+
+    参数:
+        path: 文件路径
+
+    返回:
+        str | None: 十六进制摘要，文件不存在返回 None
+    """
+    global _digest_cache
+    if _digest_cache is None:
+        _digest_cache = load_cache("digests")
+
+    signature = file_signature(path)
+    if signature is None:
+        return None
+
+    key = path.as_posix()
+    entry = _digest_cache.get(key)
+    if entry and entry[:2] == signature:
+        return entry[2]
+
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    _digest_cache[key] = [*signature, digest.hexdigest()]
+    return digest.hexdigest()
+
+
+def save_digest_cache() -> None:
+    """
+    将文件摘要缓存写回 .build-cache/digests.json，并清理已不存在的文件。
+    """
+    if _digest_cache is None:
+        return
+    for key in [k for k in _digest_cache if not os.path.exists(k)]:
+        del _digest_cache[key]
+    save_cache("digests", _digest_cache)
+
+
+# ============================================================================
+# 编译调度
+# ============================================================================
+
+
+def find_priority_pages() -> set[Path]:
+    """
+    查找需要优先编译的页面：首页以及 header-links 指向的站内页面。
+
+    返回:
+        set[Path]: 对应的 .typ 源文件路径集合
+    """
+    pages = {CONTENT_DIR / "index.typ"}
+    for link in get_header_links():
+        if not link.startswith("/"):
+            continue
+        page_path = link.split("#")[0].split("?")[0].strip("/")
+        if not page_path:
+            continue
+        pages.add(CONTENT_DIR / page_path / "index.typ")
+        pages.add(CONTENT_DIR / f"{page_path}.typ")
+    return pages
+
+
+def schedule_compiles(
+    files: list[Path], kind: Literal["pdf", "html"], history: dict[str, list[float]]
+) -> list[Path]:
+    """
+    安排待编译文件的顺序（最长处理时间优先）。
+
+    并行编译时，最后才开始的大页面会拖长整个构建；先启动预计最耗时的页面，
+    短页面填补剩余的空闲，可以缩短总时长。首页与导航页面排在最前面。
+
+    参数:
+        files: 待编译的 .typ 文件列表
+        kind: 编译类型，与文件路径一起作为历史记录的键
+        history: 历史编译耗时，{"类型:路径": [耗时秒数, 源文件大小]}
+
+    返回:
+        list[Path]: 排好序的文件列表
+    """
+    if not DURATION_SCHEDULING:
+        return files
+
+    # 没有历史记录的页面按源文件大小和已有记录的平均编译速度估算；
+    # 完全没有历史记录时直接按文件大小排序
+    records = [v for k, v in history.items() if k.startswith(f"{kind}:")]
+    total_seconds = sum(seconds for seconds, _ in records)
+    total_size = sum(size for _, size in records)
+    rate = total_seconds / total_size if total_seconds and total_size else 1.0
+
+    expected: dict[Path, float] = {}
+    for typ_file in files:
+        if record := history.get(f"{kind}:{typ_file.as_posix()}"):
+            expected[typ_file] = record[0]
+        else:
+            expected[typ_file] = (path_signature(typ_file) or [0, 0])[1] * rate
+
+    priority = find_priority_pages()
+    return sorted(files, key=lambda f: (f not in priority, -expected[f]))
+
+
+def update_durations(
+    history: dict[str, list[float]],
+    kind: Literal["pdf", "html"],
+    measured: dict[Path, float],
+    files: list[Path],
+) -> None:
+    """
+    记录本次编译耗时并写回 .build-cache/durations.json。
+
+    新旧耗时取平均以平滑单次波动；已不存在的页面会被移除。
+
+    参数:
+        history: 历史编译耗时，会被原地更新
+        kind: 编译类型
+        measured: 本次成功编译的文件及其耗时（秒）
+        files: 当前该类型的所有源文件
+    """
+    current = {f"{kind}:{f.as_posix()}" for f in files}
+    for key in [k for k in history if k.startswith(f"{kind}:") and k not in current]:
+        del history[key]
+
+    for typ_file, seconds in measured.items():
+        key = f"{kind}:{typ_file.as_posix()}"
+        if key in history:
+            seconds = (history[key][0] + seconds) / 2
+        history[key] = [round(seconds, 4), (path_signature(typ_file) or [0, 0])[1]]
+
+    save_cache("durations", history)
+
+
+# ============================================================================
+# 预览服务器
+# ============================================================================
+
+# 即时 gzip 压缩的 MIME 类型（text/* 之外）
+COMPRESSIBLE_TYPES = {
+    "application/javascript",
+    "application/json",
+    "application/xml",
+    "application/rss+xml",
+    "image/svg+xml",
+}
+# 预压缩文件的扩展名，按优先顺序排列
+PRECOMPRESSED_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+class PreviewRequestHandler(SimpleHTTPRequestHandler):
+    """
+    预览服务器的请求处理器。
+
+    在 SimpleHTTPRequestHandler 的基础上支持：
+        - 由文件摘要计算的强 ETag 与 Last-Modified，If-None-Match / If-Modified-Since 返回 304
+        - 单个字节范围的 Range 请求（206 / 416），支持 If-Range
+        - 优先返回同目录下的预压缩文件（.br / .gz），否则对文本响应即时 gzip 压缩并缓存
+        - 使用 preview --headers 时按 _site/_headers 发送响应头，与部署环境一致
+    """
+
+    # {(文件路径, 摘要): 压缩后的内容}，按最近使用顺序淘汰
+    gzip_cache: dict[tuple[str, str], bytes] = {}
+    gzip_cache_size = 0
+    gzip_lock = threading.Lock()
+    # _headers 中的规则（见 parse_headers_file()），为空时不发送额外的响应头
+    site_headers: list[tuple[str, list[tuple[str, str]]]] = []
+
+    def end_headers(self) -> None:
+        from urllib.parse import unquote, urlsplit
+
+        headers = match_headers(self.site_headers, unquote(urlsplit(self.path).path))
+        if not any(name.lower() == "cache-control" for name, _ in headers):
+            # 每次刷新都向服务器确认，未修改的文件只返回 304
+            headers.insert(0, ("Cache-Control", "no-cache"))
+        for name, value in headers:
+            self.send_header(name, value)
+        super().end_headers()
+
+    def accepts_encoding(self, encoding: str) -> bool:
+        """检查 Accept-Encoding 是否接受某种编码（忽略 q=0）"""
+        for item in self.headers.get("Accept-Encoding", "").split(","):
+            name, _, params = item.strip().partition(";")
+            if name.strip().lower() == encoding and params.replace(" ", "") != "q=0":
+                return True
+        return False
+
+    def is_not_modified(self, etag: str, mtime: float) -> bool:
+        """根据 If-None-Match / If-Modified-Since 判断是否可以返回 304"""
+        from email.utils import parsedate_to_datetime
+
+        if if_none_match := self.headers.get("If-None-Match"):
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or etag in tags
+        if if_modified_since := self.headers.get("If-Modified-Since"):
+            try:
+                return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def parse_range(self, etag: str, size: int) -> tuple[int, int] | None | bool:
+        """
+        解析 Range 请求头。
+
+        返回:
+            (起始, 结束)（闭区间）；没有有效的单一范围时返回 None（发送完整内容）；
+            范围无法满足时返回 False
+        """
+        header = self.headers.get("Range", "")
+        if not header.startswith("bytes=") or "," in header:
+            return None
+        if (if_range := self.headers.get("If-Range")) and if_range.strip() != etag:
+            return None
+
+        start_text, _, end_text = header.removeprefix("bytes=").strip().partition("-")
+        try:
+            if not start_text:
+                length = int(end_text)
+                if length <= 0:
+                    return False
+                return max(0, size - length), size - 1
+            start = int(start_text)
+            end = min(int(end_text), size - 1) if end_text else size - 1
+        except ValueError:
+            return None
+        if start >= size or start > end:
+            return False
+        return start, end
+
+    def compressed_body(self, path: str, digest: str) -> bytes:
+        """获取文件的 gzip 压缩内容（带缓存）"""
+        import gzip
+
+        cls = PreviewRequestHandler
+        key = (path, digest)
+        with cls.gzip_lock:
+            if (body := cls.gzip_cache.pop(key, None)) is not None:
+                cls.gzip_cache[key] = body  # 移到末尾，标记为最近使用
+                return body
+
+        with open(path, "rb") as f:
+            body = gzip.compress(f.read(), compresslevel=6)
+
+        with cls.gzip_lock:
+            cls.gzip_cache[key] = body
+            cls.gzip_cache_size += len(body)
+            while cls.gzip_cache_size > PREVIEW_GZIP_CACHE_BYTES and len(cls.gzip_cache) > 1:
+                old = cls.gzip_cache.pop(next(iter(cls.gzip_cache)))
+                cls.gzip_cache_size -= len(old)
+        return body
+
+    def send_head(self):
+        self.remaining = None
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            index = os.path.join(path, "index.html")
+            if not self.path.split("?")[0].endswith("/") or not os.path.isfile(index):
+                return super().send_head()  # 重定向到带斜杠的地址或列出目录
+            path = index
+
+        try:
+            stat = os.stat(path)
+            digest = file_digest(Path(path))
+        except OSError:
+            digest = None
+        if digest is None or not os.path.isfile(path):
+            self.send_error(404, "File not found")
+            return None
+
+        content_type = self.guess_type(path)
+        compressible = content_type.startswith("text/") or content_type in COMPRESSIBLE_TYPES
+        has_range = "Range" in self.headers
+
+        # 选择要发送的表示：预压缩文件 > 即时 gzip > 原文件
+        body_path, encoding, body = path, None, None
+        if compressible and not has_range:
+            for name, suffix in PRECOMPRESSED_ENCODINGS:
+                try:
+                    fresh = os.stat(path + suffix).st_mtime_ns >= stat.st_mtime_ns
+                except OSError:
+                    continue
+                if fresh and self.accepts_encoding(name):
+                    body_path, encoding = path + suffix, name
+                    break
+            else:
+                if stat.st_size > 1024 and self.accepts_encoding("gzip"):
+                    encoding, body = "gzip", self.compressed_body(path, digest)
+
+        # 预压缩文件使用它自身的摘要，保证不同字节内容的表示有不同的强 ETag
+        if body_path != path:
+            digest = file_digest(Path(body_path)) or digest
+        etag = f'"{digest[:32]}-{encoding}"' if encoding else f'"{digest[:32]}"'
+
+        if self.is_not_modified(etag, stat.st_mtime):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            if compressible:
+                self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return None
+
+        size = len(body) if body is not None else os.path.getsize(body_path)
+        byte_range = None if encoding else self.parse_range(etag, size)
+        if byte_range is False:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return None
+
+        f = io.BytesIO(body) if body is not None else open(body_path, "rb")
+        self.send_response(206 if byte_range else 200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", self.date_time_string(int(stat.st_mtime)))
+        self.send_header("Accept-Ranges", "bytes")
+        if compressible:
+            self.send_header("Vary", "Accept-Encoding")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        if byte_range:
+            start, end = byte_range
+            f.seek(start)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            size = end - start + 1
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        self.remaining = size
+        return f
+
+    def copyfile(self, source, outputfile) -> None:
+        # Range 请求只发送指定长度
+        remaining = getattr(self, "remaining", None)
+        if remaining is None:
+            return super().copyfile(source, outputfile)
+        while remaining > 0 and (chunk := source.read(min(remaining, 1 << 16))):
+            outputfile.write(chunk)
+            remaining -= len(chunk)
+
+
+# ============================================================================
+# 页面外框拼接
+# ============================================================================
+
+# tufted-web 输出的页眉、导航栏与页脚带有 data-chrome 标记
+CHROME_TAG_PATTERN = re.compile(r'<(header|nav|footer)\b[^>]*\bdata-chrome="([\w-]+)"[^>]*>')
+CHROME_SOURCE = CACHE_DIR / "chrome.typ"
+
+
+def chrome_config_keys() -> tuple[str, str] | None:
+    """
+    计算 config.typ 的两个指纹，用于判断修改是否只涉及页面外框。
+
+    模板指纹覆盖 CHROME_CONFIG_ARGS 以外的配置以及 config.typ 导入的文件（如 tufted-lib/），
+    外框指纹只覆盖 CHROME_CONFIG_ARGS 的取值。
+
+    返回:
+        tuple[str, str] | None: (模板指纹, 外框指纹)，config.typ 不存在时返回 None
+    """
+    try:
+        content = CONFIG_FILE.read_text(encoding="utf-8")
+    except OSError:
+        return None
+
+    spans = sorted(span for name in CHROME_CONFIG_ARGS if (span := find_config_arg(content, name)))
+    rest, chrome, position = [], [], 0
+    for start, end in spans:
+        rest.append(content[position:start])
+        chrome.append(content[start:end])
+        position = end
+    rest.append(content[position:])
+
+    imports = [[dep.as_posix(), path_signature(dep)] for dep in sorted(import_chains(CONFIG_FILE))]
+    template = json.dumps([rest, imports, package_args()], ensure_ascii=False)
+    return (
+        hashlib.sha256(template.encode()).hexdigest(),
+        hashlib.sha256(json.dumps(chrome, ensure_ascii=False).encode()).hexdigest(),
+    )
+
+
+def find_chrome_blocks(text: str) -> dict[str, tuple[int, int]]:
+    """
+    查找 HTML 中带 data-chrome 标记的元素（嵌套在其他标记元素中的除外）。
+
+    参数:
+        text: HTML 文本
+
+    返回:
+        dict[str, tuple[int, int]]: {标记名称: 元素（包括起止标签）在文本中的起止位置}
+    """
+    blocks: dict[str, tuple[int, int]] = {}
+    last_end = 0
+    for match in CHROME_TAG_PATTERN.finditer(text):
+        tag, name = match.groups()
+        if match.start() < last_end or name in blocks:
+            continue
+
+        # 按同名标签的嵌套层数找到对应的结束标签
+        tag_pattern = re.compile(rf"<(/?){tag}\b[^>]*>")
+        depth, position = 1, match.end()
+        while depth and (inner := tag_pattern.search(text, position)):
+            depth += -1 if inner.group(1) else 1
+            position = inner.end()
+        if depth == 0:
+            blocks[name] = (match.start(), position)
+            last_end = position
+    return blocks
+
+
+def compile_chrome(build_args) -> dict[str, str] | None:
+    """
+    用 config.typ 中的模板编译一个空页面，提取其中的页面外框片段。
+
+    参数:
+        build_args: 构建 HTML 编译参数的函数
+
+    返回:
+        dict[str, str] | None: {标记名称: 元素的 HTML}，编译失败时返回 None
+    """
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    atomic_write_text(
+        CHROME_SOURCE, f'#import "/{CONFIG_FILE.as_posix()}": template\n#show: template\n'
+    )
+    output_path = CACHE_DIR / "chrome.html"
+    if not run_typst_command(build_args(CHROME_SOURCE, output_path), "页面外框"):
+        return None
+
+    text = output_path.read_text(encoding="utf-8")
+    return {name: text[start:end] for name, (start, end) in find_chrome_blocks(text).items()}
+
+
+def stitch_chrome(outputs: dict[Path, list[Path]], common_deps: list[Path], build_args) -> int:
+    """
+    config.typ 中只有页面外框变化时，编译新的外框片段并替换到已有页面中。
+
+    只处理除 config.typ 外都是最新的页面，并且页面中的外框必须与上次的片段完全相同
+    （页面通过 template.with() 自定义了外框时不同）。替换后的页面比 config.typ 新，
+    编译时会被跳过；其余页面照常重新编译。
+
+    参数:
+        outputs: {源文件: 输出文件列表}（列表页的分页共用同一个源文件）
+        common_deps: 公共依赖列表
+        build_args: 构建 HTML 编译参数的函数
+
+    返回:
+        int: 替换了外框的页面数
+    """
+    keys = chrome_config_keys()
+    if keys is None:
+        return 0
+    state = load_cache("chrome")
+    if [state.get("template"), state.get("chrome")] == list(keys):
+        return 0
+
+    print("正在编译页面外框...")
+    fragments = compile_chrome(build_args)
+    if fragments is None:
+        return 0
+
+    # 模板本身变化时所有页面都会重新编译，只记录新的片段
+    stitched = 0
+    previous = state.get("fragments") or {}
+    if state.get("template") == keys[0] and previous:
+        config_mtime = state.get("config_mtime", 0)
+        for typ_file, paths in outputs.items():
+            for output_path in paths:
+                # 上次记录片段时就已过期的页面（如编译失败）不做替换
+                if path_mtime_ns(output_path) < config_mtime or rebuild_reason(
+                    typ_file, output_path, common_deps, ignored=CONFIG_FILE
+                ):
+                    continue
+
+                text = output_path.read_text(encoding="utf-8")
+                blocks = find_chrome_blocks(text)
+                if blocks.keys() != previous.keys() or any(
+                    text[start:end] != previous[name] for name, (start, end) in blocks.items()
+                ):
+                    continue
+
+                # 从后往前替换，前面元素的位置不受影响
+                for name, (start, end) in sorted(blocks.items(), key=lambda item: -item[1][0]):
+                    text = text[:start] + fragments.get(name, "") + text[end:]
+                atomic_write_text(output_path, text)
+                refresh_snapshot(output_path)
+                stitched += 1
+
+    save_cache(
+        "chrome",
+        {
+            "template": keys[0],
+            "chrome": keys[1],
+            "config_mtime": path_mtime_ns(CONFIG_FILE),
+            "fragments": fragments,
+        },
+    )
+    return stitched
+
+
+# ============================================================================
+# 构建命令
+# ============================================================================
+
+
+def _compile_files(
+    files: list[Path],
+    force: bool,
+    common_deps: list[Path],
+    get_output_path_func,
+    build_args_func,
+    kind: Literal["pdf", "html"],
+    jobs: int = BUILD_JOBS,
+) -> BuildStats:
+    """
+    通用文件编译函数，减少重复代码。
+
+    参数:
+        files: 要编译的文件列表
+        force: 是否强制重建
+        common_deps: 公共依赖列表
+        get_output_path_func: 获取输出路径的函数
+        build_args_func: 构建编译参数的函数
+        kind: 编译类型，用于记录编译耗时
+        jobs: 同时运行的 Typst 进程数
+
+    返回:
+        BuildStats: 构建统计信息
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    stats = BuildStats()
+    pending: list[Path] = []
+
+    for typ_file in files:
+        output_path = get_output_path_func(typ_file)
+
+        # 增量编译检查
+        with profile_span(f"needs_rebuild {typ_file}", "deps"):
+            up_to_date = not force and not needs_rebuild(typ_file, output_path, common_deps)
+        if up_to_date:
+            stats.skipped += 1
+            continue
+
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        pending.append(typ_file)
+
+    save_dependency_cache()
+
+    history = load_cache("durations")
+    measured: dict[Path, float] = {}
+
+    # 在主线程中创建编译后端，工作线程共享同一个实例
+    get_compiler_backend()
+
+    def compile_file(typ_file: Path) -> tuple[bool, float]:
+        # 先编译到临时文件，成功后再替换目标文件，中断时不会留下不完整的输出
+        output_path = get_output_path_func(typ_file)
+        temp_path = temp_output_path(output_path)
+        args = build_args_func(typ_file, temp_path)
+
+        start = time.perf_counter()
+        try:
+            ok = run_typst_command(args, str(typ_file)) and temp_path.exists()
+            if ok:
+                commit_output(temp_path, output_path)
+        finally:
+            temp_path.unlink(missing_ok=True)
+        seconds = time.perf_counter() - start
+        return ok, seconds
+
+    # 线程池按提交顺序取任务，提交顺序即调度顺序
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        futures = {
+            pool.submit(compile_file, typ_file): typ_file
+            for typ_file in schedule_compiles(pending, kind, history)
+        }
+        for future in as_completed(futures):
+            typ_file = futures[future]
+            ok, seconds = future.result()
+            if ok:
+                stats.success += 1
+                measured[typ_file] = seconds
+            else:
+                print(f"  ❌ {typ_file} 编译失败")
+                stats.failed += 1
+            refresh_snapshot(get_output_path_func(typ_file))
+
+    if pending:
+        # files 可能只是部分页面（build PATH...），按全部页面清理耗时记录
+        update_durations(history, kind, measured, find_page_files(kind))
+
+    return stats
+
+
+def find_listing_pages(files: list[Path]) -> dict[str, Path]:
+    """
+    查找读取了文章列表数据（LISTING_DATA_FILE）的列表页。
+
+    参数:
+        files: 候选页面列表
+
+    返回:
+        dict[str, Path]: {目录名（如 "Blog"）: 列表页}
+    """
+    listings = {}
+    for typ_file in files:
+        parts = typ_file.relative_to(CONTENT_DIR).parts
+        if len(parts) != 2 or parts[1] != "index.typ":
+            continue
+        data_file = os.path.abspath(CONTENT_DIR / parts[0] / LISTING_DATA_FILE)
+        if any(os.path.abspath(dep) == data_file for dep in import_chains(typ_file)):
+            listings[parts[0]] = typ_file
+    return listings
+
+
+def listing_page_output(typ_file: Path, number: int) -> Path:
+    """列表页第 N 页（N ≥ 2）的输出路径：_site/<目录>/page/<N>/index.html"""
+    return SITE_DIR / typ_file.parent.relative_to(CONTENT_DIR) / "page" / str(number) / "index.html"
+
+
+def update_post_listings(sections: set[str]) -> dict[str, int]:
+    """
+    根据文章元数据（与 RSS 相同，见 collect_post_entries()）生成各目录的文章列表数据。
+
+    数据写入 content/<目录>/_posts.json，按日期降序排列。内容没有变化时不会重写，
+    因此列表页只在文章的标题、日期、描述或链接变化时才重新编译。
+
+    参数:
+        sections: 目录名集合
+
+    返回:
+        dict[str, int]: {目录名: 分页数}
+    """
+    entries = collect_post_entries(sections)
+    posts: dict[str, list[dict]] = {section: [] for section in sections}
+    for rel, (_, title, description, _, date_str) in entries.items():
+        posts[rel.split("/")[0]].append(
+            {
+                "title": title,
+                "date": date_str[:10] if date_str else None,
+                "description": description,
+                "link": site_path_to_url(rel),
+            }
+        )
+
+    page_counts = {}
+    updated = 0
+    for section, items in sorted(posts.items()):
+        items.sort(key=lambda post: (post["date"] or "", post["link"]), reverse=True)
+        pages = max(1, -(-len(items) // LISTING_PAGE_SIZE)) if LISTING_PAGE_SIZE > 0 else 1
+        page_counts[section] = pages
+
+        data = {"section": section, "page-size": LISTING_PAGE_SIZE, "pages": pages, "posts": items}
+        text = json.dumps(data, ensure_ascii=False, indent=2) + "\n"
+        path = CONTENT_DIR / section / LISTING_DATA_FILE
+        if path_signature(path) is not None and path.read_text(encoding="utf-8") == text:
+            continue
+        atomic_write_text(path, text)
+        refresh_snapshot(path)
+        updated += 1
+
+    if updated:
+        print(f"  📝 已更新 {updated} 个目录的文章列表数据")
+    return page_counts
+
+
+def build_html(
+    force: bool = False, jobs: int = BUILD_JOBS, targets: set[Path] | None = None
+) -> bool:
+    """
+    编译所有 .typ 文件为 HTML（文件名中包含 PDF 的除外）。
+
+    参数:
+        force: 是否强制重建所有文件
+        jobs: 同时运行的 Typst 进程数
+        targets: 只编译这些页面（见 resolve_targets()），None 表示所有页面
+    """
+    SITE_DIR.mkdir(parents=True, exist_ok=True)
+
+    # 排除标记为 PDF 的文件
+    html_files = find_page_files("html")
+    if targets is not None:
+        html_files = [f for f in html_files if f in targets]
+
+    if not html_files:
+        if targets is None:
+            print("  ⚠️ 未找到任何 HTML 文件。")
+        return True
+
+    print("正在构建 HTML 文件...")
+
+    # 重复资源的分组变化后，重新编译引用了旧 /_media/ 路径的页面
+    expire_media_references()
+    expire_math_pages()
+
+    # 获取公共依赖
+    common_deps = find_common_dependencies()
+
+    def build_html_args(typ_file: Path, output_path: Path, listing_page: int = 1) -> list[str]:
+        """构建 HTML 编译参数（listing_page 为列表页的分页页码）"""
+        try:
+            rel_path = typ_file.relative_to(CONTENT_DIR)
+
+            if rel_path.name == "index.typ":
+                # index.typ uses the parent directory name as the path
+                # content/Blog/index.typ -> "Blog"
+                # content/index.typ -> "" (Homepage)
+                page_path = rel_path.parent.as_posix()
+                if page_path == ".":
+                    page_path = ""
+            else:
+                # Common files use the filename as the path
+                # content/about.typ -> "about"
+                page_path = rel_path.with_suffix("").as_posix()
+        except ValueError:
+            page_path = ""
+
+        inputs = ["--input", f"page-path={page_path}"]
+        if listing_page > 1:
+            inputs = [
+                "--input",
+                f"page-path={page_path}/page/{listing_page}",
+                "--input",
+                f"listing-page={listing_page}",
+            ]
+
+        return [
+            "compile",
+            "--root",
+            ".",
+            "--font-path",
+            str(ASSETS_DIR),
+            *package_args(),
+            "--features",
+            "html",
+            "--format",
+            "html",
+            *inputs,
+            str(typ_file),
+            str(output_path),
+        ]
+
+    # 读取文章列表数据的列表页依赖其他页面的编译结果（文章元数据），放在最后编译
+    listings = find_listing_pages(html_files)
+    listing_files = set(listings.values())
+
+    if CHROME_STITCHING:
+        outputs = {} if force else {f: [get_file_output_path(f, "html")] for f in html_files}
+        for section, typ_file in listings.items():
+            if typ_file in outputs:
+                outputs[typ_file] += sorted((SITE_DIR / section / "page").glob("*/index.html"))
+        if stitched := stitch_chrome(outputs, common_deps, build_html_args):
+            print(f"  🧩 config.typ 只修改了页面外框，已直接替换到 {stitched} 个页面中")
+
+    stats = _compile_files(
+        [f for f in html_files if f not in listing_files],
+        force,
+        common_deps,
+        lambda typ_file: get_file_output_path(typ_file, "html"),
+        build_html_args,
+        "html",
+        jobs,
+    )
+
+    if listings:
+        page_counts = update_post_listings(set(listings))
+        stats.merge(
+            _compile_files(
+                sorted(listing_files),
+                force,
+                common_deps,
+                lambda typ_file: get_file_output_path(typ_file, "html"),
+                build_html_args,
+                "html",
+                jobs,
+            )
+        )
+
+        # 分页：同一个列表页以 listing-page=N 编译为 /<目录>/page/<N>/index.html
+        for number in range(2, max(page_counts.values()) + 1):
+            stats.merge(
+                _compile_files(
+                    sorted(f for s, f in listings.items() if page_counts[s] >= number),
+                    force,
+                    common_deps,
+                    lambda typ_file, n=number: listing_page_output(typ_file, n),
+                    lambda typ_file, output, n=number: build_html_args(typ_file, output, n),
+                    "html",
+                    jobs,
+                )
+            )
+
+        # 删除文章减少后多出来的分页
+        removed = False
+        for section, count in page_counts.items():
+            page_dir = SITE_DIR / section / "page"
+            if not page_dir.is_dir():
+                continue
+            for item in page_dir.iterdir():
+                if item.is_dir() and item.name.isdigit() and int(item.name) > count:
+                    shutil.rmtree(item)
+                    removed = True
+        if removed:
+            invalidate_snapshots(SITE_DIR)
+
+    print(f"✅ HTML 构建完成。{stats.format_summary()}")
+    return not stats.has_failures
+
+
+def build_pdf(
+    force: bool = False, jobs: int = BUILD_JOBS, targets: set[Path] | None = None
+) -> bool:
+    """
+    编译文件名包含 "PDF" 的 .typ 文件为 PDF。
+
+    参数:
+        force: 是否强制重建所有文件
+        jobs: 同时运行的 Typst 进程数
+        targets: 只编译这些页面（见 resolve_targets()），None 表示所有页面
+    """
+    SITE_DIR.mkdir(parents=True, exist_ok=True)
+
+    pdf_files = find_page_files("pdf")
+    if targets is not None:
+        pdf_files = [f for f in pdf_files if f in targets]
+
+    if not pdf_files:
+        return True
+
+    print("正在构建 PDF 文件...")
+
+    # 获取公共依赖
+    common_deps = find_common_dependencies()
+
+    def build_pdf_args(typ_file: Path, output_path: Path) -> list[str]:
+        """构建 PDF 编译参数"""
         return [
             "compile",
             "--root",
             ".",
             "--font-path",
             str(ASSETS_DIR),
-            "--features",
-            "html",
-            "--format",
-            "html",
-            "--input",
-            f"page-path={page_path}",
+            *package_args(),
             str(typ_file),
             str(output_path),
         ]
 
-    stats = _compile_files(
-        html_files,
-        force,
-        common_deps,
-        lambda typ_file: get_file_output_path(typ_file, "html"),
-        build_html_args,
-    )
+    stats = _compile_files(
+        pdf_files,
+        force,
+        common_deps,
+        lambda typ_file: get_file_output_path(typ_file, "pdf"),
+        build_pdf_args,
+        "pdf",
+        jobs,
+    )
+
+    print(f"✅ PDF 构建完成。{stats.format_summary()}")
+    return not stats.has_failures
+
+
+def copy_assets() -> bool:
+    """
+    复制静态资源到输出目录。
+    """
+    if not ASSETS_DIR.exists():
+        print(f"  ⚠ 静态资源目录 {ASSETS_DIR} 不存在。")
+        return True
+
+    SITE_DIR.mkdir(parents=True, exist_ok=True)
+    target_dir = SITE_DIR / "assets"
+
+    try:
+        source = get_snapshot(ASSETS_DIR)
+        site = get_snapshot(SITE_DIR)
+        # WEBFONTS 的原字体文件只用于子集化，不发布完整字体；所有引用都已内联的文件也不输出
+        excluded = webfont_sources()
+        excluded |= {
+            rel.removeprefix("assets/")
+            for rel in inline_omitted_files()
+            if rel.startswith("assets/")
+        }
+
+        # 只复制有变化的文件（copy2 会保留修改时间，签名不同即说明源文件变化）
+        for rel, signature in source.files.items():
+            if rel in excluded:
+                continue
+            target_rel = f"assets/{rel}"
+            if site.files.get(target_rel) != signature:
+                target_path = target_dir / rel
+                target_path.parent.mkdir(parents=True, exist_ok=True)
+                atomic_copy(ASSETS_DIR / rel, target_path)
+                site.refresh(target_rel)
+
+        # 删除源目录中已不存在的文件（VENDOR_DIR 中的第三方资源由 HTML 后处理管理）
+        for target_rel in [r for r in site.files if r.startswith("assets/")]:
+            if target_rel.startswith(f"{VENDOR_DIR}/"):
+                continue
+            rel = target_rel.removeprefix("assets/")
+            if rel not in source.files or rel in excluded:
+                (SITE_DIR / target_rel).unlink()
+                site.refresh(target_rel)
+
+        return True
+    except Exception as e:
+        print(f"  ❌ 复制静态资源失败: {e}")
+        return False
+
+
+def find_duplicate_assets(rels: list[str]) -> dict[str, list[str]]:
+    """
+    按内容摘要查找 content/ 中完全相同的资源文件。
+
+    参数:
+        rels: 资源文件相对于 content/ 的路径列表（已排序）
+
+    返回:
+        dict[str, list[str]]: {摘要: 路径列表}，只包含出现两次及以上的非空文件
+    """
+    content = get_snapshot(CONTENT_DIR)
+    groups: dict[str, list[str]] = {}
+    for rel in rels:
+        if content.files[rel][1] == 0:
+            continue
+        if digest := file_digest(CONTENT_DIR / rel):
+            groups.setdefault(digest, []).append(rel)
+    return {digest: group for digest, group in groups.items() if len(group) > 1}
+
+
+def list_content_assets() -> list[str]:
+    """
+    列出需要复制到 _site 的资源文件（content/ 下除 .typ 和 `_` 开头路径以外的文件）。
+
+    返回:
+        list[str]: 相对于 content/ 的路径列表（已排序）
+    """
+    return sorted(
+        rel
+        for rel in get_snapshot(CONTENT_DIR).files
+        if not rel.endswith(".typ") and not any(p.startswith("_") for p in rel.split("/"))
+    )
+
+
+def media_path(rel: str, digest: str) -> str:
+    """重复资源在 "media" 模式下的输出路径（相对于 _site/）"""
+    return f"{MEDIA_DIR}/{digest[:16]}{Path(rel).suffix.lower()}"
+
+
+def expire_media_references() -> None:
+    """
+    删除引用了已失效 /_media/ 路径的 HTML 页面，使它们在本次构建中重新编译。
+
+    "media" 模式会在后处理时改写 HTML 中的引用，这一改写无法撤销；
+    当重复资源的分组变化或关闭该模式时，只能重新编译受影响的页面。
+    """
+    page_refs = load_cache("media-pages")
+    if not page_refs:
+        return
+
+    media_map: dict[str, str] = {}
+    if DEDUPE_ASSETS == "media":
+        for digest, group in find_duplicate_assets(list_content_assets()).items():
+            media_map.update((rel, media_path(rel, digest)) for rel in group)
+
+    for page, refs in list(page_refs.items()):
+        if any(media_map.get(rel) != target for rel, target in refs.items()):
+            (SITE_DIR / page).unlink(missing_ok=True)
+            refresh_snapshot(SITE_DIR / page)
+            del page_refs[page]
+    save_cache("media-pages", page_refs)
+
+
+def copy_content_assets(force: bool = False) -> bool:
+    """
+    复制 content 目录下的非 .typ 文件（如图片）到输出目录。
+    支持增量复制：只复制修改过的文件。
+
+    启用 DEDUPE_ASSETS 时，内容相同的文件只保留一份物理副本（硬链接或 /_media/ 共享 URL），
+    "media" 模式的路径映射保存在 .build-cache/media.json 中，供 HTML 后处理改写引用。
+
+    参数:
+        force: 是否强制复制所有文件
+    """
+    SITE_DIR.mkdir(parents=True, exist_ok=True)
+
+    if not CONTENT_DIR.exists():
+        print(f"  ⚠ 内容目录 {CONTENT_DIR} 不存在，跳过。")
+        return True
+
+    try:
+        copy_count = 0
+        skip_count = 0
+
+        content = get_snapshot(CONTENT_DIR)
+        site = get_snapshot(SITE_DIR)
+
+        # 跳过 .typ 文件和以下划线开头的路径
+        assets = list_content_assets()
+
+        duplicates: dict[str, tuple[str, list[str]]] = {}  # 路径 -> (摘要, 同组路径)
+        if DEDUPE_ASSETS != "off":
+            for digest, group in find_duplicate_assets(assets).items():
+                for rel in group:
+                    duplicates[rel] = (digest, group)
+
+        media_map: dict[str, str] = {}  # 原路径 -> _media/ 下的路径
+        saved_bytes = 0
+        omitted = inline_omitted_files()  # 所有引用都已内联，由 HTML 后处理管理
+
+        for rel in assets:
+            if rel in omitted:
+                skip_count += 1
+                continue
+            mtime_ns, size = content.files[rel]
+            target_path = SITE_DIR / rel
+
+            if rel in duplicates:
+                digest, group = duplicates[rel]
+                if rel != group[0]:
+                    saved_bytes += size
+
+                if DEDUPE_ASSETS == "media":
+                    media_rel = media_map[rel] = media_path(rel, digest)
+                    if media_rel not in site.files:
+                        (SITE_DIR / MEDIA_DIR).mkdir(parents=True, exist_ok=True)
+                        atomic_copy(CONTENT_DIR / rel, SITE_DIR / media_rel)
+                        site.refresh(media_rel)
+                        copy_count += 1
+                    # 之前构建留下的独立副本已不再被引用
+                    if rel in site.files:
+                        target_path.unlink()
+                        site.refresh(rel)
+                    continue
+
+                if rel != group[0]:
+                    # 硬链接到同组第一个文件的输出
+                    primary = SITE_DIR / group[0]
+                    if rel in site.files and os.path.samefile(target_path, primary):
+                        skip_count += 1
+                        continue
+                    target_path.parent.mkdir(parents=True, exist_ok=True)
+                    temp_path = temp_output_path(target_path)
+                    temp_path.unlink(missing_ok=True)
+                    try:
+                        os.link(primary, temp_path)
+                        commit_output(temp_path, target_path)
+                    except OSError:
+                        atomic_copy(primary, target_path)  # 文件系统不支持硬链接
+                    site.refresh(rel)
+                    copy_count += 1
+                    continue
+
+            # 增量复制检查
+            if not force and rel in site.files and mtime_ns <= site.mtime_ns(rel):
+                skip_count += 1
+                continue
+
+            # 计算目标路径并创建目标目录
+            target_path.parent.mkdir(parents=True, exist_ok=True)
+
+            # 复制文件（目标总是新文件，不会改动之前去重时硬链接到同一文件的其他路径）
+            atomic_copy(CONTENT_DIR / rel, target_path)
+            site.refresh(rel)
+            copy_count += 1
+
+        # 清理不再使用的 _media/ 文件
+        used = set(media_map.values())
+        for media_rel in [r for r in site.files if r.startswith(f"{MEDIA_DIR}/")]:
+            if media_rel not in used:
+                (SITE_DIR / media_rel).unlink()
+                site.refresh(media_rel)
+
+        if load_cache("media") != media_map:
+            save_cache("media", media_map)
+        save_digest_cache()
+
+        summary = f"复制: {copy_count}, 跳过: {skip_count}"
+        if duplicates:
+            groups = len({digest for digest, _ in duplicates.values()})
+            summary += f", 去重: {groups} 组重复文件，节省 {format_size(saved_bytes)}"
+        print(f"✅ 内容资源复制完成。{summary}")
+        return True
+    except Exception as e:
+        print(f"  ❌ 复制内容资源文件失败: {e}")
+        return False
+
+
+def plan() -> bool:
+    """
+    列出下一次增量构建会重新编译的页面及原因，不修改任何文件。
+
+    与 build 使用同一套判断规则（rebuild_reason()），并按触发文件汇总，
+    便于找出导致大量页面重建的文件。
+    """
+    print("正在分析构建计划（不会修改任何文件）...")
+
+    common_deps = find_common_dependencies()
+    triggers: dict[str, int] = {}
+    total = 0
+
+    if CHROME_STITCHING and (keys := chrome_config_keys()):
+        state = load_cache("chrome")
+        if state.get("template") == keys[0] and state.get("chrome") != keys[1]:
+            print("🧩 config.typ 只修改了页面外框，构建时会先替换到已有页面中，")
+            print("   因 config.typ 而列出的页面大多无需重新编译")
+
+    for kind in ("html", "pdf"):
+        pages = find_page_files(kind)
+        planned: list[tuple[Path, RebuildReason]] = []
+        for typ_file in pages:
+            output_path = get_file_output_path(typ_file, kind)
+            if reason := rebuild_reason(typ_file, output_path, common_deps):
+                planned.append((typ_file, reason))
+
+        if not pages:
+            continue
+        print(f"\n📋 {kind.upper()}: {len(planned)}/{len(pages)} 个页面需要重新编译")
+        for typ_file, reason in planned:
+            print(f"  • {display_path(typ_file)}")
+            print(f"      原因: {reason.format()}")
+            if len(reason.chain) > 1:
+                print(f"      依赖链: {' → '.join(display_path(p) for p in reason.chain)}")
+            key = display_path(reason.trigger) if reason.trigger else reason.reason
+            if reason.reason != "目标文件不存在":
+                triggers[key] = triggers.get(key, 0) + 1
+        total += len(planned)
+
+    if triggers:
+        print("\n按触发文件汇总:")
+        for trigger, count in sorted(triggers.items(), key=lambda item: -item[1]):
+            print(f"  {count:>5} 个页面  {trigger}")
+
+    print(f"\n✅ 共 {total} 个页面需要重新编译。" if total else "\n✅ 所有页面都是最新的。")
+    return True
+
+
+def is_data_dependency(dep: Path) -> bool:
+    """依赖是否是通过 json()、read() 等读取的数据文件（而不是 import/include 的源文件或包）"""
+    return dep.suffix != ".typ" and dep.name != "typst.toml"
+
+
+def explain(path: Path) -> bool:
+    """
+    显示一个文件的正向依赖（它依赖哪些文件）与反向依赖（哪些页面依赖它）。
+
+    参数:
+        path: 任意文件路径（页面、模板、config.typ 或资源文件）
+    """
+    if not path.exists():
+        print(f"  ❌ 文件不存在: {path}")
+        return False
+
+    common_deps = find_common_dependencies()
+    pages = find_page_files("html") + find_page_files("pdf")
+    is_page = os.path.abspath(path) in {os.path.abspath(p) for p in pages}
+
+    print(f"📄 {display_path(path)}")
+
+    # 正向依赖：修改这些文件会导致它重新编译
+    if path.suffix == ".typ":
+        print("\n正向依赖（修改这些文件会使它重新编译）:")
+        forward = [(display_path(dep), chain) for dep, chain in import_chains(path).items()]
+        if is_page:
+            forward += [(display_path(dep), []) for dep in common_deps]
+            forward += [
+                (display_path(sibling), [])
+                for sibling in sorted(path.parent.iterdir())
+                if sibling.is_file() and sibling.suffix != ".typ"
+            ]
+        seen: set[str] = set()
+        for dep, chain in forward:
+            if dep in seen:
+                continue
+            seen.add(dep)
+            if len(chain) > 2:
+                print(f"  {dep}  （{' → '.join(display_path(p) for p in chain)}）")
+            elif chain and is_data_dependency(chain[-1]):
+                print(f"  {dep}  （数据依赖）")
+            elif chain:
+                print(f"  {dep}  （直接导入）")
+            elif dep.endswith(".typ") or dep == display_path(CONFIG_FILE):
+                print(f"  {dep}  （公共依赖）")
+            else:
+                print(f"  {dep}  （同目录的文件）")
+        if not forward:
+            print("  （无）")
+
+    # 反向依赖：修改它会导致这些页面重新编译
+    print("\n反向依赖（修改它会使这些页面重新编译）:")
+    dependents = find_dependent_pages(path, pages, common_deps)
+    if os.path.abspath(path) in {os.path.abspath(dep) for dep in common_deps}:
+        print(f"  所有 {len(dependents)} 个页面（{display_path(path)} 是公共依赖）")
+    for page, chain in dependents.items():
+        if len(chain) > 2:
+            print(f"  {display_path(page)}  （{' → '.join(display_path(p) for p in chain)}）")
+        elif chain and is_data_dependency(path) and any(
+            os.path.abspath(dep) == os.path.abspath(path) for dep in cached_typ_dependencies(page)
+        ):
+            print(f"  {display_path(page)}  （数据依赖）")
+        elif chain and path.suffix != ".typ":
+            print(f"  {display_path(page)}  （同目录的文件）")
+        elif chain:
+            print(f"  {display_path(page)}  （直接导入）")
+    if not dependents:
+        print("  （无）")
+    return True
+
+
+def clean() -> bool:
+    """
+    清理生成的文件。
+    """
+    print("正在清理生成的文件...")
+
+    if not SITE_DIR.exists():
+        print(f"  输出目录 {SITE_DIR} 不存在，无需清理。")
+        return True
+
+    try:
+        # 删除 _site 目录下的所有内容
+        for item in SITE_DIR.iterdir():
+            if item.is_dir():
+                shutil.rmtree(item)
+            else:
+                item.unlink()
+
+        invalidate_snapshots(SITE_DIR)
+        print(f"  ✅ 已清理 {SITE_DIR}/ 目录。")
+        return True
+    except Exception as e:
+        print(f"  ❌ 清理失败: {e}")
+        return False
+
+
+def preview(port: int = 8000, open_browser_flag: bool = True, headers: bool = False) -> bool:
+    """
+    启动本地预览服务器。
+
+    首先尝试使用 uvx livereload（支持实时刷新），
+    如果失败则回退到内置的预览服务器（支持 ETag/304、Range 请求和压缩）。
+
+    参数:
+        port: 服务器端口号，默认为 8000
+        open_browser_flag: 是否自动打开浏览器，默认为 True
+        headers: 是否按 _site/_headers 发送响应头（只有内置预览服务器支持）
+    """
+    import webbrowser
+
+    if not SITE_DIR.exists():
+        print(f"  ⚠ 输出目录 {SITE_DIR} 不存在，请先运行 build 命令。")
+        return False
+
+    print("正在启动本地预览服务器（按 Ctrl+C 停止）...")
+    print()
+
+    if open_browser_flag:
+
+        def open_browser():
+            time.sleep(1.5)  # 等待服务器启动
+            url = f"http://localhost:{port}"
+            print(f"  🚀 正在打开浏览器: {url}")
+            webbrowser.open(url)
+
+        # 在后台线程中打开浏览器
+        threading.Thread(target=open_browser, daemon=True).start()
+
+    if headers:
+        PreviewRequestHandler.site_headers = parse_headers_file(SITE_DIR / HEADERS_FILE)
+        if not PreviewRequestHandler.site_headers:
+            print(f"  ⚠ 未找到 {SITE_DIR / HEADERS_FILE}，请先运行 build 命令（CACHE_HEADERS = True）。")
+
+    # 首先尝试 uvx livereload（不支持自定义响应头，使用 --headers 时跳过）
+    if not headers:
+        try:
+            result = subprocess.run(
+                ["uvx", "livereload", str(SITE_DIR), "-p", str(port)],
+                check=False,
+            )
+            return result.returncode == 0
+        except FileNotFoundError:
+            print("  未找到 uv，尝试 Python http.server...")
+        except KeyboardInterrupt:
+            print("\n服务器已停止。")
+            return True
+
+    # 回退到内置的预览服务器
+    from functools import partial
+
+    try:
+        print("使用内置预览服务器...")
+        handler = partial(PreviewRequestHandler, directory=str(SITE_DIR))
+        with ThreadingHTTPServer(("", port), handler) as server:
+            print(f"  预览地址: http://localhost:{port}/")
+            server.serve_forever()
+        return True
+    except KeyboardInterrupt:
+        print("\n服务器已停止。")
+        return True
+    except Exception as e:
+        print(f"  ❌ 启动服务器失败: {e}")
+        return False
+
+
+def parse_html_metadata(html_path: Path) -> dict[str, str]:
+    """
+    解析 HTML 文件并返回元数据解析器实例。
+
+    参数:
+        html_path (Path): HTML 文件路径
+
+    返回:
+        HTMLMetadataParser: 包含解析结果的解析器实例
+    """
+    parser = HTMLMetadataParser()
+    parser.feed(html_path.read_text(encoding="utf-8"))
+    return parser.metadata
+
+
+def get_site_url() -> str | None:
+    """
+    从生成的首页 HTML 文件中解析站点 URL。
+
+    功能:
+        从 _site/index.html 的 <link rel="canonical" href="..."> 提取 site-url。
+
+    返回:
+        str: 站点的根 URL（如 "https://example.com"），末尾不带斜杠。
+            如果未配置或解析失败则返回 None。
+    """
+    index_html = SITE_DIR / "index.html"
+    parser = parse_html_metadata(index_html)
+
+    if parser.get("link"):
+        return parser["link"].rstrip("/")
+
+    return None
+
+
+def get_feed_dirs() -> set[str]:
+    """
+    从 config.typ 配置文件中解析 RSS Feed 订阅源的配置信息。
+
+    功能:
+        解析 config.typ 中的 feed 配置块，提取目录列表。
+
+    返回:
+        set[str]: 要包含的文章目录列表，默认为空集合
+    """
+    if not CONFIG_FILE.exists():
+        return set()
+
+    try:
+        content = CONFIG_FILE.read_text(encoding="utf-8")
+
+        # 移除注释
+        content = re.sub(r"//.*", "", content)
+        content = re.sub(r"/\*[\s\S]*?\*/", "", content)
+
+        match = re.search(r"feed-dir\s*:\s*\((.*?)\)", content, re.DOTALL)
+        if match:
+            return set(
+                c.strip("/") for c in re.findall(r'"([^"]*)"', match.group(1)) if c and c.strip("/")
+            )
+    except Exception as e:
+        print(f"⚠️ 解析 feed-dir 失败: {e}")
+
+    return set()
+
+
+def find_config_arg(content: str, name: str) -> tuple[int, int] | None:
+    """
+    在 config.typ 源码中查找某个参数的括号表达式（如 `header-links: (...)`）。
+
+    括号匹配时会跳过字符串和注释中的括号。
+
+    参数:
+        content: config.typ 源码
+        name: 参数名
+
+    返回:
+        tuple[int, int] | None: 表达式（包含两侧括号）在源码中的起止位置，未找到返回 None
+    """
+    for match in re.finditer(rf"(?<![\w-]){re.escape(name)}\s*:\s*\(", content):
+        line_start = content.rfind("\n", 0, match.start()) + 1
+        if "//" in content[line_start : match.start()]:
+            continue  # 位于行注释中
+
+        start = match.end() - 1
+        depth = 0
+        i = start
+        while i < len(content):
+            char = content[i]
+            if char == '"':
+                i += 1
+                while i < len(content) and content[i] != '"':
+                    i += 2 if content[i] == "\\" else 1
+            elif content.startswith("//", i):
+                i = content.find("\n", i)
+                if i < 0:
+                    break
+            elif content.startswith("/*", i):
+                i = content.find("*/", i)
+                if i < 0:
+                    break
+                i += 1
+            elif char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+                if depth == 0:
+                    return start, i + 1
+            i += 1
+    return None
+
+
+def get_header_links() -> list[str]:
+    """
+    从 config.typ 中解析导航栏链接（header-links 的键）。
+
+    返回:
+        list[str]: 按配置顺序排列的链接地址列表，如 ["/", "/Blog/"]
+    """
+    if not CONFIG_FILE.exists():
+        return []
+
+    try:
+        content = CONFIG_FILE.read_text(encoding="utf-8")
+        if span := find_config_arg(content, "header-links"):
+            return re.findall(r'"([^"]*)"\s*:', content[span[0] : span[1]])
+    except Exception as e:
+        print(f"⚠️ 解析 header-links 失败: {e}")
+
+    return []
+
+
+def extract_post_metadata(index_html: Path) -> tuple[str, str, str, datetime | None]:
+    """
+    从生成的 HTML 文件中提取文章的元数据信息。
+
+    功能:
+        提取文章元数据：
+        1. 标题 (title): 从 <title> 标签提取
+        2. 描述 (description): 从 <meta name="description"> 提取
+        3. 链接 (link): 从 <link rel="canonical" href="..."> 提取
+        4. 日期 (date): 依次尝试从以下来源获取：
+            - HTML 中的 <meta name="date" content="...">
+            - 文件夹名中的 YYYY-MM-DD 格式日期
+
+    参数:
+        index_html (Path): 文章的 index.html 文件路径
+
+    返回:
+        tuple[str, str, str, datetime | None]: 包含四个元素的元组：
+            - str: 文章标题
+            - str: 文章描述（可能为空字符串）
+            - str: 文章链接（完整 URL）
+            - datetime | None: 文章日期（带 UTC 时区），无法获取时为 None
+    """
+    parser = parse_html_metadata(index_html)
+
+    title = parser["title"].strip()
+    description = parser.get("description", "").strip()
+    link = parser.get("link", "")
+    date_obj = None
+
+    # 尝试从 <meta name="date"> 解析日期
+    if parser.get("date"):
+        try:
+            date_obj = datetime.strptime(parser["date"].split("T")[0], "%Y-%m-%d")
+            date_obj = date_obj.replace(tzinfo=timezone.utc)
+        except Exception:
+            pass
+
+    # 如果没找到日期，尝试从文件夹名提取 (YYYY-MM-DD)
+    if not date_obj:
+        date_match = re.search(r"(\d{4}-\d{2}-\d{2})", index_html.parent.name)
+        if date_match:
+            try:
+                date_obj = datetime.strptime(date_match.group(1), "%Y-%m-%d")
+                date_obj = date_obj.replace(tzinfo=timezone.utc)
+            except ValueError:
+                pass
+
+    return title, description, link, date_obj
+
+
+def collect_post_entries(dirs: set[str], pages: set[str] | None = None) -> dict[str, list]:
+    """
+    收集指定目录中所有文章的元数据（RSS 与文章列表数据共用）。
+
+    元数据按 index.html 的签名缓存在 .build-cache/posts.json 中，未变化的文章不再重新解析。
+
+    参数:
+        dirs (set[str]): 要扫描的目录名称集合（如 {"Blog", "Docs"}）
+        pages (set[str] | None): 只重新读取这些页面（相对于 _site 的路径），
+            其余文章直接使用缓存的元数据；None 表示扫描所有文章
+
+    返回:
+        dict[str, list]: {相对于 _site 的路径: [签名, 标题, 描述, 链接, 日期（ISO 格式或 None）]}
+    """
+    site = get_snapshot(SITE_DIR)
+    cached = load_cache("posts")
+    entries: dict[str, list] = {}
+
+    candidates = site.files if pages is None else (set(cached) | pages)
+    for rel in sorted(candidates):
+        parts = rel.split("/")
+        if len(parts) != 3 or parts[0] not in dirs or parts[2] != "index.html":
+            continue
+
+        entry = cached.get(rel)
+        if pages is None or rel in pages:
+            signature = site.signature(rel)
+            if signature is None:
+                continue  # 页面已被删除
+            if not entry or entry[0] != signature:
+                title, description, link, date_obj = extract_post_metadata(SITE_DIR / rel)
+                date_str = date_obj.isoformat() if date_obj else None
+                entry = [signature, title, description, link, date_str]
+        entries[rel] = entry
+
+    # 保留其他目录的缓存条目
+    merged = {rel: e for rel, e in cached.items() if rel.split("/")[0] not in dirs}
+    merged.update(entries)
+    if merged != cached:
+        save_cache("posts", merged)
+
+    return entries
+
+
+def collect_posts(dirs: set[str], site_url: str, pages: set[str] | None = None) -> list[dict]:
+    """
+    从指定的目录中收集所有文章的元数据。
+
+    功能:
+        遍历 _site 目录下指定目录中的所有子目录，提取每个文章的元数据信息。
+        只处理目录（每个目录代表一篇文章），跳过普通文件。
+        如果无法确定文章日期，则跳过该文章并输出警告。
+
+    参数:
+        dirs (set[str]): 要扫描的目录名称集合（如 {"Blog", "Docs"}）
+        site_url (str): 站点的根 URL（如 "https://example.com"）
+        pages (set[str] | None): 只重新读取这些页面（相对于 _site 的路径），
+            其余文章直接使用缓存的元数据；None 表示扫描所有文章
+
+    返回:
+        list[dict]: 文章数据字典列表，每个字典包含以下键：
+            - title (str): 文章标题
+            - description (str): 文章描述
+            - dir (str): 文章所属分类（即目录名）
+            - link (str): 文章的完整 URL
+            - date (datetime): 文章日期对象（带时区）
+    """
+    posts = []
+
+    for rel, entry in collect_post_entries(dirs, pages).items():
+        _, title, description, link, date_str = entry
+        parts = rel.split("/")
+        if not date_str:
+            print(f"⚠️ 无法确定文章 '{parts[1]}' 的日期，已跳过。")
+            continue
+        date_obj = datetime.fromisoformat(date_str)
+
+        posts.append(
+            {
+                "title": title,
+                "description": description,
+                "dir": parts[0],
+                "link": link,
+                "date": date_obj,
+            }
+        )
+
+    return posts
+
+
+def build_rss_xml(posts: list[dict], config: dict) -> str:
+    """
+    构建符合 RSS 2.0 规范的 XML 内容字符串。
+
+    功能:
+        使用 Python 标准库 xml.etree.ElementTree 根据文章数据和站点配置生成完整的 RSS Feed XML。
+        支持条件输出 description 标签（仅在有描述时输出）。
+
+    参数:
+        posts (list[dict]): 文章数据列表，每个字典应包含:
+            - title: 标题
+            - description: 描述（可选）
+            - link: 文章链接
+            - date: datetime 对象
+            - dir: 分类名称 (即路径名)
+        config (dict): 站点配置字典，应包含:
+            - site_url: 站点根 URL
+            - site_title: 站点标题
+            - site_description: 站点描述
+            - lang: 语言代码（如 "zh", "en"）
+
+    返回:
+        str: 完整的 RSS 2.0 XML 字符串，包含 XML 声明和所有必要的命名空间。
+    """
+    import xml.etree.ElementTree as ET
+    from email.utils import format_datetime
+
+    # 注册 atom 命名空间前缀
+    ATOM_NS = "http://www.w3.org/2005/Atom"
+    ET.register_namespace("atom", ATOM_NS)
+
+    # 创建 RSS 根元素（命名空间声明由 register_namespace 自动处理）
+    rss = ET.Element("rss", version="2.0")
+
+    # Channel 元数据
+    channel = ET.SubElement(rss, "channel")
+    ET.SubElement(channel, "title").text = config["site_title"]
+    ET.SubElement(channel, "link").text = config["site_url"]
+    ET.SubElement(channel, "description").text = config["site_description"]
+    ET.SubElement(channel, "language").text = config["lang"]
+    ET.SubElement(channel, "lastBuildDate").text = format_datetime(datetime.now(timezone.utc))
+
+    # 添加 atom:link 自链接
+    atom_link = ET.SubElement(channel, f"{{{ATOM_NS}}}link")
+    atom_link.set("href", f"{config['site_url']}/feed.xml")
+    atom_link.set("rel", "self")
+    atom_link.set("type", "application/rss+xml")
+
+    # 添加文章条目
+    for post in posts:
+        item = ET.SubElement(channel, "item")
+
+        ET.SubElement(item, "title").text = post["title"]
+        ET.SubElement(item, "link").text = post["link"]
+        ET.SubElement(item, "guid", isPermaLink="true").text = post["link"]
+        ET.SubElement(item, "pubDate").text = format_datetime(post["date"])
+        ET.SubElement(item, "category").text = post["dir"]
+
+        # 仅在有描述时添加
+        if des := post["description"]:
+            ET.SubElement(item, "description").text = des
+
+    # 生成 XML 字符串
+    ET.indent(rss, space="  ")
+    xml_str = ET.tostring(rss, encoding="unicode", xml_declaration=False)
+
+    return f'<?xml version="1.0" encoding="UTF-8"?>\n{xml_str}'
+
+
+def generate_rss(site_url: str, pages: set[str] | None = None) -> bool:
+    """
+    生成网站的 RSS 订阅源文件。
+
+    功能:
+        完整的 RSS Feed 生成流程：
+        1. 从 config.typ 读取目标目录（分类）
+        2. 收集指定目录下的所有文章元数据
+        3. 按日期排序
+        4. 构建 RSS XML 并写入文件
+
+    参数:
+        site_url: 站点的根 URL
+        pages: 只重新读取这些页面的元数据（相对于 _site 的路径），None 表示所有页面
+
+    返回:
+        bool: 生成是否成功。在以下情况返回 True：
+            - 成功生成 RSS 文件
+            - 未找到任何分类目录（跳过生成）
+            - 未找到任何文章（生成空 Feed）
+        仅在发生异常时返回 False。
+    """
+    rss_file = SITE_DIR / "feed.xml"
+    dirs = get_feed_dirs()
+
+    if not dirs:
+        print("⚠️ 跳过 RSS 订阅源生成: 未配置任何目录。")
+        return True
+
+    # 检查是否至少有一个目录存在
+    existing = {d for d in dirs if (SITE_DIR / d).exists()}
+    missing = dirs - existing
+
+    for d in missing:
+        print(f"⚠️ 警告: 配置的目录 '{d}' 不存在。")
+
+    if not existing:
+        print("⚠️ 跳过 RSS 订阅源生成: 配置的目录都不存在。")
+        return True
+
+    # 收集文章
+    with profile_span("collect_posts", "metadata"):
+        posts = collect_posts(existing, site_url, pages)
+
+    if not posts:
+        print("⚠️ 未找到任何文章，RSS 订阅源为空。")
+        return True
+
+    # 按日期降序排序
+    posts = sorted(posts, key=lambda x: x["date"], reverse=True)
+
+    # 获取配置信息
+    index_html = SITE_DIR / "index.html"
+    parser = parse_html_metadata(index_html)
+
+    lang = parser["lang"]
+    site_title = parser["title"].strip()
+    site_description = parser.get("description", "").strip()
+
+    config = {
+        "site_url": site_url,
+        "site_title": site_title,
+        "site_description": site_description,
+        "lang": lang,
+    }
+
+    # 构建 RSS XML
+    try:
+        rss_content = build_rss_xml(posts, config)
+        atomic_write_text(rss_file, rss_content)
+        refresh_snapshot(rss_file)
+        print(f"✅ RSS 订阅源生成成功: {rss_file} ({len(posts)} 篇文章)")
+        return True
+    except ValueError as e:
+        print("❌ 错误: RSS 订阅源生成失败")
+        print(f"   原因: feedgen 库报错 - {e}")
+        print("   解决: 请检查 config.typ 中的必需配置字段（title 和 description）")
+        return False
+    except Exception as e:
+        print("❌ 错误: 生成 RSS 订阅源时出错")
+        print(f"   异常: {type(e).__name__}: {e}")
+        return False
+
+
+def generate_sitemap(site_url: str, pages: set[str] | None = None) -> bool:
+    """
+    使用 Python 标准库 xml.etree.ElementTree 生成 sitemap.xml。
+
+    各页面的 lastmod 记录在 .build-cache/sitemap.json 中。指定 pages 时只更新
+    这些页面的条目，其余条目沿用上次的结果，不再遍历 _site。
+
+    参数:
+        site_url: 站点的根 URL
+        pages: 只更新这些页面（相对于 _site 的路径），None 表示遍历所有页面
+    """
+    import xml.etree.ElementTree as ET
+
+    sitemap_path = SITE_DIR / "sitemap.xml"
+    sitemap_ns = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+    # 注册默认命名空间
+    ET.register_namespace("", sitemap_ns)
+
+    # 创建根元素
+    urlset = ET.Element("urlset", xmlns=sitemap_ns)
+
+    # 从文件系统快照中读取，不再重复遍历和 stat
+    site = get_snapshot(SITE_DIR)
+    cached = load_cache("sitemap")
+    if pages is None or not cached or not sitemap_path.exists():
+        entries = {r: site.mtime_ns(r) for r in site.files if r.endswith(".html")}
+    else:
+        entries = {r: mtime for r, mtime in cached.items() if r not in pages}
+        entries.update(
+            {r: site.mtime_ns(r) for r in pages if r.endswith(".html") and r in site.files}
+        )
+    if entries != cached:
+        save_cache("sitemap", entries)
+
+    for rel_path in sorted(entries):
+
+        # 确定 URL 路径
+        if rel_path == "index.html":
+            url_path = ""
+        elif rel_path.endswith("/index.html"):
+            url_path = rel_path.removesuffix("index.html")
+        elif rel_path.endswith(".html"):
+            url_path = rel_path.removesuffix(".html") + "/"
+        else:
+            url_path = rel_path
+
+        full_url = f"{site_url}/{url_path}"
+
+        # 获取最后修改时间
+        mtime = entries[rel_path] / 1e9
+        lastmod = datetime.fromtimestamp(mtime).strftime("%Y-%m-%d")
+
+        # 创建 url 元素
+        url_elem = ET.SubElement(urlset, "url")
+        ET.SubElement(url_elem, "loc").text = full_url
+        ET.SubElement(url_elem, "lastmod").text = lastmod
+
+    # 生成 XML 字符串
+    ET.indent(urlset, space="  ")
+    xml_str = ET.tostring(urlset, encoding="unicode", xml_declaration=False)
+    sitemap_content = f'<?xml version="1.0" encoding="UTF-8"?>\n{xml_str}'
+
+    try:
+        atomic_write_text(sitemap_path, sitemap_content)
+        refresh_snapshot(sitemap_path)
+        print(f"✅ Sitemap 构建完成: 包含 {len(urlset)} 个页面")
+        return True
+    except Exception as e:
+        print(f"❌ Sitemap 构建失败: {e}")
+        return False
+
+
+def generate_robots_txt(site_url: str) -> bool:
+    """
+    Generate robots.txt pointing to the sitemap.
+    """
+    robots_content = f"""User-agent: *
+Allow: /
+
+Sitemap: {site_url}/sitemap.xml
+"""
+
+    try:
+        atomic_write_text(SITE_DIR / "robots.txt", robots_content)
+        refresh_snapshot(SITE_DIR / "robots.txt")
+        return True
+    except Exception as e:
+        print(f"❌ 生成 robots.txt 失败: {e}")
+        return False
+
+
+# ============================================================================
+# HTML 工具函数
+# ============================================================================
+
+# 匹配 HTML 开始标签（Typst 生成的 HTML 结构规整，无需完整的 HTML 解析器）
+TAG_PATTERN = re.compile(
+    r"<([a-zA-Z][a-zA-Z0-9-]*)((?:\s+[^\s=>/]+(?:\s*=\s*(?:\"[^\"]*\"|'[^']*'|[^\s>]+))?)*)\s*/?>"
+)
+ATTR_PATTERN = re.compile(r"([^\s=>/]+)(?:\s*=\s*(?:\"([^\"]*)\"|'([^']*)'|([^\s>]+)))?")
+# 注释以及 <script>/<style> 内部的原始文本，扫描标签前需要剔除
+RAW_TEXT_PATTERN = re.compile(
+    r"<!--.*?-->|(<(script|style)\b[^>]*>).*?(</\2\s*>)", re.DOTALL | re.IGNORECASE
+)
+
+# HTML 后处理步骤：接收 (页面相对于 _site/ 的路径, HTML 文本)，返回处理后的 HTML 文本
+HtmlTransform = Callable[[str, str], str]
+
+
+@dataclass
+class PostprocessContext:
+    """HTML 后处理过程中各步骤共享的状态"""
+
+    files: set[str]  # _site 下所有文件的相对路径
+    caches: dict[str, dict] = field(default_factory=dict)  # 处理结束后写回 .build-cache/
+    finalizers: list[Callable[[], bool]] = field(default_factory=list)  # 所有页面处理完后执行
+
+    def cache(self, name: str) -> dict:
+        """获取（必要时加载）某个缓存"""
+        if name not in self.caches:
+            self.caches[name] = load_cache(name)
+        return self.caches[name]
+
+
+def parse_tag_attrs(attr_text: str) -> dict[str, str | None]:
+    """
+    解析开始标签中的属性文本。
+
+    参数:
+        attr_text: 标签名之后的属性部分（TAG_PATTERN 的第二个分组）
+
+    返回:
+        dict[str, str | None]: 属性字典（保持原有顺序），布尔属性的值为 None
+    """
+    attrs: dict[str, str | None] = {}
+    for match in ATTR_PATTERN.finditer(attr_text):
+        value = next((v for v in match.group(2, 3, 4) if v is not None), None)
+        attrs[match.group(1).lower()] = html.unescape(value) if value is not None else None
+    return attrs
+
+
+def format_tag(tag: str, attrs: dict[str, str | None]) -> str:
+    """
+    将标签名和属性字典重新序列化为开始标签。
+
+    参数:
+        tag: 标签名
+        attrs: 属性字典，值为 None 表示布尔属性
+
+    返回:
+        str: 开始标签字符串
+    """
+    parts = [tag]
+    for name, value in attrs.items():
+        parts.append(name if value is None else f'{name}="{html.escape(value, quote=True)}"')
+    return f"<{' '.join(parts)}>"
+
+
+def site_path_to_url(rel_path: str) -> str:
+    """
+    将 _site 内的相对文件路径转换为站点 URL 路径。
+
+    参数:
+        rel_path: 相对于 _site/ 的 POSIX 路径（如 "Blog/post/index.html"）
+
+    返回:
+        str: 以 "/" 开头的 URL 路径（如 "/Blog/post/"）
+    """
+    if rel_path == "index.html":
+        return "/"
+    if rel_path.endswith("/index.html"):
+        return "/" + rel_path.removesuffix("index.html")
+    return "/" + rel_path
+
+
+def resolve_site_reference(
+    page_url: str, ref: str, site_url: str | None = None
+) -> tuple[str, str] | None:
+    """
+    将页面中的 href/src 引用解析为站内 URL 路径。
+
+    参数:
+        page_url: 引用所在页面的 URL 路径（如 "/Blog/"）
+        ref: 原始引用字符串
+        site_url: 站点根 URL，以它开头的绝对链接也视为站内链接
+
+    返回:
+        tuple[str, str] | None: (已解码的 URL 路径, 锚点)，外部链接或空引用返回 None
+    """
+    import posixpath
+    from urllib.parse import unquote, urlsplit
+
+    ref = ref.strip()
+    if not ref:
+        return None
+    if site_url and (ref == site_url or ref.startswith(f"{site_url}/")):
+        ref = ref[len(site_url) :] or "/"
+
+    parts = urlsplit(ref)
+    if parts.scheme or parts.netloc:
+        return None
+
+    if not parts.path:
+        path = page_url
+    elif parts.path.startswith("/"):
+        path = parts.path
+    else:
+        path = page_url.rsplit("/", 1)[0] + "/" + parts.path
+
+    normalized = posixpath.normpath(path)
+    if path.endswith(("/", "/.", "/..")) and normalized != "/":
+        normalized += "/"
+    return unquote(normalized), unquote(parts.fragment)
+
+
+def list_site_files() -> set[str]:
+    """
+    返回 _site 目录中所有文件的相对路径（来自文件系统快照）。
+
+    返回:
+        set[str]: 相对于 _site/ 的 POSIX 路径集合
+    """
+    return set(get_snapshot(SITE_DIR).files)
+
+
+def lookup_site_path(url_path: str, files: set[str]) -> tuple[str | None, bool]:
+    """
+    按静态托管的规则查找 URL 路径对应的 _site 文件。
+
+    参数:
+        url_path: 以 "/" 开头的已解码 URL 路径
+        files: _site 下所有文件的相对 POSIX 路径集合
+
+    返回:
+        tuple[str | None, bool]: (命中的文件路径, 是否是缺少结尾斜杠的目录链接)
+    """
+    rel = url_path.lstrip("/")
+    if rel == "" or rel.endswith("/"):
+        index = f"{rel}index.html"
+        return (index if index in files else None), False
+    if rel in files:
+        return rel, False
+    if f"{rel}/index.html" in files:
+        return f"{rel}/index.html", True
+    if f"{rel}.html" in files:
+        return f"{rel}.html", False
+    return None, False
+
+
+# ============================================================================
+# 链接检查
+# ============================================================================
+
+
+def scan_html_links(html_path: str) -> tuple[list[str], list[str]]:
+    """
+    扫描单个 HTML 文件，提取元素 ID 以及所有 href/src/srcset 引用。
+
+    该函数会在进程池中运行，因此只接收和返回可序列化的简单类型。
+
+    参数:
+        html_path: HTML 文件路径
+
+    返回:
+        tuple[list[str], list[str]]: (元素 ID 列表, 引用列表)
+    """
+    text = Path(html_path).read_text(encoding="utf-8", errors="replace")
+    text = RAW_TEXT_PATTERN.sub(lambda m: m.group(1) + m.group(3) if m.group(1) else "", text)
+
+    ids: list[str] = []
+    refs: list[str] = []
+    for match in TAG_PATTERN.finditer(text):
+        attrs = parse_tag_attrs(match.group(2))
+        if element_id := attrs.get("id"):
+            ids.append(element_id)
+        if match.group(1).lower() == "a" and (name := attrs.get("name")):
+            ids.append(name)
+        for attr in ("href", "src", "poster"):
+            if value := attrs.get(attr):
+                refs.append(value)
+        if srcset := attrs.get("srcset"):
+            refs.extend(c.split()[0] for c in srcset.split(",") if c.strip())
+
+    return ids, refs
+
+
+def _parse_pages(paths: list[str]) -> list[tuple[list[str], list[str]]]:
+    """
+    解析多个 HTML 文件，数量较多时使用进程池并行处理。
+
+    参数:
+        paths: HTML 文件路径列表
+
+    返回:
+        list[tuple[list[str], list[str]]]: 与 paths 一一对应的解析结果
+    """
+    if len(paths) >= LINK_CHECK_POOL_THRESHOLD:
+        from concurrent.futures import ProcessPoolExecutor
+
+        try:
+            with ProcessPoolExecutor() as pool:
+                return list(pool.map(scan_html_links, paths, chunksize=32))
+        except (OSError, NotImplementedError):
+            pass  # 当前环境不支持多进程，回退到串行解析
+
+    return [scan_html_links(p) for p in paths]
+
+
+def check_links(force: bool = False) -> bool:
+    """
+    检查 _site 中所有站内链接与锚点是否有效。
+
+    功能:
+        1. 遍历一次 _site，建立已存在文件的索引
+        2. 只重新解析内容发生变化的 HTML 页面（结果缓存在 .build-cache/links.json）
+        3. 用缓存的 ID 与引用校验每个站内 href/src，包括 #锚点
+
+    参数:
+        force: 是否忽略缓存，重新解析所有页面
+
+    返回:
+        bool: 没有失效链接时返回 True
+    """
+    if not SITE_DIR.exists():
+        print(f"  ⚠ 输出目录 {SITE_DIR} 不存在，请先运行 build 命令。")
+        return False
+
+    print("正在检查站内链接...")
+
+    files = list_site_files()
+    pages = sorted(f for f in files if f.endswith(".html"))
+
+    cached = {} if force else load_cache("links").get("pages", {})
+    entries: dict[str, dict] = {}
+    stale: list[tuple[str, list[int] | None]] = []
+    for rel in pages:
+        signature = path_signature(SITE_DIR / rel)
+        entry = cached.get(rel)
+        if entry and entry["sig"] == signature:
+            entries[rel] = entry
+        else:
+            stale.append((rel, signature))
+
+    results = _parse_pages([str(SITE_DIR / rel) for rel, _ in stale])
+    for (rel, signature), (ids, refs) in zip(stale, results):
+        entries[rel] = {"sig": signature, "ids": ids, "refs": refs}
+
+    site_url = get_site_url() if "index.html" in files else None
+    id_sets: dict[str, set[str]] = {}
+    broken: list[str] = []
+    warnings: list[str] = []
+
+    for rel, entry in entries.items():
+        page_url = site_path_to_url(rel)
+        for ref in entry["refs"]:
+            resolved = resolve_site_reference(page_url, ref, site_url)
+            if resolved is None:
+                continue
+            path, fragment = resolved
+
+            target, missing_slash = lookup_site_path(path, files)
+            if target is None:
+                broken.append(f"{rel}: {ref}（目标不存在）")
+                continue
+            if missing_slash:
+                warnings.append(f"{rel}: {ref}（目录链接缺少结尾的 /，依赖服务器重定向）")
+
+            if fragment and fragment != "top" and target in entries:
+                if target not in id_sets:
+                    id_sets[target] = set(entries[target]["ids"])
+                if fragment not in id_sets[target]:
+                    broken.append(f"{rel}: {ref}（锚点 #{fragment} 不存在）")
+
+    save_cache("links", {"pages": entries})
+
+    for message in warnings:
+        print(f"  ⚠️ {message}")
+    for message in broken[:50]:
+        print(f"  ❌ {message}")
+    if len(broken) > 50:
+        print(f"  ... 以及另外 {len(broken) - 50} 个失效链接")
+
+    summary = f"{len(pages)} 个页面，重新解析 {len(stale)} 个"
+    if broken:
+        print(f"❌ 链接检查完成: 发现 {len(broken)} 个失效链接（{summary}）")
+        return False
+
+    print(f"✅ 链接检查完成: 未发现失效链接（{summary}）")
+    return True
+
+
+# ============================================================================
+# 图片处理
+# ============================================================================
+
+# JPEG 中表示帧尺寸的 SOF 标记
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _jpeg_orientation(segment: bytes) -> int:
+    """
+    从 JPEG 的 APP1 (Exif) 段中读取方向标记。
+
+    参数:
+        segment: APP1 段的数据（不含标记与长度字段）
+
+    返回:
+        int: Exif Orientation 值，读取失败时返回 1（正常方向）
+    """
+    if not segment.startswith(b"Exif\0\0"):
+        return 1
+    tiff = segment[6:]
+    order = "little" if tiff[:2] == b"II" else "big"
+    try:
+        ifd = int.from_bytes(tiff[4:8], order)
+        for i in range(int.from_bytes(tiff[ifd : ifd + 2], order)):
+            entry = ifd + 2 + i * 12
+            if int.from_bytes(tiff[entry : entry + 2], order) == 0x0112:
+                return int.from_bytes(tiff[entry + 8 : entry + 10], order)
+    except (IndexError, ValueError):
+        pass
+    return 1
+
+
+def read_image_size(data: bytes) -> tuple[int, int] | None:
+    """
+    只根据文件头解析图片尺寸，不解码像素。
+
+    支持 PNG、GIF、WebP（VP8/VP8L/VP8X）和 JPEG（会根据 Exif 方向交换宽高）。
+
+    参数:
+        data: 图片文件开头的字节（JPEG 可能需要较多字节才能读到 SOF 段）
+
+    返回:
+        tuple[int, int] | None: (宽, 高)，无法识别时返回 None
+    """
+    if data.startswith(b"\x89PNG\r\n\x1a\n") and len(data) >= 24:
+        return int.from_bytes(data[16:20], "big"), int.from_bytes(data[20:24], "big")
+
+    if data[:6] in (b"GIF87a", b"GIF89a") and len(data) >= 10:
+        return int.from_bytes(data[6:8], "little"), int.from_bytes(data[8:10], "little")
+
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP" and len(data) >= 30:
+        chunk = data[12:16]
+        if chunk == b"VP8 " and data[23:26] == b"\x9d\x01\x2a":
+            width = int.from_bytes(data[26:28], "little") & 0x3FFF
+            height = int.from_bytes(data[28:30], "little") & 0x3FFF
+            return width, height
+        if chunk == b"VP8L" and data[20] == 0x2F:
+            bits = int.from_bytes(data[21:25], "little")
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b"VP8X":
+            width = int.from_bytes(data[24:27], "little") + 1
+            height = int.from_bytes(data[27:30], "little") + 1
+            return width, height
+        return None
+
+    if data[:2] == b"\xff\xd8":
+        orientation = 1
+        i = 2
+        while i + 9 < len(data):
+            if data[i] != 0xFF:
+                return None
+            marker = data[i + 1]
+            if marker == 0xFF:
+                i += 1
+                continue
+            if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+                i += 2
+                continue
+            length = int.from_bytes(data[i + 2 : i + 4], "big")
+            if marker == 0xE1:
+                orientation = _jpeg_orientation(data[i + 4 : i + 2 + length])
+            elif marker in JPEG_SOF_MARKERS:
+                height = int.from_bytes(data[i + 5 : i + 7], "big")
+                width = int.from_bytes(data[i + 7 : i + 9], "big")
+                return (height, width) if orientation >= 5 else (width, height)
+            i += 2 + length
+
+    return None
+
+
+def get_image_size(path: Path, size_cache: dict[str, list[int]]) -> tuple[int, int] | None:
+    """
+    获取图片文件的尺寸，结果按文件内容摘要缓存。
+
+    参数:
+        path: 图片文件路径
+        size_cache: 摘要到 [宽, 高] 的缓存字典，会被原地更新
+
+    返回:
+        tuple[int, int] | None: (宽, 高)，无法识别时返回 None
+    """
+    digest = file_digest(path)
+    if digest is None:
+        return None
+    if digest in size_cache:
+        cached = size_cache[digest]
+        return (cached[0], cached[1]) if cached else None
+
+    with path.open("rb") as f:
+        data = f.read(64 * 1024)
+        size = read_image_size(data)
+        if size is None and data[:2] == b"\xff\xd8":
+            # Exif 缩略图等元数据可能很大，SOF 段不在开头 64KB 内
+            size = read_image_size(data + f.read())
+
+    size_cache[digest] = list(size) if size else []
+    return size
+
+
+def decode_data_uri(uri: str) -> tuple[str, bytes] | None:
+    """
+    解码 base64 编码的 data: URI（Typst 导出 HTML 时 image() 输出的图片）。
+
+    参数:
+        uri: data: URI 字符串
+
+    返回:
+        tuple[str, bytes] | None: (MIME 类型, 内容)，不是 base64 编码时返回 None
+    """
+    header, _, payload = uri.partition(",")
+    if not header.startswith("data:") or not header.endswith(";base64"):
+        return None
+    try:
+        data = base64.b64decode(payload)
+    except ValueError:
+        return None
+    return header[5:].split(";", 1)[0].lower(), data
+
+
+def read_data_uri_size(uri: str) -> tuple[int, int] | None:
+    """
+    解析 base64 编码的 data: URI 图片的尺寸。
+
+    参数:
+        uri: data: URI 字符串
 
-    print(f"✅ HTML 构建完成。{stats.format_summary()}")
-    return not stats.has_failures
+    返回:
+        tuple[int, int] | None: (宽, 高)，无法识别时返回 None
+    """
+    decoded = decode_data_uri(uri)
+    return read_image_size(decoded[1]) if decoded else None
 
 
-def build_pdf(force: bool = False) -> bool:
+def make_image_attrs_transform(files: set[str], size_cache: dict[str, list[int]]) -> HtmlTransform:
     """
-    编译文件名包含 "PDF" 的 .typ 文件为 PDF。
+    创建补充 <img> 属性的后处理步骤。
+
+    - 缺少 width/height 时根据图片文件头补充，避免加载时的布局偏移
+    - 前 EAGER_IMAGE_COUNT 张图片正常加载，第一张标记 fetchpriority="high"
+    - 其余图片标记 loading="lazy" decoding="async"
+    已有的属性不会被覆盖。
 
     参数:
-        force: 是否强制重建所有文件
+        files: _site 下所有文件的相对路径集合
+        size_cache: 图片尺寸缓存，会被原地更新
+
+    返回:
+        HtmlTransform: 后处理函数
     """
-    SITE_DIR.mkdir(parents=True, exist_ok=True)
 
-    typ_files = find_typ_files()
-    pdf_files = [f for f in typ_files if "pdf" in f.stem.lower()]
+    def transform(rel_path: str, text: str) -> str:
+        page_url = site_path_to_url(rel_path)
+        index = 0
+
+        def replace(match: re.Match) -> str:
+            nonlocal index
+            if match.group(1).lower() != "img":
+                return match.group(0)
+            attrs = parse_tag_attrs(match.group(2))
+            # 公式图片（MATH_SVG = "external"）不计入首屏图片
+            if not (src := attrs.get("src")) or src.startswith(f"/{MATH_DIR}/"):
+                return match.group(0)
+
+            original = dict(attrs)
+            if "width" not in attrs and "height" not in attrs:
+                size = None
+                if src.startswith("data:"):
+                    size = read_data_uri_size(src)
+                elif resolved := resolve_site_reference(page_url, src):
+                    target, _ = lookup_site_path(resolved[0], files)
+                    if target:
+                        size = get_image_size(SITE_DIR / target, size_cache)
+                if size:
+                    attrs["width"], attrs["height"] = str(size[0]), str(size[1])
+
+            if index >= EAGER_IMAGE_COUNT:
+                attrs.setdefault("loading", "lazy")
+                attrs.setdefault("decoding", "async")
+            elif index == 0 and attrs.get("loading") != "lazy":
+                attrs.setdefault("fetchpriority", "high")
+            index += 1
+
+            return match.group(0) if attrs == original else format_tag("img", attrs)
+
+        return TAG_PATTERN.sub(replace, text)
+
+    return transform
+
+
+def responsive_image_formats() -> list[str]:
+    """
+    返回当前环境下可用的响应式图片编码格式。
 
-    if not pdf_files:
+    返回:
+        list[str]: RESPONSIVE_FORMATS 中 Pillow 支持编码的格式，未安装 Pillow 时为空列表
+    """
+    try:
+        from PIL import features
+    except ImportError:
+        return []
+
+    formats = []
+    for fmt in RESPONSIVE_FORMATS:
+        if fmt == "avif":
+            try:
+                import pillow_avif  # noqa: F401  # 旧版 Pillow 通过插件支持 AVIF
+            except ImportError:
+                if not features.check("avif"):
+                    continue
+        elif not features.check(fmt):
+            continue
+        formats.append(fmt)
+    return formats
+
+
+def encode_image_variant(job: tuple[str, str, int, str, int]) -> str | None:
+    """
+    将图片缩放到指定宽度并编码为目标格式，写入 .build-cache/images/。
+
+    编码前会根据 Exif 方向旋转图片，输出时不保留 Exif/XMP 元数据。
+    该函数会在进程池中运行。
+
+    参数:
+        job: (源文件路径, 缓存文件路径, 目标宽度, 格式, 质量)
+
+    返回:
+        str | None: 成功时返回缓存文件路径，失败时返回 None
+    """
+    from PIL import Image, ImageOps
+
+    try:
+        import pillow_avif  # noqa: F401
+    except ImportError:
+        pass
+
+    source, cache_path, width, fmt, quality = job
+    try:
+        with Image.open(source) as image:
+            image = ImageOps.exif_transpose(image)
+            height = round(image.height * width / image.width)
+            image = image.resize((width, height), Image.Resampling.LANCZOS)
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+            tmp_path = f"{cache_path}.tmp"
+            image.save(tmp_path, format=fmt.upper(), quality=quality)
+            os.replace(tmp_path, cache_path)
+        return cache_path
+    except Exception as e:
+        print(f"  ❌ 生成 {source} 的 {width}px {fmt} 版本失败: {e}")
+        return None
+
+
+# 判断图片所在版面时关心的位置：边注/全宽容器的开始与结束、<img> 标签
+IMAGE_LAYOUT_PATTERN = re.compile(
+    r'class="(marginnote|fullwidth)"|</(span|div)>|<(img)\b', re.IGNORECASE
+)
+
+
+def image_layout_contexts(text: str) -> dict[int, str]:
+    """
+    一次扫描 HTML，判断每张图片位于哪种版面中（边注、全宽或正文）。
+
+    图片之前最近的 class="marginnote" 之后没有 </span> 时位于边注中，
+    最近的 class="fullwidth" 之后没有 </div> 时位于全宽容器中。
+
+    参数:
+        text: HTML 文本
+
+    返回:
+        dict[int, str]: {<img> 标签的起始位置: RESPONSIVE_SIZES 中的键}
+    """
+    contexts: dict[int, str] = {}
+    in_note = in_wide = False
+    for match in IMAGE_LAYOUT_PATTERN.finditer(text):
+        opened, closed, img = match.groups()
+        if opened:
+            if opened.lower() == "marginnote":
+                in_note = True
+            else:
+                in_wide = True
+        elif closed:
+            if closed.lower() == "span":
+                in_note = False
+            else:
+                in_wide = False
+        elif img:
+            contexts[match.start()] = (
+                "marginnote" if in_note else "fullwidth" if in_wide else "default"
+            )
+    return contexts
+
+
+# 可以生成响应式版本的图片：{MIME 类型: 扩展名}
+DATA_URI_IMAGE_TYPES = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp"}
+
+
+def make_responsive_images_transform(ctx: PostprocessContext) -> HtmlTransform | None:
+    """
+    创建响应式图片的后处理步骤。
+
+    对宽度大于最小档位的 JPEG/PNG/WebP 图片（包括 Typst 以 data: URI 内嵌在页面中的图片，
+    它们会先以原图输出为 /_img/<摘要>.<扩展名>，不再内嵌）：
+    1. 记录需要的缩小版本，所有页面处理完后在进程池中统一编码
+       （按源文件摘要与编码参数缓存在 .build-cache/images/，每张图片只编码一次）
+    2. 将 <img> 改写为带 srcset/sizes 的形式，浏览器支持 AVIF 时通过 <picture> 优先使用 AVIF
+    生成的文件以内容摘要命名，放在 _site/_img/ 下。
+
+    参数:
+        ctx: 后处理上下文
+
+    返回:
+        HtmlTransform | None: 后处理函数，未安装 Pillow 时返回 None
+    """
+    formats = responsive_image_formats()
+    if not formats:
+        print("  ⚠️ 未安装 Pillow，跳过响应式图片生成（可运行 pip install pillow 安装）")
+        return None
+
+    size_cache = ctx.cache("image-sizes")
+    variants: dict[str, tuple[Path, int, str]] = {}  # 输出文件名 -> (源文件, 宽度, 格式)
+
+    def transform(rel_path: str, text: str) -> str:
+        page_url = site_path_to_url(rel_path)
+        layouts = image_layout_contexts(text)
+
+        def replace(match: re.Match) -> str:
+            if match.group(1).lower() != "img":
+                return match.group(0)
+            attrs = parse_tag_attrs(match.group(2))
+            src = attrs.get("src")
+            if not src or "srcset" in attrs:
+                return match.group(0)
+
+            if src.startswith("data:"):
+                decoded = decode_data_uri(src)
+                suffix = DATA_URI_IMAGE_TYPES.get(decoded[0]) if decoded else None
+                # INLINE_ASSETS 有意内嵌的小图片保持原样
+                if not suffix or (INLINE_ASSETS and len(decoded[1]) <= INLINE_ASSET_LIMIT):
+                    return match.group(0)
+                size = read_image_size(decoded[1])
+                widths = [w for w in RESPONSIVE_WIDTHS if size and w < size[0]]
+                if not widths:
+                    return match.group(0)
+                target = f"_img/{hashlib.sha256(decoded[1]).hexdigest()[:16]}{suffix}"
+                if target not in ctx.files:
+                    (SITE_DIR / "_img").mkdir(parents=True, exist_ok=True)
+                    atomic_write_bytes(SITE_DIR / target, decoded[1])
+                    refresh_snapshot(SITE_DIR / target)
+                    ctx.files.add(target)
+                src = attrs["src"] = f"/{target}"
+            else:
+                resolved = resolve_site_reference(page_url, src)
+                target = lookup_site_path(resolved[0], ctx.files)[0] if resolved else None
+                suffix = Path(target).suffix.lower() if target else ""
+                if suffix not in (".jpg", ".jpeg", ".png", ".webp"):
+                    return match.group(0)
+
+            source = SITE_DIR / target
+            size = get_image_size(source, size_cache)
+            widths = [w for w in RESPONSIVE_WIDTHS if size and w < size[0]]
+            if not widths:
+                return match.group(0)
+
+            digest = file_digest(source)[:16]
+            srcsets = {}
+            for fmt in formats:
+                candidates = []
+                for width in widths:
+                    name = f"{digest}-{width}w.{fmt}"
+                    variants[name] = (source, width, fmt)
+                    candidates.append(f"/_img/{name} {width}w")
+                srcsets[fmt] = candidates
+
+            sizes = RESPONSIVE_SIZES[layouts.get(match.start(), "default")]
+            fallback = formats[-1]
+            attrs["srcset"] = ", ".join([*srcsets.pop(fallback), f"{src} {size[0]}w"])
+            attrs["sizes"] = sizes
+            img = format_tag("img", attrs)
+            if not srcsets:
+                return img
+
+            sources = "".join(
+                f'<source type="image/{fmt}" srcset="{html.escape(", ".join(c))}"'
+                f' sizes="{html.escape(sizes)}">'
+                for fmt, c in srcsets.items()
+            )
+            return f"<picture>{sources}{img}</picture>"
+
+        return TAG_PATTERN.sub(replace, text)
+
+    def finalize() -> bool:
+        if not variants:
+            return True
+
+        cache_dir = CACHE_DIR / "images"
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        output_dir = SITE_DIR / "_img"
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        jobs = []
+        for name, (source, width, fmt) in variants.items():
+            cache_path = cache_dir / f"{name.rsplit('.', 1)[0]}-q{RESPONSIVE_QUALITY}.{fmt}"
+            if not cache_path.exists():
+                jobs.append((str(source), str(cache_path), width, fmt, RESPONSIVE_QUALITY))
+
+        if jobs:
+            from concurrent.futures import ProcessPoolExecutor
+
+            print(f"  正在生成 {len(jobs)} 个响应式图片版本...")
+            try:
+                with ProcessPoolExecutor() as pool:
+                    results = list(pool.map(encode_image_variant, jobs))
+            except (OSError, NotImplementedError):
+                results = [encode_image_variant(job) for job in jobs]
+            if not all(results):
+                return False
+
+        for name, (source, width, fmt) in variants.items():
+            cache_path = cache_dir / f"{name.rsplit('.', 1)[0]}-q{RESPONSIVE_QUALITY}.{fmt}"
+            output = output_dir / name
+            if not output.exists():
+                atomic_copy(cache_path, output)
+                refresh_snapshot(output)
+
+        print(f"  🖼️ 响应式图片: {len(variants)} 个版本（新编码 {len(jobs)} 个）")
         return True
 
-    print("正在构建 PDF 文件...")
+    ctx.finalizers.append(finalize)
+    return transform
 
-    # 获取公共依赖
-    common_deps = find_common_dependencies()
 
-    def build_pdf_args(typ_file: Path, output_path: Path) -> list[str]:
-        """构建 PDF 编译参数"""
-        return [
-            "compile",
-            "--root",
-            ".",
-            "--font-path",
-            str(ASSETS_DIR),
-            str(typ_file),
-            str(output_path),
-        ]
+# ============================================================================
+# HTML 后处理
+# ============================================================================
 
-    stats = _compile_files(
-        pdf_files,
-        force,
-        common_deps,
-        lambda typ_file: get_file_output_path(typ_file, "pdf"),
-        build_pdf_args,
-    )
+def make_media_transform(media_map: dict[str, str], page_refs: dict[str, dict]) -> HtmlTransform:
+    """
+    创建将重复资源的引用改写为 /_media/ 共享 URL 的后处理步骤（DEDUPE_ASSETS = "media"）。
 
-    print(f"✅ PDF 构建完成。{stats.format_summary()}")
+    参数:
+        media_map: {原路径: _media/ 下的路径}，均相对于 _site/
+        page_refs: {页面: {原路径: _media/ 下的路径}}，记录每个页面改写过的引用，会被原地更新
+
+    返回:
+        HtmlTransform: 后处理函数
+    """
+
+    def transform(rel_path: str, text: str) -> str:
+        page_url = site_path_to_url(rel_path)
+        refs: dict[str, str] = {}
+
+        def replace(match: re.Match) -> str:
+            attrs = parse_tag_attrs(match.group(2))
+            changed = False
+            for name in ("src", "href", "poster"):
+                ref = attrs.get(name)
+                if not ref or not (resolved := resolve_site_reference(page_url, ref)):
+                    continue
+                original = resolved[0].lstrip("/")
+                if media_rel := media_map.get(original):
+                    attrs[name] = f"/{media_rel}" + (f"#{resolved[1]}" if resolved[1] else "")
+                    refs[original] = media_rel
+                    changed = True
+            return format_tag(match.group(1), attrs) if changed else match.group(0)
+
+        text = TAG_PATTERN.sub(replace, text)
+        # 已改写过的页面再次处理时不会再匹配到原路径，因此与之前的记录合并
+        if refs:
+            page_refs[rel_path] = page_refs.get(rel_path, {}) | refs
+        return text
+
+    return transform
+
+
+def inject_head_block(text: str, name: str, block: str) -> str:
+    """
+    在 </head> 之前注入一段带标记注释的代码块。
+
+    同名代码块已存在时会被替换，因此重复处理同一页面不会产生重复内容。
+
+    参数:
+        text: HTML 文本
+        name: 代码块名称，用于生成 <!-- build:name --> 标记
+        block: 要注入的 HTML，为空字符串时仅移除已有代码块
+
+    返回:
+        str: 处理后的 HTML 文本
+    """
+    start, end = f"<!-- build:{name} -->", f"<!-- /build:{name} -->"
+    text = re.sub(rf"[ \t]*{re.escape(start)}.*?{re.escape(end)}\n?", "", text, flags=re.DOTALL)
+    if not block:
+        return text
+
+    head_end = text.find("</head>")
+    if head_end < 0:
+        return text
+    line_start = text.rfind("\n", 0, head_end) + 1
+    if not text[line_start:head_end].strip():
+        head_end = line_start
+    return f"{text[:head_end]}{start}\n{block}\n{end}\n{text[head_end:]}"
+
+
+def render_prefetch_hints(nav_urls: list[str], article_urls: list[str]) -> str:
+    """
+    生成预取提示的 HTML。
+
+    导航链接使用 immediate 级别立即预取；文章链接使用 moderate 级别（鼠标悬停时预取）。
+    <link rel="prefetch"> 作为不支持 Speculation Rules 的浏览器的回退，只用于导航链接。
+
+    参数:
+        nav_urls: 导航目标 URL 列表
+        article_urls: 文章 URL 列表
+
+    返回:
+        str: 要注入 <head> 的 HTML，无需预取时返回空字符串
+    """
+    from urllib.parse import quote
+
+    lines = []
+
+    if PREFETCH_MODE in ("speculationrules", "both"):
+        rules = []
+        if nav_urls:
+            rules.append({"source": "list", "urls": nav_urls, "eagerness": "immediate"})
+        if article_urls:
+            rules.append({"source": "list", "urls": article_urls, "eagerness": "moderate"})
+        if rules:
+            payload = json.dumps({"prefetch": rules}, ensure_ascii=False).replace("</", "<\\/")
+            lines.append(f'<script type="speculationrules">{payload}</script>')
+
+    if PREFETCH_MODE in ("link", "both"):
+        for url in nav_urls:
+            lines.append(f'<link rel="prefetch" href="{html.escape(quote(url, safe="/#"))}">')
+
+    return "\n".join(lines)
+
+
+def make_prefetch_transform(files: set[str]) -> HtmlTransform:
+    """
+    创建注入预取提示的后处理步骤。
+
+    每个页面都会预取 header-links 中的其他导航目标；header-links 指向的列表页
+    （如 /Blog/）还会预取页面中链接到的站内文章。
+
+    参数:
+        files: _site 下所有文件的相对路径集合
+
+    返回:
+        HtmlTransform: 后处理函数
+    """
+    nav_targets = []
+    for link in get_header_links():
+        target, _ = lookup_site_path(link, files) if link.startswith("/") else (None, False)
+        if target and (url := site_path_to_url(target)) not in nav_targets:
+            nav_targets.append(url)
+
+    def transform(rel_path: str, text: str) -> str:
+        page_url = site_path_to_url(rel_path)
+        nav_urls = [url for url in nav_targets if url != page_url][:PREFETCH_NAV_LIMIT]
+
+        article_urls: list[str] = []
+        if page_url in nav_targets:
+            for match in TAG_PATTERN.finditer(text):
+                if len(article_urls) >= PREFETCH_ARTICLE_LIMIT:
+                    break
+                if match.group(1).lower() != "a":
+                    continue
+                href = parse_tag_attrs(match.group(2)).get("href")
+                resolved = resolve_site_reference(page_url, href) if href else None
+                if not resolved:
+                    continue
+                target, _ = lookup_site_path(resolved[0], files)
+                if not target or not target.endswith(".html"):
+                    continue
+                url = site_path_to_url(target)
+                if url != page_url and url not in nav_targets and url not in article_urls:
+                    article_urls.append(url)
+
+        return inject_head_block(text, "prefetch", render_prefetch_hints(nav_urls, article_urls))
+
+    return transform
+
+
+def collect_html_transforms(ctx: PostprocessContext) -> list[tuple[str, HtmlTransform]]:
+    """
+    按执行顺序收集所有启用的 HTML 后处理步骤。
+
+    每个步骤的名称中包含其配置项，配置变化时所有页面都会被重新处理。
+
+    参数:
+        ctx: 后处理上下文
+
+    返回:
+        list[tuple[str, HtmlTransform]]: (步骤名称, 后处理函数) 列表
+    """
+    transforms: list[tuple[str, HtmlTransform]] = []
+
+    # 引用改写最先执行，后续步骤看到的都是 /_media/ 下实际存在的文件
+    if DEDUPE_ASSETS == "media" and (media_map := load_cache("media")):
+        fingerprint = hashlib.sha256(json.dumps(media_map, sort_keys=True).encode()).hexdigest()
+        transform = make_media_transform(media_map, ctx.cache("media-pages"))
+        transforms.append((f"media:{fingerprint[:16]}", transform))
+
+    if MATH_SVG != "off":
+        transforms.append((f"math:{math_mode_key()}", make_math_transform(ctx)))
+
+    # 第三方样式表与脚本加载方式；关闭后按记录还原
+    if VENDOR_STYLESHEETS or DEFER_SCRIPTS or load_cache("vendor-pages"):
+        excluded = ",".join(DEFER_SCRIPTS_EXCLUDE)
+        name = f"vendor:{VENDOR_STYLESHEETS}:{DEFER_SCRIPTS}:{excluded}"
+        transforms.append((name, make_vendor_transform(ctx)))
+
+    # 内联小文件在补充图片属性之前执行；关闭后按记录还原
+    if INLINE_ASSETS or load_cache("inline-pages"):
+        name = f"inline:{INLINE_ASSETS}:{INLINE_ASSET_LIMIT}:{INLINE_ASSET_MAX_PAGES}"
+        transforms.append((name, make_inline_transform(ctx)))
+
+    if IMAGE_ATTRIBUTES:
+        transform = make_image_attrs_transform(ctx.files, ctx.cache("image-sizes"))
+        transforms.append((f"image-attrs:{EAGER_IMAGE_COUNT}", transform))
+
+    if RESPONSIVE_IMAGES and (responsive := make_responsive_images_transform(ctx)):
+        formats = ",".join(responsive_image_formats())
+        name = f"responsive:{RESPONSIVE_WIDTHS}:{formats}:{RESPONSIVE_QUALITY}:{RESPONSIVE_SIZES}"
+        transforms.append((name, responsive))
+
+    if PREFETCH_HINTS:
+        name = f"prefetch:{PREFETCH_MODE}:{PREFETCH_NAV_LIMIT}:{PREFETCH_ARTICLE_LIMIT}"
+        transforms.append((name, make_prefetch_transform(ctx.files)))
+
+    # Web 字体的 @font-face 样式表；关闭后从页面中移除
+    if WEBFONTS or load_cache("webfonts"):
+        link = f'<link rel="stylesheet" href="/{FONTS_DIR}/webfonts.css">' if WEBFONTS else ""
+        name = f"webfonts:{bool(WEBFONTS)}"
+        transforms.append((name, lambda _, text: inject_head_block(text, "webfonts", link)))
+
+    # Service Worker 注册脚本；关闭后从页面中移除
+    if SERVICE_WORKER or load_cache("sw"):
+        snippet = SW_REGISTER_SNIPPET if SERVICE_WORKER else ""
+        transforms.append(
+            (f"sw:{SERVICE_WORKER}", lambda _, text: inject_head_block(text, "sw", snippet))
+        )
+
+    return transforms
+
+
+def postprocess_html(force: bool = False, pages: set[str] | None = None) -> bool:
+    """
+    对 _site 中的 HTML 页面依次执行所有启用的后处理步骤。
+
+    每个页面只读写一次。处理后页面的签名记录在 .build-cache/postprocess.json 中，
+    只有重新编译过（签名变化）的页面才会再次处理。
+
+    参数:
+        force: 是否忽略缓存，处理所有页面
+        pages: 只处理这些页面（相对于 _site 的路径），None 表示所有页面
+
+    返回:
+        bool: 所有页面是否处理成功
+    """
+    if not SITE_DIR.exists():
+        return True
+
+    files = list_site_files()
+    ctx = PostprocessContext(files)
+    transforms = collect_html_transforms(ctx)
+    if not transforms:
+        return True
+
+    print("正在后处理 HTML 文件...")
+
+    signature = [name for name, _ in transforms]
+    state = load_cache("postprocess")
+    stamps = state.get("pages", {}) if not force and state.get("signature") == signature else {}
+
+    # 只处理部分页面时保留其余页面的记录
+    new_stamps: dict[str, list[int] | None] = {}
+    if pages is not None:
+        new_stamps = {rel: stamp for rel, stamp in stamps.items() if rel not in pages}
+    stats = BuildStats()
+
+    for rel in sorted(f for f in files if f.endswith(".html")):
+        if pages is not None and rel not in pages:
+            continue
+        page = SITE_DIR / rel
+        page_signature = path_signature(page)
+        if page_signature is not None and stamps.get(rel) == page_signature:
+            new_stamps[rel] = page_signature
+            stats.skipped += 1
+            continue
+
+        try:
+            text = page.read_text(encoding="utf-8")
+            new_text = text
+            for _, transform in transforms:
+                new_text = transform(rel, new_text)
+            if new_text != text:
+                atomic_write_text(page, new_text)
+                refresh_snapshot(page)
+            new_stamps[rel] = path_signature(page)
+            stats.success += 1
+        except Exception as e:
+            print(f"  ❌ {page} 后处理失败: {e}")
+            stats.failed += 1
+
+    for finalize in ctx.finalizers:
+        if not finalize():
+            stats.failed += 1
+
+    save_cache("postprocess", {"signature": signature, "pages": new_stamps})
+    for name, data in ctx.caches.items():
+        save_cache(name, data)
+    save_digest_cache()
+
+    summary = f"处理: {stats.success}, 跳过: {stats.skipped}"
+    if stats.failed:
+        summary += f", 失败: {stats.failed}"
+    print(f"✅ HTML 后处理完成。{summary}")
     return not stats.has_failures
 
 
-def copy_assets() -> bool:
+# ============================================================================
+# 数学公式 SVG
+# ============================================================================
+
+# tufted-lib/math.typ 中 html.frame 输出的公式：<span role="math"> 或 <figure role="math"> 中的 SVG
+MATH_FRAME_PATTERN = re.compile(
+    r'(<(?:span|figure) role="math"[^>]*>)(<svg\b[^>]*>.*?</svg>)', re.DOTALL
+)
+SVG_OPEN_PATTERN = re.compile(r"<svg\b([^>]*)>")
+SVG_SYMBOL_PATTERN = re.compile(r'<symbol id="([^"]+)"[^>]*>.*?</symbol>', re.DOTALL)
+MATH_IMAGE_PATTERN = re.compile(rf'<img src="/{MATH_DIR}/([0-9a-f]+)\.svg"')
+MATH_SPRITE_MARKER = "data-math-sprite"
+
+
+def math_mode_key() -> str:
+    """当前 MATH_SVG 设置的标识，设置变化后按旧设置处理过的页面需要重新编译"""
+    return f"{MATH_SVG}:{MATH_SVG_INLINE_LIMIT}"
+
+
+def expire_math_pages() -> None:
     """
-    复制静态资源到输出目录。
+    删除按其他 MATH_SVG 设置处理过的 HTML 页面，使它们在本次构建中重新编译。
+
+    公式 SVG 的改写无法撤销；修改或关闭 MATH_SVG 后只能重新编译受影响的页面。
+    """
+    page_frames = load_cache("math-pages")
+    expired = [page for page, (key, _) in page_frames.items() if key != math_mode_key()]
+    for page in expired:
+        (SITE_DIR / page).unlink(missing_ok=True)
+        refresh_snapshot(SITE_DIR / page)
+        del page_frames[page]
+    if expired:
+        save_cache("math-pages", page_frames)
+
+    if MATH_SVG != "external" and (SITE_DIR / MATH_DIR).is_dir():
+        shutil.rmtree(SITE_DIR / MATH_DIR)
+        invalidate_snapshots(SITE_DIR)
+
+
+def externalize_math_frames(text: str, files: set[str]) -> tuple[str, set[str]]:
+    """
+    将页面中重复出现或大于 MATH_SVG_INLINE_LIMIT 的公式 SVG 输出为 /_math/<摘要>.svg，
+    改为通过 <img> 引用（MATH_SVG = "external"）。
+
+    参数:
+        text: HTML 文本
+        files: _site 下所有文件的相对路径集合，新写入的文件会被加入
+
+    返回:
+        tuple[str, set[str]]: (处理后的 HTML, 页面引用的所有公式文件的摘要)
+    """
+    frames = [match.group(2) for match in MATH_FRAME_PATTERN.finditer(text)]
+    counts = {svg: frames.count(svg) for svg in set(frames)}
+    # 已处理过的页面再次处理时，之前改写的引用也要保留记录
+    refs = set(MATH_IMAGE_PATTERN.findall(text))
+
+    def replace(match: re.Match) -> str:
+        svg = match.group(2)
+        if counts[svg] < 2 and len(svg.encode()) <= MATH_SVG_INLINE_LIMIT:
+            return match.group(0)
+
+        digest = hashlib.sha256(svg.encode()).hexdigest()[:16]
+        rel = f"{MATH_DIR}/{digest}.svg"
+        if rel not in files:
+            (SITE_DIR / MATH_DIR).mkdir(parents=True, exist_ok=True)
+            atomic_write_text(SITE_DIR / rel, svg)
+            refresh_snapshot(SITE_DIR / rel)
+            files.add(rel)
+        refs.add(digest)
+
+        attrs = parse_tag_attrs(SVG_OPEN_PATTERN.match(svg).group(1))
+        image = {"src": f"/{rel}", "alt": "", "decoding": "async"}
+        if style := attrs.get("style"):
+            image["style"] = style
+        return match.group(1) + format_tag("img", image)
+
+    return MATH_FRAME_PATTERN.sub(replace, text), refs
+
+
+def sprite_math_frames(text: str) -> str:
+    """
+    将页面中所有公式的字形定义合并到 <body> 开头的一个隐藏 SVG 中，同一字形只保留一份；
+    重复出现的公式也作为 <symbol> 放入其中，各处通过 <use> 引用（MATH_SVG = "sprite"）。
+
+    参数:
+        text: HTML 文本
+
+    返回:
+        str: 处理后的 HTML（已处理过的页面原样返回）
+    """
+    if MATH_SPRITE_MARKER in text:
+        return text
+    frames = [match.group(2) for match in MATH_FRAME_PATTERN.finditer(text)]
+    if not frames:
+        return text
+    counts = {svg: frames.count(svg) for svg in set(frames)}
+    symbols: dict[str, str] = {}
+
+    def hoist(match: re.Match) -> str:
+        symbols.setdefault(match.group(1), match.group(0))
+        return ""
+
+    def replace(match: re.Match) -> str:
+        svg = match.group(2)
+        body = SVG_SYMBOL_PATTERN.sub(hoist, svg).replace("<defs></defs>", "")
+        if counts[svg] > 1:
+            open_tag = SVG_OPEN_PATTERN.match(body).group(0)
+            frame_id = "m" + hashlib.sha256(svg.encode()).hexdigest()[:16]
+            inner = body[len(open_tag) : -len("</svg>")]
+            symbols.setdefault(
+                frame_id, f'<symbol id="{frame_id}" overflow="visible">{inner}</symbol>'
+            )
+            body = f'{open_tag}<use xlink:href="#{frame_id}"/></svg>'
+        return match.group(1) + body
+
+    text = MATH_FRAME_PATTERN.sub(replace, text)
+    sprite = (
+        f'<svg {MATH_SPRITE_MARKER} aria-hidden="true"'
+        ' style="position: absolute; width: 0; height: 0; overflow: hidden"'
+        ' xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink">'
+        f"<defs>{''.join(symbols.values())}</defs></svg>"
+    )
+    body_tag = re.search(r"<body\b[^>]*>", text)
+    position = body_tag.end() if body_tag else MATH_FRAME_PATTERN.search(text).start()
+    return text[:position] + sprite + text[position:]
+
+
+def make_math_transform(ctx: PostprocessContext) -> HtmlTransform:
+    """
+    创建去除重复公式 SVG 的后处理步骤（见 MATH_SVG），并输出每个页面减少的体积。
+
+    页面处理后的记录保存在 .build-cache/math-pages.json 中，所有页面处理完后
+    删除不再被任何页面引用的 /_math/ 文件。
+
+    参数:
+        ctx: 后处理上下文
+
+    返回:
+        HtmlTransform: 后处理函数
+    """
+    page_frames = ctx.cache("math-pages")
+    saved = 0
+
+    def transform(rel_path: str, text: str) -> str:
+        nonlocal saved
+        if MATH_SVG == "external":
+            new_text, refs = externalize_math_frames(text, ctx.files)
+        else:
+            new_text, refs = sprite_math_frames(text), set()
+
+        if refs or MATH_SPRITE_MARKER in new_text:
+            page_frames[rel_path] = [math_mode_key(), sorted(refs)]
+        before, after = len(text.encode()), len(new_text.encode())
+        if after < before:
+            saved += before - after
+            print(
+                f"  ∑ {rel_path}: {format_size(before)} → {format_size(after)}"
+                f"（-{1 - after / before:.0%}）"
+            )
+        return new_text
+
+    def finalize() -> bool:
+        for page in [page for page in page_frames if page not in ctx.files]:
+            del page_frames[page]
+        used = {digest for _, refs in page_frames.values() for digest in refs}
+        for rel in [r for r in get_snapshot(SITE_DIR).files if r.startswith(f"{MATH_DIR}/")]:
+            if Path(rel).stem not in used:
+                (SITE_DIR / rel).unlink()
+                refresh_snapshot(SITE_DIR / rel)
+                ctx.files.discard(rel)
+        if saved:
+            print(f"  ∑ 公式 SVG 共减少 {format_size(saved)}")
+        return True
+
+    ctx.finalizers.append(finalize)
+    return transform
+
+
+# ============================================================================
+# 第三方资源
+# ============================================================================
+
+# 样式表中引用其他文件的位置：url(...) 与 @import "..."
+CSS_REFERENCE_PATTERN = re.compile(
+    r"""url\(\s*(['"]?)([^'")]+)\1\s*\)|@import\s+(['"])([^'"]+)\3"""
+)
+VENDOR_CACHE_DIR = CACHE_DIR / "vendor"  # 按 sha256 保存下载的原始文件
+
+
+def fetch_vendor_file(url: str, lock: dict[str, dict]) -> bytes | None:
+    """
+    获取第三方文件：锁定文件中记录了摘要且本地有缓存时直接使用缓存，否则下载。
+
+    锁定文件中没有记录的 URL 在首次下载时记录摘要（启用 VENDOR_LOCK_REQUIRED 时抛出
+    RuntimeError，使页面后处理失败）；已有记录时内容必须与之一致。
+
+    参数:
+        url: 文件地址
+        lock: VENDOR_LOCK_FILE 的内容，会被原地更新
+
+    返回:
+        bytes | None: 文件内容，无法获取或校验失败时返回 None
+    """
+    import urllib.request
+
+    pinned = lock.get(url, {}).get("sha256")
+    if pinned and (cached := VENDOR_CACHE_DIR / pinned).is_file():
+        return cached.read_bytes()
+    if not pinned and VENDOR_LOCK_REQUIRED:
+        # 在 CI 中自动记录摘要等于信任当时下载到的任何内容，锁定文件就失去了意义
+        raise RuntimeError(
+            f"{VENDOR_LOCK_FILE} 中没有 {url} 的摘要，请在本地构建后提交 {VENDOR_LOCK_FILE}"
+        )
+
+    try:
+        request = urllib.request.Request(url, headers={"User-Agent": "tufted-build"})
+        with urllib.request.urlopen(request, timeout=30) as response:
+            data = response.read()
+    except Exception as e:
+        print(f"  ⚠️ 无法下载 {url}，继续使用外部链接: {e}")
+        return None
+
+    digest = hashlib.sha256(data).hexdigest()
+    if pinned and digest != pinned:
+        print(f"  ❌ {url} 的内容与 {VENDOR_LOCK_FILE} 中记录的摘要不一致，继续使用外部链接")
+        return None
+    if not pinned:
+        lock[url] = {"sha256": digest}
+        print(f"  🔒 {url}: 已记录摘要 {digest[:12]}")
+
+    VENDOR_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    atomic_write_bytes(VENDOR_CACHE_DIR / digest, data)
+    return data
+
+
+def vendor_file(
+    url: str, lock: dict[str, dict], vendored: dict[str, list[str] | None], files: set[str]
+) -> list[str] | None:
+    """
+    将第三方文件放入 _site/assets/vendor/，文件名包含内容摘要。
+
+    样式表中通过 url() 或 @import 引用的文件（如字体）也一并放入并改为本地引用，
+    无法获取的文件保留为绝对地址。
+
+    参数:
+        url: 文件地址
+        lock: VENDOR_LOCK_FILE 的内容，会被原地更新
+        vendored: 本次构建中已处理过的 URL，会被原地更新
+        files: _site 下所有文件的相对路径集合，新写入的文件会被加入
+
+    返回:
+        list[str] | None: 本地文件及其引用的所有文件（相对于 _site/），第一项为该文件本身；
+        无法获取时返回 None
     """
-    if not ASSETS_DIR.exists():
-        print(f"  ⚠ 静态资源目录 {ASSETS_DIR} 不存在。")
-        return True
+    from urllib.parse import urldefrag, urljoin, urlsplit
+
+    if url in vendored:
+        return vendored[url]
+    vendored[url] = None  # 循环引用时视为无法获取
+
+    data = fetch_vendor_file(url, lock)
+    if data is None:
+        return None
+
+    stem, suffix = os.path.splitext(os.path.basename(urlsplit(url).path))
+    required: list[str] = []
+    if suffix == ".css":
+
+        def replace(match: re.Match) -> str:
+            ref = match.group(2) or match.group(4)
+            if ref.startswith(("data:", "#")):
+                return match.group(0)
+            absolute, fragment = urldefrag(urljoin(url, ref.strip()))
+            if urlsplit(absolute).scheme not in ("http", "https"):
+                return match.group(0)
+            local = vendor_file(absolute, lock, vendored, files)
+            if local is None:
+                new_ref = absolute
+            else:
+                required.extend(rel for rel in local if rel not in required)
+                new_ref = local[0].rsplit("/", 1)[-1]
+            return match.group(0).replace(ref, new_ref + (f"#{fragment}" if fragment else ""))
 
-    SITE_DIR.mkdir(parents=True, exist_ok=True)
-    target_dir = SITE_DIR / "assets"
+        data = CSS_REFERENCE_PATTERN.sub(replace, data.decode("utf-8")).encode("utf-8")
 
-    try:
-        if target_dir.exists():
-            shutil.rmtree(target_dir)
-        shutil.copytree(ASSETS_DIR, target_dir)
-        return True
-    except Exception as e:
-        print(f"  ❌ 复制静态资源失败: {e}")
-        return False
+    rel = f"{VENDOR_DIR}/{stem or 'index'}-{hashlib.sha256(data).hexdigest()[:8]}{suffix}"
+    if rel not in files:
+        (SITE_DIR / VENDOR_DIR).mkdir(parents=True, exist_ok=True)
+        atomic_write_bytes(SITE_DIR / rel, data)
+        refresh_snapshot(SITE_DIR / rel)
+        files.add(rel)
 
+    vendored[url] = [rel, *required]
+    return vendored[url]
 
-def copy_content_assets(force: bool = False) -> bool:
+
+def make_vendor_transform(ctx: PostprocessContext) -> HtmlTransform:
     """
-    复制 content 目录下的非 .typ 文件（如图片）到输出目录。
-    支持增量复制：只复制修改过的文件。
+    创建处理 <head> 中第三方样式表与外部脚本的后处理步骤。
+
+    - VENDOR_STYLESHEETS：外部样式表改为引用 _site/assets/vendor/ 中的本地副本
+    - DEFER_SCRIPTS：外部脚本（DEFER_SCRIPTS_EXCLUDE 除外）添加 defer
+    每个页面的改动记录在 .build-cache/vendor-pages.json 中，关闭后可以据此还原。
 
     参数:
-        force: 是否强制复制所有文件
+        ctx: 后处理上下文
+
+    返回:
+        HtmlTransform: 后处理函数
     """
-    SITE_DIR.mkdir(parents=True, exist_ok=True)
+    try:
+        lock = json.loads(VENDOR_LOCK_FILE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        lock = {}
+    locked = dict(lock)
+    vendored: dict[str, list[str] | None] = {}
+    # {页面: {"styles": {本地地址: 原地址}, "scripts": [添加了 defer 的脚本], "files": [...]}}
+    page_refs = ctx.cache("vendor-pages")
+
+    def transform(rel_path: str, text: str) -> str:
+        head_end = text.find("</head>")
+        if head_end < 0:
+            return text
+        entry = page_refs.get(rel_path, {})
+        styles: dict[str, str] = dict(entry.get("styles", {}))
+        scripts: set[str] = set(entry.get("scripts", []))
+        required: list[str] = list(entry.get("files", []))
+
+        def replace(match: re.Match) -> str:
+            tag = match.group(1).lower()
+            attrs = parse_tag_attrs(match.group(2))
+            original = dict(attrs)
+
+            href = attrs.get("href") or ""
+            if tag == "link" and "stylesheet" in (attrs.get("rel") or "").lower().split():
+                url = f"https:{href}" if href.startswith("//") else href
+                if VENDOR_STYLESHEETS and url.startswith(("http://", "https://")):
+                    if local := vendor_file(url, lock, vendored, ctx.files):
+                        attrs["href"] = f"/{local[0]}"
+                        styles[attrs["href"]] = href
+                        required.extend(rel for rel in local if rel not in required)
+                elif not VENDOR_STYLESHEETS and href in styles:
+                    attrs["href"] = styles.pop(href)
+
+            src = attrs.get("src")
+            if tag == "script" and src:
+                classic = (attrs.get("type") or "text/javascript").lower() == "text/javascript"
+                if DEFER_SCRIPTS and src not in DEFER_SCRIPTS_EXCLUDE:
+                    if classic and "defer" not in attrs and "async" not in attrs:
+                        attrs["defer"] = None
+                        scripts.add(src)
+                elif src in scripts:
+                    attrs.pop("defer", None)
+                    scripts.discard(src)
+
+            return match.group(0) if attrs == original else format_tag(tag, attrs)
+
+        head = TAG_PATTERN.sub(replace, text[:head_end])
+        if styles or scripts:
+            page_refs[rel_path] = {
+                "styles": styles,
+                "scripts": sorted(scripts),
+                "files": required if styles else [],
+            }
+        else:
+            page_refs.pop(rel_path, None)
+        return head + text[head_end:]
 
-    if not CONTENT_DIR.exists():
-        print(f"  ⚠ 内容目录 {CONTENT_DIR} 不存在，跳过。")
+    def finalize() -> bool:
+        if lock != locked:
+            atomic_write_text(
+                VENDOR_LOCK_FILE, json.dumps(lock, ensure_ascii=False, indent=2, sort_keys=True)
+            )
+        # 删除不再被任何页面引用的本地副本
+        for page in [page for page in page_refs if page not in ctx.files]:
+            del page_refs[page]
+        used = {rel for entry in page_refs.values() for rel in entry["files"]}
+        for rel in [r for r in get_snapshot(SITE_DIR).files if r.startswith(f"{VENDOR_DIR}/")]:
+            if rel not in used:
+                (SITE_DIR / rel).unlink()
+                refresh_snapshot(SITE_DIR / rel)
+                ctx.files.discard(rel)
         return True
 
-    try:
-        copy_count = 0
-        skip_count = 0
+    ctx.finalizers.append(finalize)
+    return transform
 
-        for item in CONTENT_DIR.rglob("*"):
-            # 跳过目录和 .typ 文件
-            if item.is_dir() or item.suffix == ".typ":
-                continue
 
-            # 跳过以下划线开头的路径
-            relative_path = item.relative_to(CONTENT_DIR)
-            if any(part.startswith("_") for part in relative_path.parts):
-                continue
+# ============================================================================
+# 内联小文件
+# ============================================================================
 
-            # 计算目标路径
-            target_path = SITE_DIR / relative_path
+# 可能引用站内文件的属性；srcset 中每一项的第一个词是地址
+INLINE_REFERENCE_ATTRS = ("src", "href", "poster", "data", "srcset")
+# SVG 按 URL 编码时保留原样的字符（引号会被 HTML 转义，仍需编码）
+SVG_URI_SAFE_CHARS = " /:=;,()-._~"
 
-            # 增量复制检查
-            if not force and target_path.exists():
-                if get_file_mtime(item) <= get_file_mtime(target_path):
-                    skip_count += 1
-                    continue
 
-            # 创建目标目录
-            target_path.parent.mkdir(parents=True, exist_ok=True)
+def inline_source(rel: str) -> Path:
+    """可内联文件（相对于 _site/ 的路径）对应的源文件"""
+    if rel.startswith("assets/"):
+        return ASSETS_DIR / rel.removeprefix("assets/")
+    return CONTENT_DIR / rel
 
-            # 复制文件
-            shutil.copy2(item, target_path)
-            copy_count += 1
 
-        return True
-    except Exception as e:
-        print(f"  ❌ 复制内容资源文件失败: {e}")
-        return False
+def inline_omitted_files() -> set[str]:
+    """所有引用都已内联、不输出到 _site 的文件（相对于 _site/ 的路径），复制资源时跳过"""
+    return set(load_cache("inline-assets").get("omitted", []))
 
 
-def clean() -> bool:
-    """
-    清理生成的文件。
+def inline_candidates() -> dict[str, int]:
     """
-    print("正在清理生成的文件...")
+    列出可以内联的文件。
 
-    if not SITE_DIR.exists():
-        print(f"  输出目录 {SITE_DIR} 不存在，无需清理。")
-        return True
+    DEDUPE_ASSETS 合并的重复资源由多个路径共用同一份输出，不参与内联。
 
-    try:
-        # 删除 _site 目录下的所有内容
-        for item in SITE_DIR.iterdir():
-            if item.is_dir():
-                shutil.rmtree(item)
-            else:
-                item.unlink()
+    返回:
+        dict[str, int]: {相对于 _site/ 的路径: 文件大小}，只包含不超过 INLINE_ASSET_LIMIT 的图片
+    """
+    candidates: dict[str, int] = {}
+    if CONTENT_DIR.exists():
+        content = get_snapshot(CONTENT_DIR)
+        assets = list_content_assets()
+        duplicates: set[str] = set()
+        if DEDUPE_ASSETS != "off":
+            duplicates = {rel for group in find_duplicate_assets(assets).values() for rel in group}
+        for rel in assets:
+            if Path(rel).suffix.lower() in IMAGE_SUFFIXES and rel not in duplicates:
+                candidates[rel] = content.files[rel][1]
 
-        print(f"  ✅ 已清理 {SITE_DIR}/ 目录。")
-        return True
-    except Exception as e:
-        print(f"  ❌ 清理失败: {e}")
-        return False
+    if (signature := path_signature(ASSETS_DIR / "favicon.ico")) is not None:
+        candidates["assets/favicon.ico"] = signature[1]
+    return {rel: size for rel, size in candidates.items() if 0 < size <= INLINE_ASSET_LIMIT}
 
 
-def preview(port: int = 8000, open_browser_flag: bool = True) -> bool:
+def make_data_uri(path: Path) -> str:
     """
-    启动本地预览服务器。
+    将文件编码为 data: URI。
 
-    首先尝试使用 uvx livereload（支持实时刷新），
-    如果失败则回退到 Python 内置的 http.server。
+    SVG 按 URL 编码（比 base64 短，且 gzip 后更小），其他文件使用 base64。
 
     参数:
-        port: 服务器端口号，默认为 8000
-        open_browser_flag: 是否自动打开浏览器，默认为 True
-    """
-    import webbrowser
-
-    if not SITE_DIR.exists():
-        print(f"  ⚠ 输出目录 {SITE_DIR} 不存在，请先运行 build 命令。")
-        return False
+        path: 文件路径
 
-    print("正在启动本地预览服务器（按 Ctrl+C 停止）...")
-    print()
+    返回:
+        str: data: URI
+    """
+    import mimetypes
+    from urllib.parse import quote
+
+    data = path.read_bytes()
+    if path.suffix.lower() == ".svg":
+        text = " ".join(data.decode("utf-8").split())
+        return f"data:image/svg+xml,{quote(text, safe=SVG_URI_SAFE_CHARS)}"
+    mime = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    return f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+def rewrite_page_assets(
+    page_url: str,
+    text: str,
+    candidates: dict[str, int],
+    restore: dict[str, str],
+    inline: Callable[[str], str | None],
+) -> tuple[str, set[str], dict[str, list[str]]]:
+    """
+    还原页面中之前内联的引用，再将 <img src> 与 <link rel="icon"> 中可以内联的文件改为 data: URI。
 
-    if open_browser_flag:
+    参数:
+        page_url: 页面的 URL 路径
+        text: HTML 文本
+        candidates: 可以内联的文件（见 inline_candidates()）
+        restore: {data: URI 的摘要: 原引用}，之前处理该页面时的记录
+        inline: 接收文件路径，返回 data: URI；返回 None 表示不内联
 
-        def open_browser():
-            time.sleep(1.5)  # 等待服务器启动
-            url = f"http://localhost:{port}"
-            print(f"  🚀 正在打开浏览器: {url}")
-            webbrowser.open(url)
+    返回:
+        tuple: (处理后的 HTML, 仍通过地址引用的候选文件, {data: URI 的摘要: [原引用, 文件路径]})
+    """
+    linked: set[str] = set()
+    inlined: dict[str, list[str]] = {}
+
+    def replace(match: re.Match) -> str:
+        tag = match.group(1).lower()
+        attrs = parse_tag_attrs(match.group(2))
+        original = dict(attrs)
+        target = None  # 可以改为 data: URI 的属性
+        if tag == "img" and "srcset" not in attrs:
+            target = "src"
+        elif tag == "link" and "icon" in (attrs.get("rel") or "").lower().split():
+            target = "href"
+
+        for name in INLINE_REFERENCE_ATTRS:
+            value = attrs.get(name)
+            if not value:
+                continue
+            if value.startswith("data:"):
+                digest = hashlib.sha256(value.encode()).hexdigest()[:16]
+                if digest not in restore:
+                    continue
+                value = attrs[name] = restore[digest]
 
-        # 在后台线程中打开浏览器
-        threading.Thread(target=open_browser, daemon=True).start()
+            refs = [item.split()[0] for item in value.split(",") if item.strip()]
+            for ref in refs if name == "srcset" else [value]:
+                resolved = resolve_site_reference(page_url, ref)
+                rel = resolved[0].lstrip("/") if resolved else None
+                if rel not in candidates:
+                    continue
+                if name == target and (uri := inline(rel)):
+                    attrs[name] = uri
+                    inlined[hashlib.sha256(uri.encode()).hexdigest()[:16]] = [value, rel]
+                else:
+                    linked.add(rel)
 
-    # 首先尝试 uvx livereload
-    try:
-        result = subprocess.run(
-            ["uvx", "livereload", str(SITE_DIR), "-p", str(port)],
-            check=False,
-        )
-        return result.returncode == 0
-    except FileNotFoundError:
-        print("  未找到 uv，尝试 Python http.server...")
-    except KeyboardInterrupt:
-        print("\n服务器已停止。")
-        return True
+        return match.group(0) if attrs == original else format_tag(tag, attrs)
 
-    # 回退到 Python http.server
-    try:
-        print("使用 Python 内置 http.server...")
-        result = subprocess.run(
-            [sys.executable, "-m", "http.server", str(port), "--directory", str(SITE_DIR)],
-            check=False,
-        )
-        return result.returncode == 0
-    except KeyboardInterrupt:
-        print("\n服务器已停止。")
-        return True
-    except Exception as e:
-        print(f"  ❌ 启动服务器失败: {e}")
-        return False
+    return TAG_PATTERN.sub(replace, text), linked, inlined
 
 
-def parse_html_metadata(html_path: Path) -> dict[str, str]:
+def make_inline_transform(ctx: PostprocessContext) -> HtmlTransform:
     """
-    解析 HTML 文件并返回元数据解析器实例。
+    创建内联小文件的后处理步骤（见 INLINE_ASSETS），并输出每个页面内联的文件。
+
+    每个页面的记录保存在 .build-cache/inline-pages.json 中：
+    [页面签名, 仍通过地址引用的文件, {data: URI 的摘要: [原引用, 文件路径]}]，
+    重新处理或关闭后据此还原；内联过的源文件被修改时，先还原引用了它的页面，使其重新处理。
+    所有页面处理完后，所有引用都已内联的文件从 _site 中删除，之后又有页面通过地址引用时再从源文件复制。
 
     参数:
-        html_path (Path): HTML 文件路径
+        ctx: 后处理上下文
 
     返回:
-        HTMLMetadataParser: 包含解析结果的解析器实例
+        HtmlTransform: 后处理函数
     """
-    parser = HTMLMetadataParser()
-    parser.feed(html_path.read_text(encoding="utf-8"))
-    return parser.metadata
+    page_refs = ctx.cache("inline-pages")
+    state = ctx.cache("inline-assets")
+    candidates = inline_candidates() if INLINE_ASSETS else {}
+    uris: dict[str, str] = {}
+    inlined_count = 0
+
+    # 还原内联了已修改文件的页面，页面签名变化后会被重新处理
+    sources: dict[str, list[int] | None] = state.get("sources", {})
+    changed = {rel for rel, sig in sources.items() if path_signature(inline_source(rel)) != sig}
+    for rel, entry in page_refs.items():
+        path = SITE_DIR / rel
+        if rel in ctx.files and any(target in changed for _, target in entry[2].values()):
+            restore = {digest: ref for digest, (ref, _) in entry[2].items()}
+            text = path.read_text(encoding="utf-8")
+            text, _, _ = rewrite_page_assets(
+                site_path_to_url(rel), text, {}, restore, lambda _: None
+            )
+            atomic_write_text(path, text)
+            refresh_snapshot(path)
+
+    # 统计每个文件被多少个页面引用：之后未修改过的页面使用记录，其余页面重新扫描
+    counts: dict[str, int] = {}
+    pages = sorted(f for f in ctx.files if f.endswith(".html")) if candidates else []
+    for rel in pages:
+        entry = page_refs.get(rel)
+        signature = path_signature(SITE_DIR / rel)
+        if not entry or entry[0] != signature:
+            restore = {digest: ref for digest, (ref, _) in entry[2].items()} if entry else {}
+            text = (SITE_DIR / rel).read_text(encoding="utf-8")
+            _, refs, _ = rewrite_page_assets(
+                site_path_to_url(rel), text, candidates, restore, lambda _: None
+            )
+            # 本次不处理的页面（只构建部分页面时）也要保留其引用，避免删除仍在使用的文件
+            entry = page_refs[rel] = [signature, sorted(refs), entry[2] if entry else {}]
+        for target in {*entry[1], *(target for _, target in entry[2].values())}:
+            counts[target] = counts.get(target, 0) + 1
+
+    def inline(rel: str) -> str | None:
+        if counts.get(rel, 0) > INLINE_ASSET_MAX_PAGES:
+            return None
+        if rel not in uris:
+            uris[rel] = make_data_uri(inline_source(rel))
+        return uris[rel]
+
+    def transform(rel_path: str, text: str) -> str:
+        nonlocal inlined_count
+        entry = page_refs.get(rel_path)
+        restore = {digest: ref for digest, (ref, _) in entry[2].items()} if entry else {}
+        new_text, linked, inlined = rewrite_page_assets(
+            site_path_to_url(rel_path), text, candidates, restore, inline
+        )
+        # 页面签名在所有页面写入后记录
+        page_refs[rel_path] = [None, sorted(linked), inlined]
+        if inlined:
+            inlined_count += len(inlined)
+            names = "、".join(
+                f"{target}（{format_size(candidates[target])}）" for _, target in inlined.values()
+            )
+            print(f"  📎 {rel_path}: 内联 {names}")
+        return new_text
+
+    def finalize() -> bool:
+        for page in list(page_refs):
+            if page not in ctx.files:
+                del page_refs[page]
+            elif page_refs[page][0] is None:
+                page_refs[page][0] = path_signature(SITE_DIR / page)
+        if not INLINE_ASSETS:
+            # 已还原的页面不再需要记录
+            for page in [page for page, entry in page_refs.items() if not entry[2]]:
+                del page_refs[page]
+
+        linked = {target for entry in page_refs.values() for target in entry[1]}
+        inlined = {target for entry in page_refs.values() for _, target in entry[2].values()}
+        omitted = inlined - linked
+        for rel in sorted(omitted | set(state.get("omitted", []))):
+            path, source = SITE_DIR / rel, inline_source(rel)
+            if rel in omitted and rel in ctx.files:
+                path.unlink()
+                ctx.files.discard(rel)
+            elif rel not in omitted and rel not in ctx.files and source.is_file():
+                # 又有页面通过地址引用（或已关闭内联），恢复输出
+                path.parent.mkdir(parents=True, exist_ok=True)
+                atomic_copy(source, path)
+                ctx.files.add(rel)
+            else:
+                continue
+            refresh_snapshot(path)
 
+        state["omitted"] = sorted(omitted)
+        state["sources"] = {rel: path_signature(inline_source(rel)) for rel in sorted(inlined)}
+        if inlined_count:
+            print(f"  📎 共内联 {inlined_count} 处引用，{len(omitted)} 个文件不再输出到 _site")
+        return True
 
-def get_site_url() -> str | None:
+    ctx.finalizers.append(finalize)
+    return transform
+
+
+# ============================================================================
+# Web 字体
+# ============================================================================
+
+
+def webfont_sources() -> set[str]:
+    """WEBFONTS 中位于 assets/ 的字体文件（相对于 assets/ 的路径），copy_assets 不会复制它们"""
+    sources = set()
+    for font in WEBFONTS:
+        relative = os.path.relpath(os.path.abspath(font["source"]), os.path.abspath(ASSETS_DIR))
+        if not relative.startswith(".."):
+            sources.add(Path(relative).as_posix())
+    return sources
+
+
+def extract_page_text(text: str) -> str:
+    """提取 HTML 中会显示为文字的内容（去掉标签、注释、脚本和样式）"""
+    text = re.sub(r"<(script|style)\b.*?</\1\s*>", " ", text, flags=re.DOTALL | re.IGNORECASE)
+    text = re.sub(r"<!--.*?-->", " ", text, flags=re.DOTALL)
+    return html.unescape(re.sub(r"<[^>]*>", " ", text))
+
+
+def collect_page_glyphs() -> dict[str, int]:
     """
-    从生成的首页 HTML 文件中解析站点 URL。
+    统计 _site 中所有 HTML 页面用到的字符。
 
-    功能:
-        从 _site/index.html 的 <link rel="canonical" href="..."> 提取 site-url。
+    每个页面的字符集按页面签名缓存在 .build-cache/glyphs.json 中，只重新读取变化的页面。
 
     返回:
-        str: 站点的根 URL（如 "https://example.com"），末尾不带斜杠。
-            如果未配置或解析失败则返回 None。
+        dict[str, int]: {字符: 使用该字符的页面数}
     """
-    index_html = SITE_DIR / "index.html"
-    parser = parse_html_metadata(index_html)
+    site = get_snapshot(SITE_DIR)
+    cached = load_cache("glyphs")
+    entries: dict[str, list] = {}
+    counts: dict[str, int] = {}
+
+    for rel in sorted(r for r in site.files if r.endswith(".html")):
+        signature = site.signature(rel)
+        entry = cached.get(rel)
+        if not entry or entry[0] != signature:
+            text = extract_page_text((SITE_DIR / rel).read_text(encoding="utf-8"))
+            entry = [signature, "".join(sorted({c for c in text if c.isprintable()}))]
+        entries[rel] = entry
+        for char in entry[1]:
+            counts[char] = counts.get(char, 0) + 1
+
+    if entries != cached:
+        save_cache("glyphs", entries)
+    return counts
+
+
+def format_unicode_range(codepoints: list[int]) -> str:
+    """将码位列表压缩为 CSS unicode-range（如 "U+20-7E, U+4E00"）"""
+    ranges = []
+    for cp in sorted(set(codepoints)):
+        if ranges and cp == ranges[-1][1] + 1:
+            ranges[-1][1] = cp
+        else:
+            ranges.append([cp, cp])
+    return ", ".join(f"U+{a:X}" if a == b else f"U+{a:X}-{b:X}" for a, b in ranges)
 
-    if parser.get("link"):
-        return parser["link"].rstrip("/")
 
-    return None
+def subset_font(data: bytes, codepoints: list[int], flavor: str) -> bytes:
+    """使用 fontTools 生成只包含指定字符的字体文件"""
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
 
+    options = subset.Options()
+    options.flavor = flavor
+    options.layout_features = ["*"]
+    font = TTFont(io.BytesIO(data))
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    output = io.BytesIO()
+    font.save(output)
+    return output.getvalue()
 
-def get_feed_dirs() -> set[str]:
+
+def build_webfonts() -> bool:
     """
-    从 config.typ 配置文件中解析 RSS Feed 订阅源的配置信息。
+    根据页面实际用到的字符将 WEBFONTS 子集化，输出到 _site/_fonts/ 并生成 webfonts.css。
 
-    功能:
-        解析 config.typ 中的 feed 配置块，提取目录列表。
+    文件名包含内容摘要；字符集、字体文件和配置都没有变化时直接复用上次的结果。
+    WEBFONT_CHUNK_SIZE 大于 0 时，字符按使用它们的页面数从多到少拆分为多个文件，
+    每个文件带有对应的 unicode-range，浏览器只下载页面用到的部分。
 
     返回:
-        set[str]: 要包含的文章目录列表，默认为空集合
+        bool: 是否成功
     """
-    if not CONFIG_FILE.exists():
-        return set()
-
+    if not WEBFONTS:
+        # 关闭后删除之前生成的字体文件
+        if load_cache("webfonts"):
+            for rel in [r for r in get_snapshot(SITE_DIR).files if r.startswith(f"{FONTS_DIR}/")]:
+                (SITE_DIR / rel).unlink()
+                refresh_snapshot(SITE_DIR / rel)
+            save_cache("webfonts", {})
+        return True
     try:
-        content = CONFIG_FILE.read_text(encoding="utf-8")
+        from fontTools.ttLib import TTFont
+    except ImportError:
+        print("⚠️ 未安装 fonttools，跳过 Web 字体子集化（pip install fonttools brotli）")
+        return True
+    try:
+        import brotli  # noqa: F401  # WOFF2 压缩需要 brotli
+        flavor, font_format = "woff2", "woff2"
+    except ImportError:
+        flavor, font_format = "woff", "woff"
+
+    print("正在生成 Web 字体...")
+    output_dir = SITE_DIR / FONTS_DIR
+    glyphs = collect_page_glyphs()
+    # 按使用频率排序：几乎每个页面都用到的字符放在第一个文件中
+    ordered = sorted(glyphs, key=lambda char: (-glyphs[char], ord(char)))
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    state = load_cache("webfonts")
+    new_state: dict[str, dict] = {}
+    rules: list[str] = []
+    ok = True
+
+    for font in WEBFONTS:
+        source = Path(font["source"])
+        digest = file_digest(source)
+        if digest is None:
+            print(f"  ❌ 字体文件不存在: {source}")
+            ok = False
+            continue
 
-        # 移除注释
-        content = re.sub(r"//.*", "", content)
-        content = re.sub(r"/\*[\s\S]*?\*/", "", content)
+        weight, style = font.get("weight", "400"), font.get("style", "normal")
+        # 不拆分时只与字符集有关；拆分时文件的划分还取决于字符的使用频率
+        chars = "".join(ordered) if WEBFONT_CHUNK_SIZE > 0 else "".join(sorted(glyphs))
+        key_data = [digest, chars, WEBFONT_CHUNK_SIZE, flavor, weight, style]
+        key = hashlib.sha256(json.dumps(key_data).encode()).hexdigest()
+        font_id = f"{font['family']}:{weight}:{style}"
+        previous = state.get(font_id, {})
+
+        if previous.get("key") == key and all(
+            (output_dir / name).exists() for name in previous.get("files", [])
+        ):
+            new_state[font_id] = previous
+            rules.append(previous["css"])
+            print(f"  ⏭️ {font['family']}: 字符集与字体均未变化，跳过")
+            continue
 
-        match = re.search(r"feed-dir\s*:\s*\((.*?)\)", content, re.DOTALL)
-        if match:
-            return set(
-                c.strip("/") for c in re.findall(r'"([^"]*)"', match.group(1)) if c and c.strip("/")
+        data = source.read_bytes()
+        cmap = TTFont(io.BytesIO(data)).getBestCmap()
+        codepoints = [ord(char) for char in ordered if ord(char) in cmap]
+        size = WEBFONT_CHUNK_SIZE if WEBFONT_CHUNK_SIZE > 0 else len(codepoints) or 1
+        slug = re.sub(r"[^a-z0-9]+", "-", font["family"].lower()).strip("-") or "font"
+
+        files, css, total = [], [], 0
+        for start in range(0, len(codepoints), size):
+            chunk = codepoints[start : start + size]
+            subset_data = subset_font(data, chunk, flavor)
+            name = f"{slug}-{hashlib.sha256(subset_data).hexdigest()[:12]}.{flavor}"
+            atomic_write_bytes(output_dir / name, subset_data)
+            refresh_snapshot(output_dir / name)
+            files.append(name)
+            total += len(subset_data)
+            css.append(
+                "@font-face {\n"
+                f'  font-family: "{font["family"]}";\n'
+                f"  font-style: {style};\n"
+                f"  font-weight: {weight};\n"
+                "  font-display: swap;\n"
+                f'  src: url("/{FONTS_DIR}/{name}") format("{font_format}");\n'
+                f"  unicode-range: {format_unicode_range(chunk)};\n"
+                "}"
             )
-    except Exception as e:
-        print(f"⚠️ 解析 feed-dir 失败: {e}")
 
-    return set()
+        new_state[font_id] = {"key": key, "files": files, "css": "\n".join(css)}
+        rules.append(new_state[font_id]["css"])
+        print(
+            f"  🔤 {font['family']}: {len(codepoints)} 个字符，{len(files)} 个文件，"
+            f"{format_size(total)}（原字体 {format_size(len(data))}）"
+        )
 
+    # 写入 CSS（内容不变时不重写），并删除不再使用的字体文件
+    css_path = output_dir / "webfonts.css"
+    css_text = "/* 由 build.py 生成，请勿手动修改 */\n" + "\n".join(rules) + "\n"
+    if path_signature(css_path) is None or css_path.read_text(encoding="utf-8") != css_text:
+        atomic_write_text(css_path, css_text)
+        refresh_snapshot(css_path)
 
-def extract_post_metadata(index_html: Path) -> tuple[str, str, str, datetime | None]:
+    used = {name for entry in new_state.values() for name in entry["files"]} | {"webfonts.css"}
+    for rel in [r for r in get_snapshot(SITE_DIR).files if r.startswith(f"{FONTS_DIR}/")]:
+        if rel.removeprefix(f"{FONTS_DIR}/") not in used:
+            (SITE_DIR / rel).unlink()
+            refresh_snapshot(SITE_DIR / rel)
+
+    save_cache("webfonts", new_state)
+    save_digest_cache()
+    print("✅ Web 字体生成完成。" if ok else "⚠ Web 字体生成完成，但有字体处理失败。")
+    return ok
+
+
+# ============================================================================
+# Service Worker
+# ============================================================================
+
+# 注册脚本：本地预览时不注册，避免缓存的旧页面干扰实时刷新
+SW_REGISTER_SNIPPET = (
+    '<script>if("serviceWorker"in navigator'
+    '&&!/^(localhost|127\\.0\\.0\\.1)$/.test(location.hostname))'
+    'addEventListener("load",()=>navigator.serviceWorker.register("/sw.js"))</script>'
+)
+
+SW_TEMPLATE = """// 由 build.py 生成，请勿手动修改
+const VERSION = "__VERSION__";
+const PRECACHE = "tufted-precache";
+const PAGES = "tufted-pages";
+const ASSETS = "tufted-assets";
+const RUNTIME_LIMIT = __LIMIT__;
+const HASHED_PREFIXES = __HASHED__;
+
+// [URL, 内容摘要]：摘要变化的文件才会在安装新版本时重新下载
+const MANIFEST = __MANIFEST__;
+const REVISIONS = new Map(MANIFEST);
+const precacheKey = (url, revision) => new URL(`${url}?__rev=${revision}`, location).href;
+
+self.addEventListener("install", (event) => {
+  event.waitUntil((async () => {
+    const cache = await caches.open(PRECACHE);
+    await Promise.all(MANIFEST.map(async ([url, revision]) => {
+      const key = precacheKey(url, revision);
+      if (await cache.match(key)) return;
+      const response = await fetch(url, { cache: "no-cache" });
+      if (response.ok && !response.redirected) await cache.put(key, response);
+    }));
+    await self.skipWaiting();
+  })());
+});
+
+self.addEventListener("activate", (event) => {
+  event.waitUntil((async () => {
+    const cache = await caches.open(PRECACHE);
+    const current = new Set(MANIFEST.map(([url, revision]) => precacheKey(url, revision)));
+    for (const request of await cache.keys()) {
+      if (!current.has(request.url)) await cache.delete(request);
+    }
+    // 新版本预缓存的页面比之前后台更新的副本新，丢弃旧副本
+    const pages = await caches.open(PAGES);
+    await Promise.all(MANIFEST.map(([url]) => pages.delete(url)));
+    await self.clients.claim();
+  })());
+});
+
+async function trim(cache) {
+  const keys = await cache.keys();
+  for (const request of keys.slice(0, Math.max(0, keys.length - RUNTIME_LIMIT))) {
+    await cache.delete(request);
+  }
+}
+
+async function fromPrecache(path) {
+  const revision = REVISIONS.get(path);
+  return revision ? caches.match(precacheKey(path, revision), { cacheName: PRECACHE }) : undefined;
+}
+
+// HTML：立即返回缓存的页面，同时在后台请求新版本供下次访问使用
+// 后台更新的副本优先于预缓存，预缓存的页面在安装新版本之前也能更新
+async function staleWhileRevalidate(event, request, path) {
+  const cache = await caches.open(PAGES);
+  const cached = (await cache.match(path)) || (await fromPrecache(path));
+  const network = fetch(request).then(async (response) => {
+    if (response.ok && !response.redirected) {
+      await cache.put(path, response.clone());
+      await trim(cache);
+    }
+    return response;
+  });
+  if (!cached) return network;
+  event.waitUntil(network.catch(() => {}));
+  return cached;
+}
+
+// 预缓存的文件和带内容摘要的文件：内容不会变化，优先使用缓存
+async function cacheFirst(request, path) {
+  const precached = await fromPrecache(path);
+  if (precached) return precached;
+  const cache = await caches.open(ASSETS);
+  const cached = await cache.match(request);
+  if (cached) return cached;
+  const response = await fetch(request);
+  if (response.ok && HASHED_PREFIXES.some((prefix) => path.startsWith(prefix))) {
+    await cache.put(request, response.clone());
+    await trim(cache);
+  }
+  return response;
+}
+
+self.addEventListener("fetch", (event) => {
+  const request = event.request;
+  const url = new URL(request.url);
+  if (request.method !== "GET" || url.origin !== location.origin) return;
+
+  if (request.mode === "navigate") {
+    event.respondWith(staleWhileRevalidate(event, request, url.pathname));
+  } else if (
+    REVISIONS.has(url.pathname) ||
+    HASHED_PREFIXES.some((prefix) => url.pathname.startsWith(prefix))
+  ) {
+    event.respondWith(cacheFirst(request, url.pathname));
+  }
+});
+"""
+
+# SERVICE_WORKER 关闭后输出的 sw.js：清空缓存并注销自身
+SW_UNREGISTER = """// 由 build.py 生成，请勿手动修改
+self.addEventListener("install", () => self.skipWaiting());
+self.addEventListener("activate", (event) => {
+  event.waitUntil((async () => {
+    for (const name of await caches.keys()) {
+      if (name.startsWith("tufted-")) await caches.delete(name);
+    }
+    await self.registration.unregister();
+  })());
+});
+"""
+
+
+def build_precache_manifest(files: set[str]) -> list[list[str]]:
     """
-    从生成的 HTML 文件中提取文章的元数据信息。
+    生成 Service Worker 的预缓存清单。
 
-    功能:
-        提取文章元数据：
-        1. 标题 (title): 从 <title> 标签提取
-        2. 描述 (description): 从 <meta name="description"> 提取
-        3. 链接 (link): 从 <link rel="canonical" href="..."> 提取
-        4. 日期 (date): 依次尝试从以下来源获取：
-            - HTML 中的 <meta name="date" content="...">
-            - 文件夹名中的 YYYY-MM-DD 格式日期
+    包含首页引用的站内 CSS/JS/图标、首页、header-links 中的导航页面，
+    以及 RSS 元数据缓存中最近的 SW_PRECACHE_POSTS 篇文章。外部资源不会被预缓存。
 
     参数:
-        index_html (Path): 文章的 index.html 文件路径
+        files: _site 下所有文件的相对路径集合
 
     返回:
-        tuple[str, str, str, datetime | None]: 包含四个元素的元组：
-            - str: 文章标题
-            - str: 文章描述（可能为空字符串）
-            - str: 文章链接（完整 URL）
-            - datetime | None: 文章日期（带 UTC 时区），无法获取时为 None
+        list[list[str]]: [URL, 内容摘要] 列表，按 URL 排序
     """
-    parser = parse_html_metadata(index_html)
+    targets: set[str] = set()
+
+    if "index.html" in files:
+        targets.add("index.html")
+        text = (SITE_DIR / "index.html").read_text(encoding="utf-8")
+        for match in TAG_PATTERN.finditer(text):
+            tag = match.group(1).lower()
+            attrs = parse_tag_attrs(match.group(2))
+            if tag == "link" and set((attrs.get("rel") or "").lower().split()) & BUDGET_LINK_RELS:
+                ref = attrs.get("href")
+            elif tag == "script":
+                ref = attrs.get("src")
+            else:
+                continue
+            resolved = resolve_site_reference("/", ref) if ref else None
+            if resolved and (target := lookup_site_path(resolved[0], files)[0]):
+                targets.add(target)
 
-    title = parser["title"].strip()
-    description = parser.get("description", "").strip()
-    link = parser.get("link", "")
-    date_obj = None
+    for link in get_header_links():
+        if link.startswith("/") and (target := lookup_site_path(link, files)[0]):
+            targets.add(target)
 
-    # 尝试从 <meta name="date"> 解析日期
-    if parser.get("date"):
-        try:
-            date_obj = datetime.strptime(parser["date"].split("T")[0], "%Y-%m-%d")
-            date_obj = date_obj.replace(tzinfo=timezone.utc)
-        except Exception:
-            pass
+    # 文章元数据由 collect_posts() 缓存：{路径: [签名, 标题, 描述, 链接, 日期]}
+    posts = [(entry[4], rel) for rel, entry in load_cache("posts").items() if entry[4]]
+    for _, rel in sorted(posts, reverse=True)[:SW_PRECACHE_POSTS]:
+        if rel in files:
+            targets.add(rel)
 
-    # 如果没找到日期，尝试从文件夹名提取 (YYYY-MM-DD)
-    if not date_obj:
-        date_match = re.search(r"(\d{4}-\d{2}-\d{2})", index_html.parent.name)
-        if date_match:
-            try:
-                date_obj = datetime.strptime(date_match.group(1), "%Y-%m-%d")
-                date_obj = date_obj.replace(tzinfo=timezone.utc)
-            except ValueError:
-                pass
+    manifest = []
+    for rel in sorted(targets):
+        if digest := file_digest(SITE_DIR / rel):
+            manifest.append([site_path_to_url(rel), digest[:16]])
+    return manifest
 
-    return title, description, link, date_obj
 
+def generate_service_worker() -> bool:
+    """
+    生成 _site/sw.js。
+
+    预缓存清单中的每个文件都带有内容摘要，只有摘要变化的文件会被浏览器重新下载；
+    清单没有变化时不会重写 sw.js，浏览器也就不会安装新版本。
 
-def collect_posts(dirs: set[str], site_url: str) -> list[dict]:
+    返回:
+        bool: 生成是否成功
     """
-    从指定的目录中收集所有文章的元数据。
+    sw_path = SITE_DIR / "sw.js"
+    state = load_cache("sw")
+
+    if SERVICE_WORKER:
+        manifest = build_precache_manifest(list_site_files())
+        save_digest_cache()
+        version = hashlib.sha256(json.dumps(manifest).encode()).hexdigest()[:16]
+        content = (
+            SW_TEMPLATE.replace("__VERSION__", version)
+            .replace("__LIMIT__", str(SW_RUNTIME_LIMIT))
+            .replace("__HASHED__", json.dumps(hashed_url_prefixes()))
+            .replace("__MANIFEST__", json.dumps(manifest, ensure_ascii=False))
+        )
+    elif state:
+        # 曾经启用过：继续输出注销脚本，让已安装的浏览器卸载
+        manifest, content = [], SW_UNREGISTER
+    else:
+        return True
 
-    功能:
-        遍历 _site 目录下指定目录中的所有子目录，提取每个文章的元数据信息。
-        只处理目录（每个目录代表一篇文章），跳过普通文件。
-        如果无法确定文章日期，则跳过该文章并输出警告。
+    if path_signature(sw_path) is not None and sw_path.read_text(encoding="utf-8") == content:
+        print(f"✅ Service Worker 未变化，跳过。（预缓存 {len(manifest)} 个文件）")
+        return True
 
-    参数:
-        dirs (set[str]): 要扫描的目录名称集合（如 {"Blog", "Docs"}）
-        site_url (str): 站点的根 URL（如 "https://example.com"）
+    try:
+        atomic_write_text(sw_path, content)
+        refresh_snapshot(sw_path)
+    except OSError as e:
+        print(f"❌ 生成 Service Worker 失败: {e}")
+        return False
 
-    返回:
-        list[dict]: 文章数据字典列表，每个字典包含以下键：
-            - title (str): 文章标题
-            - description (str): 文章描述
-            - dir (str): 文章所属分类（即目录名）
-            - link (str): 文章的完整 URL
-            - date (datetime): 文章日期对象（带时区）
+    if not SERVICE_WORKER:
+        print("✅ Service Worker 已替换为注销脚本。")
+        return True
+
+    previous = dict(state.get("manifest", []))
+    changed = sum(1 for url, revision in manifest if previous.get(url) != revision)
+    save_cache("sw", {"version": version, "manifest": manifest})
+    print(f"✅ Service Worker 生成完成: 预缓存 {len(manifest)} 个文件，其中 {changed} 个有变化")
+    return True
+
+
+# ============================================================================
+# 缓存响应头
+# ============================================================================
+
+# 内容摘要形式的文件名片段，如 _media/<摘要>.png、lato-<摘要>.woff2、tufte.min-<摘要>.css
+HASHED_NAME_PATTERN = re.compile(r"(?:^|[-.])[0-9a-f]{8,}(?:[-.]|$)")
+# 每次都需要向服务器确认的文件：页面、订阅源、sitemap、robots.txt
+DOCUMENT_SUFFIXES = {".html", ".xml", ".txt"}
+HEADERS_FILE = "_headers"  # 相对于 _site/
+
+
+def hashed_url_prefixes() -> list[str]:
+    """输出文件以内容摘要命名的目录（URL 前缀）"""
+    return [f"/{MEDIA_DIR}/", "/_img/", f"/{FONTS_DIR}/", f"/{MATH_DIR}/", f"/{VENDOR_DIR}/"]
+
+
+def cache_policy(rel: str) -> str:
     """
-    posts = []
+    文件使用的缓存策略（CACHE_CONTROL 的键）。
 
-    for d in dirs:
-        dir_path = SITE_DIR / d
+    参数:
+        rel: 相对于 _site/ 的路径
 
-        for item in dir_path.iterdir():
-            if not item.is_dir():
-                continue
+    返回:
+        str: "immutable"、"document" 或 "asset"
+    """
+    path = Path(rel)
+    if any(f"/{rel}".startswith(prefix) for prefix in hashed_url_prefixes()):
+        if HASHED_NAME_PATTERN.search(path.stem):
+            return "immutable"
+    if path.suffix in DOCUMENT_SUFFIXES or rel == "sw.js":
+        return "document"
+    return "asset"
 
-            index_html = item / "index.html"
-            if not index_html.exists():
-                continue
 
-            title, description, link, date_obj = extract_post_metadata(index_html)
+def page_preloads(rel: str, files: set[str]) -> list[str]:
+    """
+    获取页面 <head> 中引用的站内样式表与脚本，格式化为 Link 响应头的取值。
 
-            if not date_obj:
-                print(f"⚠️ 无法确定文章 '{item.name}' 的日期，已跳过。")
-                continue
+    参数:
+        rel: 页面相对于 _site/ 的路径
+        files: _site 下所有文件的相对路径集合
 
-            posts.append(
-                {
-                    "title": title,
-                    "description": description,
-                    "dir": d,
-                    "link": link,
-                    "date": date_obj,
-                }
-            )
+    返回:
+        list[str]: 如 ["</assets/tufted.css>; rel=preload; as=style", ...]
+    """
+    text = (SITE_DIR / rel).read_text(encoding="utf-8", errors="replace")
+    head = text[: max(text.find("</head>"), 0)]
+    head = RAW_TEXT_PATTERN.sub(lambda m: m.group(1) + m.group(3) if m.group(1) else "", head)
+    page_url = site_path_to_url(rel)
+
+    preloads: list[str] = []
+    for match in TAG_PATTERN.finditer(head):
+        tag = match.group(1).lower()
+        attrs = parse_tag_attrs(match.group(2))
+        if tag == "link" and "stylesheet" in (attrs.get("rel") or "").lower().split():
+            ref, kind = attrs.get("href"), "style"
+        elif tag == "script" and (attrs.get("type") or "text/javascript") == "text/javascript":
+            ref, kind = attrs.get("src"), "script"
+        else:
+            continue
+        if ref and (resolved := resolve_site_reference(page_url, ref)):
+            if lookup_site_path(resolved[0], files)[0]:
+                preload = f"<{resolved[0]}>; rel=preload; as={kind}"
+                if preload not in preloads:
+                    preloads.append(preload)
+    return preloads
 
-    return posts
 
+def parse_headers_file(path: Path) -> list[tuple[str, list[tuple[str, str]]]]:
+    """
+    解析 _headers 文件（Netlify / Cloudflare Pages 格式）。
+
+    参数:
+        path: 文件路径
 
-def build_rss_xml(posts: list[dict], config: dict) -> str:
+    返回:
+        list[tuple[str, list[tuple[str, str]]]]: [(URL 模式, [(响应头, 取值), ...]), ...]，
+        文件不存在时返回空列表
     """
-    构建符合 RSS 2.0 规范的 XML 内容字符串。
+    rules: list[tuple[str, list[tuple[str, str]]]] = []
+    try:
+        lines = path.read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return rules
+    for line in lines:
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        if not line[0].isspace():
+            rules.append((line.strip(), []))
+        elif rules and ":" in line:
+            name, _, value = line.strip().partition(":")
+            rules[-1][1].append((name.strip(), value.strip()))
+    return rules
 
-    功能:
-        使用 Python 标准库 xml.etree.ElementTree 根据文章数据和站点配置生成完整的 RSS Feed XML。
-        支持条件输出 description 标签（仅在有描述时输出）。
+
+def match_headers(
+    rules: list[tuple[str, list[tuple[str, str]]]], url_path: str
+) -> list[tuple[str, str]]:
+    """
+    获取 _headers 中匹配某个 URL 路径的所有响应头（末尾的 * 匹配任意后缀）。
 
     参数:
-        posts (list[dict]): 文章数据列表，每个字典应包含:
-            - title: 标题
-            - description: 描述（可选）
-            - link: 文章链接
-            - date: datetime 对象
-            - dir: 分类名称 (即路径名)
-        config (dict): 站点配置字典，应包含:
-            - site_url: 站点根 URL
-            - site_title: 站点标题
-            - site_description: 站点描述
-            - lang: 语言代码（如 "zh", "en"）
+        rules: parse_headers_file() 的结果
+        url_path: 请求的 URL 路径
 
     返回:
-        str: 完整的 RSS 2.0 XML 字符串，包含 XML 声明和所有必要的命名空间。
+        list[tuple[str, str]]: 按规则顺序排列的 [(响应头, 取值), ...]
     """
-    import xml.etree.ElementTree as ET
-    from email.utils import format_datetime
+    headers: list[tuple[str, str]] = []
+    for pattern, values in rules:
+        if pattern.endswith("*"):
+            matched = url_path.startswith(pattern[:-1])
+        else:
+            matched = url_path == pattern
+        if matched:
+            headers.extend(values)
+    return headers
 
-    # 注册 atom 命名空间前缀
-    ATOM_NS = "http://www.w3.org/2005/Atom"
-    ET.register_namespace("atom", ATOM_NS)
 
-    # 创建 RSS 根元素（命名空间声明由 register_namespace 自动处理）
-    rss = ET.Element("rss", version="2.0")
+def generate_headers() -> bool:
+    """
+    生成 _site/_headers（Netlify / Cloudflare Pages 格式）与等价的 NGINX_HEADERS_FILE。
 
-    # Channel 元数据
-    channel = ET.SubElement(rss, "channel")
-    ET.SubElement(channel, "title").text = config["site_title"]
-    ET.SubElement(channel, "link").text = config["site_url"]
-    ET.SubElement(channel, "description").text = config["site_description"]
-    ET.SubElement(channel, "language").text = config["lang"]
-    ET.SubElement(channel, "lastBuildDate").text = format_datetime(datetime.now(timezone.utc))
+    - 以内容摘要命名的文件：CACHE_CONTROL["immutable"]
+    - 页面、订阅源等：CACHE_CONTROL["document"]
+    - 其他文件：CACHE_CONTROL["asset"]
+    - 页面 <head> 中的站内 CSS/JS 写为 Link: rel=preload，支持 103 Early Hints 的平台会提前发送
 
-    # 添加 atom:link 自链接
-    atom_link = ET.SubElement(channel, f"{{{ATOM_NS}}}link")
-    atom_link.set("href", f"{config['site_url']}/feed.xml")
-    atom_link.set("rel", "self")
-    atom_link.set("type", "application/rss+xml")
+    同一顶层目录中的文件策略相同时合并为一条通配规则，这样规则数不会随页面数增长，
+    目录中各页面的预加载相同时也写在通配规则中；页面与普通资源混合的目录中，通配规则
+    使用资源的策略且不带预加载，页面另写精确规则（/Blog/x/ 与 /Blog/x/index.html）。
 
-    # 添加文章条目
-    for post in posts:
-        item = ET.SubElement(channel, "item")
+    返回:
+        bool: 生成是否成功
+    """
+    headers_path = SITE_DIR / HEADERS_FILE
+    state = load_cache("headers")
+
+    if not CACHE_HEADERS:
+        # 关闭后删除之前生成的文件
+        if state:
+            headers_path.unlink(missing_ok=True)
+            refresh_snapshot(headers_path)
+            NGINX_HEADERS_FILE.unlink(missing_ok=True)
+            save_cache("headers", {})
+        return True
+    if not SITE_DIR.exists():
+        return True
 
-        ET.SubElement(item, "title").text = post["title"]
-        ET.SubElement(item, "link").text = post["link"]
-        ET.SubElement(item, "guid", isPermaLink="true").text = post["link"]
-        ET.SubElement(item, "pubDate").text = format_datetime(post["date"])
-        ET.SubElement(item, "category").text = post["dir"]
+    files = list_site_files() - {HEADERS_FILE}
+
+    # 每个页面的预加载列表按页面签名缓存
+    cached = state.get("pages", {})
+    pages: dict[str, list] = {}
+    for rel in sorted(f for f in files if f.endswith(".html")):
+        signature = path_signature(SITE_DIR / rel)
+        entry = cached.get(rel)
+        if not entry or entry[0] != signature:
+            entry = [signature, page_preloads(rel, files)]
+        pages[rel] = entry
+
+    groups: dict[str, list[str]] = {}
+    for rel in sorted(files):
+        groups.setdefault(rel.split("/", 1)[0] if "/" in rel else "", []).append(rel)
+
+    # (_headers 中的 URL 模式, 响应头, nginx location, nginx 中的完整响应头)
+    rules: list[tuple[list[str], list[str], str, list[str]]] = []
+
+    def file_rule(rel: str, inherited: list[str] | None = None) -> None:
+        links = [f"Link: {value}" for value in pages.get(rel, [None, []])[1]]
+        urls = [f"/{rel}"]
+        if rel.endswith(".html") and site_path_to_url(rel) != urls[0]:
+            urls.insert(0, site_path_to_url(rel))
+        if inherited is None:
+            own = [f"Cache-Control: {CACHE_CONTROL[cache_policy(rel)]}", *links]
+            rules.append((urls, own, f"= /{rel}", own))
+        elif links:
+            rules.append((urls, links, f"= /{rel}", inherited + links))
+
+    for top, rels in groups.items():
+        policies = {cache_policy(rel) for rel in rels}
+        if not top or (len(policies) > 1 and "immutable" in policies):
+            for rel in rels:
+                file_rule(rel)
+            continue
 
-        # 仅在有描述时添加
-        if des := post["description"]:
-            ET.SubElement(item, "description").text = des
+        if len(policies) > 1:
+            # 页面与普通资源混合：通配规则只服务资源，页面各自使用精确规则。
+            # _headers 会合并所有匹配规则的同名响应头，页面规则写在前面使其取值排在前面
+            for rel in rels:
+                if cache_policy(rel) == "document":
+                    file_rule(rel)
+            common = [f"Cache-Control: {CACHE_CONTROL['asset']}"]
+            rules.append(([f"/{top}/*"], common, f"^~ /{top}/", common))
+            continue
 
-    # 生成 XML 字符串
-    ET.indent(rss, space="  ")
-    xml_str = ET.tostring(rss, encoding="unicode", xml_declaration=False)
+        common = [f"Cache-Control: {CACHE_CONTROL[policies.pop()]}"]
+        preload_sets = {tuple(pages[rel][1]) for rel in rels if rel in pages}
+        shared = preload_sets.pop() if len(preload_sets) == 1 else ()
+        links = [f"Link: {value}" for value in shared]
+        rules.append(([f"/{top}/*"], common + links, f"^~ /{top}/", common + links))
+        if not shared:
+            for rel in rels:
+                file_rule(rel, common)
+
+    headers_text = "# 由 build.py 生成，请勿手动修改\n"
+    nginx_text = (
+        "# 由 build.py 生成，请勿手动修改\n"
+        f"# 在 nginx 的 server 块中 include 此文件（root 指向 {SITE_DIR}）。\n"
+        "# 注意：location 中的 add_header 会使 server 块中的 add_header 不再生效。\n"
+    )
+    for urls, headers, location, nginx_headers in rules:
+        for url in urls:
+            headers_text += f"\n{url}\n" + "".join(f"  {line}\n" for line in headers)
+        nginx_text += f"\nlocation {location} {{\n"
+        for line in nginx_headers:
+            name, _, value = line.partition(": ")
+            nginx_text += f'    add_header {name} "{value}";\n'
+        nginx_text += "}\n"
 
-    return f'<?xml version="1.0" encoding="UTF-8"?>\n{xml_str}'
+    try:
+        changed = False
+        NGINX_HEADERS_FILE.parent.mkdir(parents=True, exist_ok=True)
+        for path, text in ((headers_path, headers_text), (NGINX_HEADERS_FILE, nginx_text)):
+            if path_signature(path) is None or path.read_text(encoding="utf-8") != text:
+                atomic_write_text(path, text)
+                refresh_snapshot(path)
+                changed = True
+    except OSError as e:
+        print(f"❌ 生成缓存响应头失败: {e}")
+        return False
 
+    save_cache("headers", {"pages": pages})
+    preloaded = sum(1 for entry in pages.values() if entry[1])
+    if changed:
+        print(
+            f"✅ 缓存响应头生成完成: {len(rules)} 条规则，{preloaded} 个页面带预加载"
+            f"（{headers_path}、{NGINX_HEADERS_FILE}）"
+        )
+    else:
+        print(f"✅ 缓存响应头未变化，跳过。（{len(rules)} 条规则）")
+    return True
 
-def generate_rss(site_url: str) -> bool:
-    """
-    生成网站的 RSS 订阅源文件。
 
-    功能:
-        完整的 RSS Feed 生成流程：
-        1. 从 config.typ 读取目标目录（分类）
-        2. 收集指定目录下的所有文章元数据
-        3. 按日期排序
-        4. 构建 RSS XML 并写入文件
+# ============================================================================
+# 性能预算
+# ============================================================================
 
-    返回:
-        bool: 生成是否成功。在以下情况返回 True：
-            - 成功生成 RSS 文件
-            - 未找到任何分类目录（跳过生成）
-            - 未找到任何文章（生成空 Feed）
-        仅在发生异常时返回 False。
-    """
-    rss_file = SITE_DIR / "feed.xml"
-    dirs = get_feed_dirs()
+# 计入请求数的子资源：(标签, 属性)；<link> 只统计 BUDGET_LINK_RELS 中的 rel
+BUDGET_RESOURCE_ATTRS = {
+    ("link", "href"),
+    ("script", "src"),
+    ("img", "src"),
+    ("iframe", "src"),
+    ("video", "src"),
+    ("video", "poster"),
+    ("audio", "src"),
+    ("embed", "src"),
+    ("object", "data"),
+}
+BUDGET_LINK_RELS = {"stylesheet", "icon", "preload", "modulepreload"}
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif", ".svg", ".ico", ".bmp"}
+TEXT_SUFFIXES = {".css", ".js", ".mjs", ".svg", ".json"}
+BUDGET_METRIC_NAMES = {
+    "html_bytes": "HTML",
+    "compressed_bytes": "压缩后大小",
+    "image_bytes": "图片",
+    "requests": "请求数",
+}
 
-    if not dirs:
-        print("⚠️ 跳过 RSS 订阅源生成: 未配置任何目录。")
-        return True
 
-    # 检查是否至少有一个目录存在
-    existing = {d for d in dirs if (SITE_DIR / d).exists()}
-    missing = dirs - existing
+@dataclass
+class BudgetReport:
+    """性能预算检查结果"""
 
-    for d in missing:
-        print(f"⚠️ 警告: 配置的目录 '{d}' 不存在。")
+    pages: dict[str, dict[str, int]] = field(default_factory=dict)  # URL -> 指标
+    violations: list[dict] = field(default_factory=list)
 
-    if not existing:
-        print("⚠️ 跳过 RSS 订阅源生成: 配置的目录都不存在。")
-        return True
+    def format_summary(self) -> str:
+        """格式化超出预算的页面列表"""
+        lines = [f"📏 性能预算: {len(self.violations)} 项超出预算"]
+        for v in self.violations[:30]:
+            name = BUDGET_METRIC_NAMES.get(v["metric"], v["metric"])
+            if v["metric"] == "requests":
+                actual, limit = v["actual"], v["limit"]
+            else:
+                actual, limit = format_size(v["actual"]), format_size(v["limit"])
+            lines.append(f"  ⚠️ {v['page']}: {name} {actual} > {limit}")
+        if len(self.violations) > 30:
+            lines.append(f"  ... 以及另外 {len(self.violations) - 30} 项")
+        return "\n".join(lines)
 
-    # 收集文章
-    posts = collect_posts(existing, site_url)
+    @property
+    def has_failures(self) -> bool:
+        """是否存在超出预算的页面"""
+        return bool(self.violations)
 
-    if not posts:
-        print("⚠️ 未找到任何文章，RSS 订阅源为空。")
-        return True
 
-    # 按日期降序排序
-    posts = sorted(posts, key=lambda x: x["date"], reverse=True)
+def format_size(size: int) -> str:
+    """
+    将字节数格式化为易读的字符串。
 
-    # 获取配置信息
-    index_html = SITE_DIR / "index.html"
-    parser = parse_html_metadata(index_html)
+    参数:
+        size: 字节数
 
-    lang = parser["lang"]
-    site_title = parser["title"].strip()
-    site_description = parser.get("description", "").strip()
+    返回:
+        str: 如 "512 B"、"1.5 KB"、"3.2 MB"
+    """
+    value = float(size)
+    for unit in ("B", "KB", "MB"):
+        if value < 1024 or unit == "MB":
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} MB"
 
-    config = {
-        "site_url": site_url,
-        "site_title": site_title,
-        "site_description": site_description,
-        "lang": lang,
-    }
 
-    # 构建 RSS XML
-    try:
-        rss_content = build_rss_xml(posts, config)
-        rss_file.write_text(rss_content, encoding="utf-8")
-        print(f"✅ RSS 订阅源生成成功: {rss_file} ({len(posts)} 篇文章)")
-        return True
-    except ValueError as e:
-        print("❌ 错误: RSS 订阅源生成失败")
-        print(f"   原因: feedgen 库报错 - {e}")
-        print("   解决: 请检查 config.typ 中的必需配置字段（title 和 description）")
-        return False
-    except Exception as e:
-        print("❌ 错误: 生成 RSS 订阅源时出错")
-        print(f"   异常: {type(e).__name__}: {e}")
-        return False
+def gzip_size(path: Path, gzip_cache: dict[str, list[int]]) -> int:
+    """
+    计算文件经 gzip 压缩后的大小，结果按文件签名缓存。
 
+    参数:
+        path: 文件路径
+        gzip_cache: {路径: [mtime_ns, size, 压缩后大小]}，会被原地更新
 
-def generate_sitemap(site_url: str) -> bool:
+    返回:
+        int: 压缩后的字节数，文件不存在返回 0
     """
-    使用 Python 标准库 xml.etree.ElementTree 生成 sitemap.xml。
+    import gzip
+
+    signature = path_signature(path)
+    if signature is None:
+        return 0
+    key = path.as_posix()
+    entry = gzip_cache.get(key)
+    if entry and entry[:2] == signature:
+        return entry[2]
+    size = len(gzip.compress(path.read_bytes(), compresslevel=6))
+    gzip_cache[key] = [*signature, size]
+    return size
+
+
+def collect_page_resources(rel_path: str, files: set[str]) -> tuple[list[str], int, int]:
     """
-    import xml.etree.ElementTree as ET
+    收集页面引用的子资源。
 
-    sitemap_path = SITE_DIR / "sitemap.xml"
-    sitemap_ns = "http://www.sitemaps.org/schemas/sitemap/0.9"
+    参数:
+        rel_path: 页面相对于 _site/ 的路径
+        files: _site 下所有文件的相对路径集合
 
-    # 注册默认命名空间
-    ET.register_namespace("", sitemap_ns)
+    返回:
+        tuple[list[str], int, int]: (站内资源的 _site 相对路径列表, 外部资源数量,
+        以 data: URI 内嵌在页面中的图片解码后的总字节数)
+    """
+    text = (SITE_DIR / rel_path).read_text(encoding="utf-8", errors="replace")
+    text = RAW_TEXT_PATTERN.sub(lambda m: m.group(1) + m.group(3) if m.group(1) else "", text)
+    page_url = site_path_to_url(rel_path)
+
+    local: list[str] = []
+    external: set[str] = set()
+    embedded_images = 0
+    for match in TAG_PATTERN.finditer(text):
+        tag = match.group(1).lower()
+        attrs = parse_tag_attrs(match.group(2))
+        if tag == "link" and not BUDGET_LINK_RELS & set((attrs.get("rel") or "").lower().split()):
+            continue
+        for attr in ("href", "src", "poster", "data"):
+            if (tag, attr) not in BUDGET_RESOURCE_ATTRS or not (ref := attrs.get(attr)):
+                continue
+            if ref.startswith("data:"):
+                # Typst 导出 HTML 时 image() 的图片都内嵌在页面中，同样计入图片大小
+                decoded = decode_data_uri(ref)
+                if decoded and decoded[0].startswith("image/"):
+                    embedded_images += len(decoded[1])
+                continue
+            resolved = resolve_site_reference(page_url, ref)
+            if resolved is None:
+                external.add(ref)
+            elif (target := lookup_site_path(resolved[0], files)[0]) and target not in local:
+                local.append(target)
 
-    # 创建根元素
-    urlset = ET.Element("urlset", xmlns=sitemap_ns)
+    return local, len(external), embedded_images
 
-    # 遍历 _site 目录
-    for file_path in sorted(SITE_DIR.rglob("*.html")):
-        rel_path = file_path.relative_to(SITE_DIR).as_posix()
 
-        # 确定 URL 路径
-        if rel_path == "index.html":
-            url_path = ""
-        elif rel_path.endswith("/index.html"):
-            url_path = rel_path.removesuffix("index.html")
-        elif rel_path.endswith(".html"):
-            url_path = rel_path.removesuffix(".html") + "/"
-        else:
-            url_path = rel_path
+def page_budget(url: str) -> dict[str, int]:
+    """
+    合并页面 URL 匹配的所有预算规则。
 
-        full_url = f"{site_url}/{url_path}"
+    参数:
+        url: 页面 URL 路径
 
-        # 获取最后修改时间
-        mtime = file_path.stat().st_mtime
-        lastmod = datetime.fromtimestamp(mtime).strftime("%Y-%m-%d")
+    返回:
+        dict[str, int]: 指标名 -> 上限
+    """
+    from fnmatch import fnmatchcase
 
-        # 创建 url 元素
-        url_elem = ET.SubElement(urlset, "url")
-        ET.SubElement(url_elem, "loc").text = full_url
-        ET.SubElement(url_elem, "lastmod").text = lastmod
+    budget: dict[str, int] = {}
+    for pattern, limits in PERFORMANCE_BUDGETS.items():
+        if fnmatchcase(url, pattern):
+            budget.update(limits)
+    return budget
 
-    # 生成 XML 字符串
-    ET.indent(urlset, space="  ")
-    xml_str = ET.tostring(urlset, encoding="unicode", xml_declaration=False)
-    sitemap_content = f'<?xml version="1.0" encoding="UTF-8"?>\n{xml_str}'
 
-    try:
-        sitemap_path.write_text(sitemap_content, encoding="utf-8")
-        print(f"✅ Sitemap 构建完成: 包含 {len(urlset)} 个页面")
-        return True
-    except Exception as e:
-        print(f"❌ Sitemap 构建失败: {e}")
-        return False
+def check_budgets() -> BudgetReport:
+    """
+    根据 _site 中生成的页面及其引用的资源检查性能预算。
 
+    页面引用的资源列表按页面签名缓存在 .build-cache/budgets.json，
+    未变化的页面不会重新解析；资源大小每次都重新读取，资源单独变化时也能发现超标。
 
-def generate_robots_txt(site_url: str) -> bool:
+    返回:
+        BudgetReport: 各页面的指标与超出预算的项目
     """
-    Generate robots.txt pointing to the sitemap.
+    report = BudgetReport()
+    if not SITE_DIR.exists():
+        return report
+
+    files = list_site_files()
+    state = load_cache("budgets")
+    cached_pages = state.get("pages", {})
+    gzip_cache = state.get("gzip", {})
+    pages: dict[str, dict] = {}
+
+    for rel in sorted(f for f in files if f.endswith(".html")):
+        page = SITE_DIR / rel
+        signature = path_signature(page)
+        entry = cached_pages.get(rel)
+        if not entry or entry["sig"] != signature or "embedded" not in entry:
+            local, external, embedded = collect_page_resources(rel, files)
+            entry = {"sig": signature, "local": local, "external": external, "embedded": embedded}
+        pages[rel] = entry
+
+        metrics = {
+            "html_bytes": signature[1] if signature else 0,
+            "compressed_bytes": gzip_size(page, gzip_cache),
+            "image_bytes": entry["embedded"],
+            "requests": len(entry["local"]) + entry["external"],
+        }
+        for resource in entry["local"]:
+            path = SITE_DIR / resource
+            suffix = path.suffix.lower()
+            if suffix in IMAGE_SUFFIXES:
+                metrics["image_bytes"] += (path_signature(path) or [0, 0])[1]
+            if suffix in TEXT_SUFFIXES:
+                metrics["compressed_bytes"] += gzip_size(path, gzip_cache)
+
+        url = site_path_to_url(rel)
+        report.pages[url] = metrics
+        for metric, limit in page_budget(url).items():
+            if metrics.get(metric, 0) > limit:
+                report.violations.append(
+                    {"page": url, "metric": metric, "actual": metrics[metric], "limit": limit}
+                )
+
+    gzip_cache = {k: v for k, v in gzip_cache.items() if os.path.exists(k)}
+    save_cache("budgets", {"pages": pages, "gzip": gzip_cache})
+    return report
+
+
+def export_budget_report(report: BudgetReport, output: Path) -> bool:
     """
-    robots_content = f"""User-agent: *
-Allow: /
+    将性能预算检查结果导出为 JSON，便于在不同提交之间对比趋势。
 
-Sitemap: {site_url}/sitemap.xml
-"""
+    参数:
+        report: 检查结果
+        output: 输出文件路径
 
+    返回:
+        bool: 是否写入成功
+    """
+    data = {
+        "generated": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "budgets": PERFORMANCE_BUDGETS,
+        "totals": {
+            metric: sum(m[metric] for m in report.pages.values()) for metric in BUDGET_METRIC_NAMES
+        },
+        "pages": report.pages,
+        "violations": report.violations,
+    }
     try:
-        (SITE_DIR / "robots.txt").write_text(robots_content, encoding="utf-8")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_text(output, json.dumps(data, ensure_ascii=False, indent=2))
+        print(f"  📄 性能预算报告已导出: {output}")
         return True
     except Exception as e:
-        print(f"❌ 生成 robots.txt 失败: {e}")
+        print(f"  ❌ 导出性能预算报告失败: {e}")
         return False
 
 
-def build(force: bool = False) -> bool:
+def build(
+    force: bool = False,
+    link_check: bool = False,
+    strict_budgets: bool = BUDGET_FAIL,
+    budget_report: Path | None = None,
+    jobs: int = BUILD_JOBS,
+    paths: list[str] | None = None,
+) -> bool:
     """
     完整构建：HTML + PDF + 资源。
 
     参数:
         force: 是否强制重建所有文件
+        link_check: 是否在构建结束后检查站内链接
+        strict_budgets: 超出性能预算时是否让构建失败
+        budget_report: 性能预算报告的 JSON 导出路径
+        jobs: 同时运行的 Typst 进程数
+        paths: 只构建匹配的页面（路径或 glob，见 resolve_targets()），None 表示所有页面
     """
     print("-" * 60)
-    if force:
+    if paths:
+        print("🎯 开始部分构建...")
+    elif force:
         clean()
         print("🛠️ 开始完整构建...")
     else:
         print("🚀 开始增量构建...")
     print("-" * 60)
 
-    # 确保输出目录存在
+    # 确保输出目录存在，并丢弃上一次构建留下的文件系统快照
     SITE_DIR.mkdir(parents=True, exist_ok=True)
+    invalidate_snapshots()
+    remove_stale_temp_files()
+
+    # 部分构建：只编译匹配的页面，后处理、sitemap 和 RSS 也只更新这些页面
+    targets = pages = None
+    if paths:
+        targets = resolve_targets(paths)
+        if not targets:
+            print("❌ 没有匹配的页面。")
+            return False
+        print(f"  共 {len(targets)} 个页面")
+        pages = {
+            get_file_output_path(f, "pdf" if "pdf" in f.stem.lower() else "html")
+            .relative_to(SITE_DIR)
+            .as_posix()
+            for f in targets
+        }
 
     results = []
 
+    def stage(func: Callable[..., bool], *args) -> None:
+        with profile_span(func.__name__):
+            results.append(func(*args))
+
     print()
-    results.append(build_html(force))
-    results.append(build_pdf(force))
+    stage(build_html, force, jobs, targets)
+    stage(build_pdf, force, jobs, targets)
     print()
 
-    results.append(copy_assets())
-    results.append(copy_content_assets(force))
+    if targets is not None and pages is not None:
+        # 列表页的分页（/<目录>/page/<N>/）由 build_html 一并重新生成，也需要后续处理
+        for section in find_listing_pages(sorted(targets)):
+            pages.update(
+                output.relative_to(SITE_DIR).as_posix()
+                for output in (SITE_DIR / section / "page").glob("*/index.html")
+            )
+
+    stage(copy_assets)
+    stage(copy_content_assets, force)
+    stage(postprocess_html, force, pages)
 
     if site_url := get_site_url():
-        results.append(generate_sitemap(site_url))
-        results.append(generate_robots_txt(site_url))
-        results.append(generate_rss(site_url))
+        stage(generate_sitemap, site_url, pages)
+        stage(generate_robots_txt, site_url)
+        stage(generate_rss, site_url, pages)
+
+    # 字符集来自后处理之后的页面
+    stage(build_webfonts)
+
+    # 预缓存清单中的摘要来自后处理之后的页面
+    stage(generate_service_worker)
+    stage(generate_headers)
+
+    if link_check:
+        stage(check_links)
+
+    # 未设置预算时只在需要导出报告时收集指标
+    budgets = BudgetReport()
+    if PERFORMANCE_BUDGETS or budget_report:
+        with profile_span("check_budgets"):
+            budgets = check_budgets()
+    if budget_report:
+        results.append(export_budget_report(budgets, budget_report))
+    if strict_budgets:
+        results.append(not budgets.has_failures)
 
     print("-" * 60)
+    if budgets.has_failures:
+        print(budgets.format_summary())
     if all(results):
         print("✅ 所有构建任务完成！")
         print(f"  📂 输出目录: {SITE_DIR.absolute()}")
@@ -1188,15 +6327,90 @@ def create_parser() -> argparse.ArgumentParser:
     subparsers = parser.add_subparsers(dest="command", title="可用命令", metavar="<command>")
 
     build_parser = subparsers.add_parser("build", help="完整构建 (HTML + PDF + 资源)")
+    build_parser.add_argument(
+        "paths", nargs="*", metavar="PATH", help="只构建匹配的页面（路径或 glob，可指向模板等共享文件）"
+    )
     build_parser.add_argument("-f", "--force", action="store_true", help="强制完整重建")
+    build_parser.add_argument(
+        "-j", "--jobs", type=int, default=BUILD_JOBS, help=f"并行编译数（默认: {BUILD_JOBS}）"
+    )
+    build_parser.add_argument(
+        "--backend",
+        choices=["subprocess", "typst-py"],
+        default=COMPILER_BACKEND,
+        help=f"Typst 编译后端（默认: {COMPILER_BACKEND}）",
+    )
+    build_parser.add_argument(
+        "--fsync", action="store_true", default=FSYNC_OUTPUTS, help="写入输出文件后刷新到磁盘"
+    )
+    build_parser.add_argument(
+        "--check-links", action="store_true", help="构建完成后检查站内链接，存在失效链接时构建失败"
+    )
+    build_parser.add_argument(
+        "--strict-budgets",
+        action="store_true",
+        default=BUDGET_FAIL,
+        help="超出性能预算时构建失败",
+    )
+    build_parser.add_argument(
+        "--budget-report", type=Path, metavar="PATH", help="将性能预算检查结果导出为 JSON"
+    )
+    build_parser.add_argument(
+        "--profile",
+        nargs="?",
+        type=Path,
+        const=PROFILE_TRACE_FILE,
+        metavar="PATH",
+        help=f"记录各阶段与每个页面的耗时并导出 Chrome trace（默认: {PROFILE_TRACE_FILE}）",
+    )
 
     html_parser = subparsers.add_parser("html", help="仅构建 HTML 文件")
+    html_parser.add_argument(
+        "paths", nargs="*", metavar="PATH", help="只构建匹配的页面（路径或 glob，可指向模板等共享文件）"
+    )
     html_parser.add_argument("-f", "--force", action="store_true", help="强制完整重建")
+    html_parser.add_argument(
+        "-j", "--jobs", type=int, default=BUILD_JOBS, help=f"并行编译数（默认: {BUILD_JOBS}）"
+    )
+    html_parser.add_argument(
+        "--backend",
+        choices=["subprocess", "typst-py"],
+        default=COMPILER_BACKEND,
+        help=f"Typst 编译后端（默认: {COMPILER_BACKEND}）",
+    )
+    html_parser.add_argument(
+        "--fsync", action="store_true", default=FSYNC_OUTPUTS, help="写入输出文件后刷新到磁盘"
+    )
 
     pdf_parser = subparsers.add_parser("pdf", help="仅构建 PDF 文件")
+    pdf_parser.add_argument(
+        "paths", nargs="*", metavar="PATH", help="只构建匹配的页面（路径或 glob，可指向模板等共享文件）"
+    )
     pdf_parser.add_argument("-f", "--force", action="store_true", help="强制完整重建")
+    pdf_parser.add_argument(
+        "-j", "--jobs", type=int, default=BUILD_JOBS, help=f"并行编译数（默认: {BUILD_JOBS}）"
+    )
+    pdf_parser.add_argument(
+        "--backend",
+        choices=["subprocess", "typst-py"],
+        default=COMPILER_BACKEND,
+        help=f"Typst 编译后端（默认: {COMPILER_BACKEND}）",
+    )
+    pdf_parser.add_argument(
+        "--fsync", action="store_true", default=FSYNC_OUTPUTS, help="写入输出文件后刷新到磁盘"
+    )
 
     subparsers.add_parser("assets", help="仅复制静态资源")
+
+    vendor_parser = subparsers.add_parser("vendor", help=f"将用到的 Typst 包放入 {PACKAGE_DIR}/")
+    vendor_parser.add_argument("--prune", action="store_true", help="删除不再被使用的包")
+
+    subparsers.add_parser("plan", help="列出下次构建会重新编译的页面及原因（不修改文件）")
+    explain_parser = subparsers.add_parser("explain", help="显示文件的正向与反向依赖")
+    explain_parser.add_argument("path", type=Path, help="要分析的文件")
+
+    check_links_parser = subparsers.add_parser("check-links", help="检查 _site 中的站内链接和锚点")
+    check_links_parser.add_argument("-f", "--force", action="store_true", help="忽略缓存，重新解析所有页面")
     subparsers.add_parser("clean", help="清理生成的文件")
 
     preview_parser = subparsers.add_parser("preview", help="启动本地预览服务器")
@@ -1206,6 +6420,9 @@ def create_parser() -> argparse.ArgumentParser:
     preview_parser.add_argument(
         "--no-open", action="store_false", dest="open_browser", help="不自动打开浏览器"
     )
+    preview_parser.add_argument(
+        "--headers", action="store_true", help="按 _site/_headers 发送响应头（使用内置预览服务器）"
+    )
     preview_parser.set_defaults(open_browser=True)
 
     return parser
@@ -1219,27 +6436,60 @@ if __name__ == "__main__":
         parser.print_help()
         sys.exit(0)
 
+    # PATH 参数相对于当前目录，切换目录前先转为绝对路径
+    paths = [os.path.abspath(p) for p in getattr(args, "paths", [])]
+    if getattr(args, "path", None) is not None:
+        args.path = Path(os.path.abspath(args.path))
+
     # 确保在项目根目录运行
     script_dir = Path(__file__).parent.absolute()
     os.chdir(script_dir)
 
     # 获取 force 参数
     force = getattr(args, "force", False)
+    COMPILER_BACKEND = getattr(args, "backend", COMPILER_BACKEND)
+    FSYNC_OUTPUTS = getattr(args, "fsync", FSYNC_OUTPUTS)
 
     # 使用 match-case 执行对应的命令
     match args.command:
         case "build":
-            success = build(force)
+            if args.profile:
+                PROFILER = Profiler()
+            with profile_span("build"):
+                success = build(
+                    force,
+                    args.check_links,
+                    args.strict_budgets,
+                    args.budget_report,
+                    args.jobs,
+                    paths,
+                )
+            if PROFILER:
+                PROFILER.write_trace(args.profile)
+                print(PROFILER.format_slowest(PROFILE_TOP_N))
+                print(f"  📄 性能分析 trace 已导出: {args.profile}（可在 https://ui.perfetto.dev 中打开）")
         case "html":
-            success = build_html(force)
+            success = build_html(force, args.jobs, resolve_targets(paths) if paths else None)
         case "pdf":
-            success = build_pdf(force)
+            success = build_pdf(force, args.jobs, resolve_targets(paths) if paths else None)
         case "assets":
             success = copy_assets()
+        case "vendor":
+            success = vendor_packages(args.prune)
+        case "plan":
+            success = plan()
+        case "explain":
+            success = explain(args.path)
+        case "check-links":
+            success = check_links(force)
         case "clean":
             success = clean()
         case "preview":
-            success = preview(getattr(args, "port", 8000), getattr(args, "open_browser", True))
+            success = preview(
+                getattr(args, "port", 8000),
+                getattr(args, "open_browser", True),
+                getattr(args, "headers", False),
+            )
         case _:
             print(f"❌ 未知命令: {args.command}")
             success = False
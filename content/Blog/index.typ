@@ -3,16 +3,4 @@
 
 = 博客 / Blog
 
-== 2026
-
-- #link("2026-02-15-2025-recap/")[2.15 - 2025 年终总结]
-- #link("2026-01-20-training-bug/")[1.20 - 单 epoch 训练时间逐渐变长的 bug 记录]
-
-== 2024
-
-- #link("2024-03-04-blog-building/")[3.4 - 个人博客搭建指南]
-
-
-== 2023
-
-- #link("2023-12-26-postgraduate-exam")[12.26 - 考研初试经验分享]
+#tufted.post-listing(json("_posts.json"))
@@ -4,12 +4,4 @@
 
 = 学习 / Study
 
-== 2026
-
-
-- #link("2026-02-17-c++notes/")[2.17 - C++ 八股文查漏补缺]
-- #link("2026-02-10-6.5840-lab5/")[2.10 - 记录一下 6.5840 2025 Spring Lab5 的过程]
-- #link("2026-02-05-6.5840-lab4/")[2.5 - 记录一下 6.5840 2025 Spring Lab4 的过程]
-- #link("2026-01-23-6.5840-lab3/")[1.23 - 记录一下 6.5840 2025 Spring Lab3 的过程]
-- #link("2026-01-22-6.5840-lab2/")[1.22 - 记录一下 6.5840 2025 Spring Lab2 的过程]
-- #link("2026-01-21-6.5840-lab1/")[1.21 - 记录一下 6.5840 2025 Spring Lab1 的过程]
\ No newline at end of file
+#tufted.post-listing(json("_posts.json"))
@@ -4,8 +4,4 @@
 
 = 想法 / Thoughts
 
-== 2026
-
-- #link("2026-05-31-headphone")[5.31 - 虹曙！🍠！]
-- #link("2026-03-09-seeking-internships")[3.9 - 找实习]
-- #link("2026-02-13-chat/")[2.13 - 聊天]
+#tufted.post-listing(json("_posts.json"))
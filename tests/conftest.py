@@ -0,0 +1,29 @@
+"""
+测试共用的 fixture：加载 build.py，并在临时目录中准备 _site
+"""
+
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture(scope="session")
+def build():
+    spec = importlib.util.spec_from_file_location("tufted_build", PROJECT_ROOT / "build.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def site_dir(build, tmp_path, monkeypatch):
+    """切换到临时目录并返回其中的 _site（build.py 中的目录都是相对路径）"""
+    monkeypatch.chdir(tmp_path)
+    build.invalidate_snapshots()
+    site = tmp_path / build.SITE_DIR
+    site.mkdir()
+    yield site
+    build.invalidate_snapshots()
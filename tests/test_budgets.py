@@ -0,0 +1,67 @@
+"""
+性能预算（PERFORMANCE_BUDGETS）的测试
+
+用法:
+    python -m pytest tests/
+"""
+
+import base64
+
+# 只需要能被识别为 PNG 的文件头，预算检查不会解码像素
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + b"\0" * 92
+
+
+def test_page_budget_merges_matching_rules_in_order(build, monkeypatch):
+    monkeypatch.setattr(
+        build,
+        "PERFORMANCE_BUDGETS",
+        {
+            "/*": {"html_bytes": 100, "requests": 5},
+            "/Blog/*": {"html_bytes": 1000},
+        },
+    )
+
+    assert build.page_budget("/Blog/post/") == {"html_bytes": 1000, "requests": 5}
+    assert build.page_budget("/About/") == {"html_bytes": 100, "requests": 5}
+
+
+def test_page_budget_without_match_is_empty(build, monkeypatch):
+    monkeypatch.setattr(build, "PERFORMANCE_BUDGETS", {"/Blog/*": {"requests": 1}})
+
+    assert build.page_budget("/About/") == {}
+
+
+def test_check_budgets_reports_violations(build, site_dir, monkeypatch):
+    monkeypatch.setattr(
+        build,
+        "PERFORMANCE_BUDGETS",
+        {"/*": {"image_bytes": 150, "requests": 10}, "/Blog/*": {"requests": 1}},
+    )
+    embedded = base64.b64encode(PNG_BYTES).decode()
+    (site_dir / "logo.png").write_bytes(PNG_BYTES)
+    (site_dir / "style.css").write_text("body { margin: 0; }", encoding="utf-8")
+    (site_dir / "index.html").write_text(
+        '<link rel="stylesheet" href="/style.css"><img src="/logo.png">', encoding="utf-8"
+    )
+    (site_dir / "Blog").mkdir()
+    (site_dir / "Blog" / "index.html").write_text(
+        f'<link rel="stylesheet" href="../style.css"><img src="data:image/png;base64,{embedded}">'
+        '<script src="https://example.com/app.js"></script>',
+        encoding="utf-8",
+    )
+
+    report = build.check_budgets()
+
+    assert report.pages["/"]["requests"] == 2
+    assert report.pages["/"]["image_bytes"] == len(PNG_BYTES)
+    # 内嵌的 data: 图片计入图片大小，但不算请求
+    assert report.pages["/Blog/"]["image_bytes"] == len(PNG_BYTES)
+    assert report.pages["/Blog/"]["requests"] == 2
+    assert report.violations == [{"page": "/Blog/", "metric": "requests", "actual": 2, "limit": 1}]
+    assert report.has_failures
+
+    # 资源单独变大时，未变化的页面也会重新计算
+    (site_dir / "logo.png").write_bytes(PNG_BYTES * 2)
+    build.invalidate_snapshots()
+    report = build.check_budgets()
+    assert {"page": "/", "metric": "image_bytes", "actual": 200, "limit": 150} in report.violations
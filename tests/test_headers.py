@@ -0,0 +1,81 @@
+"""
+缓存响应头（CACHE_HEADERS）的测试
+
+用法:
+    python -m pytest tests/
+"""
+
+
+def test_cache_policy(build):
+    assert build.cache_policy("_media/0123456789abcdef.png") == "immutable"
+    assert build.cache_policy("assets/vendor/tufte.min-43777910.css") == "immutable"
+    # 摘要目录中不带摘要的文件名不能长期缓存
+    assert build.cache_policy("_img/logo.png") == "asset"
+    assert build.cache_policy("Blog/index.html") == "document"
+    assert build.cache_policy("feed.xml") == "document"
+    assert build.cache_policy("sw.js") == "document"
+    assert build.cache_policy("assets/tufted.css") == "asset"
+
+
+def test_parse_headers_file(build, tmp_path):
+    path = tmp_path / "_headers"
+    path.write_text(
+        "# 注释\n"
+        "/Blog/*\n"
+        "  Cache-Control: public, max-age=3600\n"
+        "\n"
+        "/\n"
+        "  Cache-Control: public, max-age=0, must-revalidate\n"
+        "  Link: </assets/tufted.css>; rel=preload; as=style\n",
+        encoding="utf-8",
+    )
+
+    assert build.parse_headers_file(path) == [
+        ("/Blog/*", [("Cache-Control", "public, max-age=3600")]),
+        (
+            "/",
+            [
+                ("Cache-Control", "public, max-age=0, must-revalidate"),
+                ("Link", "</assets/tufted.css>; rel=preload; as=style"),
+            ],
+        ),
+    ]
+    assert build.parse_headers_file(tmp_path / "missing") == []
+
+
+def test_match_headers(build):
+    rules = [
+        ("/Blog/x/", [("Cache-Control", "document")]),
+        ("/Blog/*", [("Cache-Control", "asset")]),
+        ("/", [("Link", "root")]),
+    ]
+
+    assert build.match_headers(rules, "/Blog/x/") == [
+        ("Cache-Control", "document"),
+        ("Cache-Control", "asset"),
+    ]
+    assert build.match_headers(rules, "/Blog/a.png") == [("Cache-Control", "asset")]
+    assert build.match_headers(rules, "/") == [("Link", "root")]
+    assert build.match_headers(rules, "/About/") == []
+
+
+def test_generate_headers_keeps_page_rules_out_of_mixed_wildcards(build, site_dir, monkeypatch):
+    monkeypatch.setattr(build, "CACHE_HEADERS", True)
+    (site_dir / "assets").mkdir()
+    (site_dir / "assets" / "tufted.css").write_text("", encoding="utf-8")
+    (site_dir / "Blog" / "x").mkdir(parents=True)
+    (site_dir / "Blog" / "x" / "index.html").write_text(
+        '<head><link rel="stylesheet" href="/assets/tufted.css"></head>', encoding="utf-8"
+    )
+    (site_dir / "Blog" / "x" / "photo.png").write_bytes(b"")
+
+    assert build.generate_headers()
+
+    rules = build.parse_headers_file(site_dir / build.HEADERS_FILE)
+    document = ("Cache-Control", build.CACHE_CONTROL["document"])
+    asset = ("Cache-Control", build.CACHE_CONTROL["asset"])
+    preload = ("Link", "</assets/tufted.css>; rel=preload; as=style")
+    assert build.match_headers(rules, "/Blog/x/photo.png") == [asset]
+    for url in ("/Blog/x/", "/Blog/x/index.html"):
+        assert build.match_headers(rules, url)[:2] == [document, preload]
+    assert build.NGINX_HEADERS_FILE.exists()
@@ -0,0 +1,56 @@
+"""
+站内链接与锚点检查的测试
+
+用法:
+    python -m pytest tests/
+"""
+
+
+def test_resolve_site_reference(build):
+    resolve = build.resolve_site_reference
+
+    assert resolve("/Blog/post/", "../other/#intro") == ("/Blog/other/", "intro")
+    assert resolve("/Blog/post/", "image.png") == ("/Blog/post/image.png", "")
+    assert resolve("/Blog/post/", "#top") == ("/Blog/post/", "top")
+    assert resolve("/Blog/", "/About/%E5%85%B3%E4%BA%8E") == ("/About/关于", "")
+    assert resolve("/", "https://example.com/About/", "https://example.com") == ("/About/", "")
+    assert resolve("/", "https://other.com/") is None
+    assert resolve("/", "mailto:me@example.com") is None
+    assert resolve("/", "  ") is None
+
+
+def test_lookup_site_path(build):
+    files = {"index.html", "Blog/index.html", "Blog/post/index.html", "feed.xml", "page.html"}
+
+    assert build.lookup_site_path("/", files) == ("index.html", False)
+    assert build.lookup_site_path("/Blog/post/", files) == ("Blog/post/index.html", False)
+    assert build.lookup_site_path("/Blog/post", files) == ("Blog/post/index.html", True)
+    assert build.lookup_site_path("/feed.xml", files) == ("feed.xml", False)
+    assert build.lookup_site_path("/page", files) == ("page.html", False)
+    assert build.lookup_site_path("/About/", files) == (None, False)
+
+
+def test_check_links_reports_missing_targets_and_anchors(build, site_dir, capsys):
+    (site_dir / "index.html").write_text(
+        '<a href="/Blog/#posts">ok</a><a href="/Blog/#missing">bad anchor</a>'
+        '<a href="/About/">missing page</a><a href="/Blog">no slash</a>'
+        '<a href="https://example.com/">external</a>',
+        encoding="utf-8",
+    )
+    (site_dir / "Blog").mkdir()
+    (site_dir / "Blog" / "index.html").write_text(
+        '<h2 id="posts">Posts</h2><a href="../#top">home</a>', encoding="utf-8"
+    )
+
+    assert not build.check_links()
+
+    output = capsys.readouterr().out
+    assert "/Blog/#missing（锚点 #missing 不存在）" in output
+    assert "/About/（目标不存在）" in output
+    assert "/Blog（目录链接缺少结尾的 /" in output
+    assert "#posts" not in output
+    assert "example.com" not in output
+
+    (site_dir / "index.html").write_text('<a href="/Blog/#posts">ok</a>', encoding="utf-8")
+    build.invalidate_snapshots()
+    assert build.check_links()
@@ -0,0 +1,52 @@
+"""
+typst-py 编译后端的冒烟测试
+
+需要安装 typst Python 包（pip install typst），未安装时跳过。
+
+用法:
+    python -m pytest tests/
+"""
+
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def load_build_module():
+    spec = importlib.util.spec_from_file_location("tufted_build", PROJECT_ROOT / "build.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+build = load_build_module()
+
+
+def test_parse_compile_args_keeps_features():
+    options = build.parse_compile_args(
+        ["compile", "--features", "html", "--format", "html", "in.typ", "out.html"]
+    )
+    assert options is not None
+    assert options.features == ("html",)
+    assert options.format == "html"
+
+
+def test_typst_py_backend_compiles_html(tmp_path):
+    pytest.importorskip("typst")
+    source = tmp_path / "index.typ"
+    source.write_text('#html.elem("p", attrs: (class: "smoke"))[Hello]\n', encoding="utf-8")
+    output = tmp_path / "index.html"
+
+    backend = build.TypstPyBackend()
+    returncode, error = backend.run(
+        ["compile", "--root", str(tmp_path), "--features", "html", str(source), str(output)],
+        "smoke",
+    )
+
+    assert returncode == 0, error
+    text = output.read_text(encoding="utf-8")
+    assert text.lstrip().lower().startswith("<!doctype html>")
+    assert '<p class="smoke">Hello</p>' in text
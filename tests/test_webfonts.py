@@ -0,0 +1,18 @@
+"""
+网页字体子集（unicode-range）的测试
+
+用法:
+    python -m pytest tests/
+"""
+
+
+def test_format_unicode_range_merges_consecutive_codepoints(build):
+    codepoints = [0x4E01, 0x20, 0x22, 0x21, 0x4E00, 0x7E]
+
+    assert build.format_unicode_range(codepoints) == "U+20-22, U+7E, U+4E00-4E01"
+
+
+def test_format_unicode_range_single_and_duplicate_codepoints(build):
+    assert build.format_unicode_range([0x41]) == "U+41"
+    assert build.format_unicode_range([0x41, 0x41, 0x42]) == "U+41-42"
+    assert build.format_unicode_range([]) == ""
@@ -0,0 +1,78 @@
+/// 根据 `build.py` 生成的文章列表数据渲染文章列表。
+///
+/// 构建脚本会在编译列表页之前，根据各文章的元数据生成同目录下的 `_posts.json`，
+/// 按日期降序排列；文章增删或元数据变化后列表会自动更新。
+///
+/// 用法（如 `content/Blog/index.typ`）：
+/// ```typ
+/// #tufted.post-listing(json("_posts.json"))
+/// ```
+///
+/// 文章数超过 `build.py` 中的 `LISTING_PAGE_SIZE` 时会分页，
+/// 第 N 页由构建脚本以 `listing-page=N` 编译为 `/<目录>/page/<N>/`。
+#let post-listing(
+  data,
+  // 按年份分组，每组前添加二级标题
+  group-by-year: true,
+  // 在标题下方显示文章描述
+  show-description: false,
+) = {
+  let current = int(sys.inputs.at("listing-page", default: "1"))
+  let size = data.at("page-size")
+  let total = data.at("pages")
+  let posts = data.posts
+  if size > 0 {
+    posts = posts.slice(
+      calc.min((current - 1) * size, posts.len()),
+      calc.min(current * size, posts.len()),
+    )
+  }
+
+  // 2026-02-15 -> 2.15
+  let short-date(date) = {
+    let parts = date.split("-")
+    str(int(parts.at(1))) + "." + str(int(parts.at(2)))
+  }
+
+  let item(post) = {
+    let label = if post.date != none { short-date(post.date) + " - " + post.title } else { post.title }
+    link(post.link, label)
+    if show-description and post.description != "" {
+      linebreak()
+      post.description
+    }
+  }
+
+  // 连续的同年文章归为一组
+  let groups = ()
+  for post in posts {
+    let year = if group-by-year and post.date != none { post.date.slice(0, 4) } else { none }
+    if groups.len() == 0 or groups.last().at(0) != year {
+      groups.push((year, ()))
+    }
+    groups.at(-1).at(1).push(post)
+  }
+
+  for (year, items) in groups {
+    if year != none {
+      heading(level: 2, year)
+    }
+    list(..items.map(item))
+  }
+
+  if total > 1 {
+    let page-url(n) = if n == 1 { "/" + data.section + "/" } else {
+      "/" + data.section + "/page/" + str(n) + "/"
+    }
+    let links = range(1, total + 1).map(n => if n == current { strong(str(n)) } else {
+      link(page-url(n), str(n))
+    })
+    if current > 1 {
+      links.insert(0, link(page-url(current - 1))[← 上一页])
+    }
+    if current < total {
+      links.push(link(page-url(current + 1))[下一页 →])
+    }
+    html.nav(class: "pagination", links.join(" "))
+  }
+}
@@ -4,6 +4,7 @@
 #import "figures.typ": template-figures
 #import "layout.typ": full-width, margin-note
 #import "links.typ": template-links
+#import "listing.typ": post-listing
 #import "metadata.typ": metadata
 
 /// Tufted 博客模板的主包装函数。
@@ -87,10 +88,13 @@
       })
 
       // Body
+      // The header, navigation and footer carry data-chrome markers so that build.py
+      // can splice in a recompiled chrome fragment when only these parts change
       html.body({
         // Custom header elements (site header, not navigation)
-        html.header(
-          class: "site-header",
+        html.elem(
+          "header",
+          attrs: (class: "site-header", data-chrome: "header"),
           {
             for (i, element) in header-elements.enumerate() {
               element
@@ -102,8 +106,9 @@
         )
 
         // Add website navigation
-        html.header(
-          class: "site-header",
+        html.elem(
+          "header",
+          attrs: (class: "site-header", data-chrome: "nav"),
           if header-links != none and header-links.len() > 0 {
             html.nav(
               class: "site-nav",
@@ -120,7 +125,7 @@
         )
 
         // Custom footer elements
-        html.footer({
+        html.elem("footer", attrs: (data-chrome: "footer"), {
           for (i, element) in footer-elements.enumerate() {
             element
             if i < footer-elements.len() - 1 {